@@ -20,14 +20,16 @@ api_module = None
 try:
     # Пытаемся импортировать модуль напрямую
     spec = importlib.util.find_spec('src.api.api_wrapper')
-    if spec:
-        api_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(api_module)
-        
-        # Копируем все атрибуты в текущий модуль
-        for attr_name in dir(api_module):
-            if not attr_name.startswith('__'):
-                globals()[attr_name] = getattr(api_module, attr_name)
+    if spec is None:
+        # Пакет src.api существует, но модуля api_wrapper в нем нет
+        raise ImportError("src.api.api_wrapper not found")
+    api_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(api_module)
+    
+    # Копируем все атрибуты в текущий модуль
+    for attr_name in dir(api_module):
+        if not attr_name.startswith('__'):
+            globals()[attr_name] = getattr(api_module, attr_name)
 except Exception as e:
     warnings.warn(f"Failed to import from src.api.api_wrapper: {e}")
     # Заглушки основных классов и функций в случае ошибки
@@ -14,10 +14,17 @@ import asyncio
 import aiohttp
 import time
 import datetime
-from typing import Dict, List, Any, Optional, Tuple, Set, Union
+from typing import Dict, List, Any, Optional, Tuple, Set, Union, Callable, Awaitable
 from pathlib import Path
 from dotenv import load_dotenv
 
+from src.api.rate_limiter import get_rate_limiter
+from src.arbitrage.records import MarketItem, Opportunity, build_market_items, opportunity_to_dict
+from src.arbitrage.scoring import add_history_columns, build_listing_columns, select_top_rows_async
+from src.utils.parallel_processor import PARALLEL_SCORING, ParallelProcessor
+from src.utils.price import format_usd
+from src.utils.ttl_cache import CACHE_TTL, TTLCache
+
 # Настройка путей
 current_dir = Path(__file__).parent.absolute()
 dm_dir = current_dir / "DM"
@@ -115,6 +122,19 @@ if not DMARKET_API_KEY or not DMARKET_API_SECRET:
     logger.critical("Не указаны DMARKET_API_KEY или DMARKET_API_SECRET в файле .env")
     sys.exit(1)
 
+# Максимальное количество одновременных запросов истории продаж
+HISTORY_CONCURRENCY = int(os.getenv("HISTORY_CONCURRENCY", "10"))
+
+# Общий лимит одновременных запросов к API для всех игр
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "20"))
+
+# Кэш историй продаж: максимальное количество предметов и файл для сохранения между запусками
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "50000"))
+HISTORY_CACHE_PATH = os.getenv("HISTORY_CACHE_PATH", "")
+
+# Количество лучших возможностей, сохраняемых для каждой игры
+TOP_K_OPPORTUNITIES = int(os.getenv("TOP_K_OPPORTUNITIES", "50"))
+
 # Идентификаторы игр для DMarket API
 GAME_IDS = {
     "CS2": "a8db",
@@ -125,15 +145,96 @@ GAME_IDS = {
 
 # Класс для работы с DMarket API и поиска арбитражных возможностей
 class ArbitrageAnalyzer:
-    def __init__(self, api_key: str, api_secret: str):
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        history_concurrency: int = HISTORY_CONCURRENCY,
+        max_concurrent_requests: int = MAX_CONCURRENT_REQUESTS,
+        history_cache_ttl: float = CACHE_TTL,
+        history_cache_size: int = HISTORY_CACHE_SIZE,
+        history_cache_path: Optional[str] = HISTORY_CACHE_PATH or None,
+        top_k: int = TOP_K_OPPORTUNITIES,
+        rank_by: str = "profit_percent"
+    ):
         self.api = DMarketAPI(api_key, api_secret)
         self.logger = logging.getLogger("ArbitrageAnalyzer")
         
+        # Максимальное количество одновременных запросов истории продаж
+        self.history_concurrency = history_concurrency
+        
+        # Общий бюджет одновременных запросов, разделяемый всеми играми
+        self.max_concurrent_requests = max_concurrent_requests
+        self._request_budget: Optional[asyncio.Semaphore] = None
+        
+        # Кэш историй продаж по itemId; при указании пути переживает перезапуск
+        self.history_cache = TTLCache(
+            ttl=history_cache_ttl,
+            maxsize=history_cache_size,
+            persist_path=history_cache_path
+        )
+        
+        # Для каждой игры сохраняются только top_k лучших возможностей по полю rank_by
+        self.top_k = top_k
+        self.rank_by = rank_by
+        
+        # Пул процессов для оценки крупных страниц (PARALLEL_SCORING);
+        # используется, когда это окупается
+        self.parallel_processor: Optional[ParallelProcessor] = (
+            ParallelProcessor(use_processes=True) if PARALLEL_SCORING else None
+        )
+        
+        # Общий для процесса ограничитель частоты запросов к DMarket API
+        self.rate_limiter = get_rate_limiter()
+        
         # Инициализируем DMarketArbitrageFinder, если доступен
         self.arbitrage_finder = None
         if USE_ARBITRAGE_FINDER:
             self.arbitrage_finder = DMarketArbitrageFinder(api_key, api_secret)
     
+    async def close(self) -> None:
+        """Сохраняет кэш историй продаж на диск (если задан путь) и останавливает пул процессов."""
+        self.history_cache.save()
+        if self.parallel_processor is not None:
+            await self.parallel_processor.close_async()
+    
+    def _get_request_budget(self) -> asyncio.Semaphore:
+        """
+        Возвращает общий для всех игр семафор одновременных запросов к API.
+        
+        Семафор создается лениво, чтобы он принадлежал работающему циклу событий.
+        """
+        if self._request_budget is None:
+            self._request_budget = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._request_budget
+    
+    async def _call_api(
+        self,
+        endpoint: str,
+        api_call: Callable[..., Awaitable[Dict[str, Any]]],
+        *args,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Вызывает метод DMarketAPI через общий ограничитель частоты запросов.
+        
+        Args:
+            endpoint: Эндпоинт API, к которому обращается метод
+            api_call: Асинхронный метод DMarketAPI
+            
+        Returns:
+            Ответ метода API
+        """
+        await self.rate_limiter.acquire(endpoint)
+        try:
+            result = await api_call(*args, **kwargs)
+        except Exception as e:
+            if getattr(e, "status", None) == 429 or type(e).__name__ == "RateLimitError":
+                self.rate_limiter.record_rate_limited(endpoint, getattr(e, "retry_after", None))
+            raise
+        self.rate_limiter.record_success(endpoint)
+        return result
+    
     async def analyze_game(
         self, 
         game_id: str, 
@@ -141,8 +242,10 @@ class ArbitrageAnalyzer:
         price_from: float = 1.0, 
         price_to: float = 100.0, 
         min_profit_percent: float = 5.0,
-        max_items: int = 200
-    ) -> List[Dict[str, Any]]:
+        max_items: int = 200,
+        top_k: Optional[int] = None,
+        full_results: bool = False
+    ) -> List[Union[Opportunity, Dict[str, Any]]]:
         """
         Анализирует предметы из указанной игры для поиска арбитражных возможностей.
         
@@ -153,10 +256,15 @@ class ArbitrageAnalyzer:
             price_to: Максимальная цена предметов
             min_profit_percent: Минимальный процент прибыли
             max_items: Максимальное количество предметов для анализа
+            top_k: Количество лучших возможностей в результате (по умолчанию self.top_k)
+            full_results: Вернуть все найденные возможности без ограничения top_k
             
         Returns:
-            Список потенциально прибыльных предметов
+            Список потенциально прибыльных предметов по убыванию поля self.rank_by
+            (словари, если поиск выполнен DMarketArbitrageFinder)
         """
+        limit = None if full_results else (top_k if top_k is not None else self.top_k)
+        
         self.logger.info(f"Анализ игры {game_name} (ID: {game_id})")
         
         # Если доступен DMarketArbitrageFinder, используем его
@@ -177,14 +285,17 @@ class ArbitrageAnalyzer:
         
         # Базовая логика поиска прибыльных предметов
         try:
-            # Получаем предметы с рынка
-            response = await self.api.get_market_items_async(
-                game_id=game_id,
-                limit=max_items,
-                price_from=price_from,
-                price_to=price_to,
-                currency="USD"
-            )
+            # Получаем предметы с рынка в рамках общего бюджета запросов
+            async with self._get_request_budget():
+                response = await self._call_api(
+                    '/exchange/v1/market/items',
+                    self.api.get_market_items_async,
+                    game_id=game_id,
+                    limit=max_items,
+                    price_from=price_from,
+                    price_to=price_to,
+                    currency="USD"
+                )
             
             items = response.get("objects", [])
             if not items:
@@ -194,7 +305,11 @@ class ArbitrageAnalyzer:
             self.logger.info(f"Получено {len(items)} предметов для {game_name}")
             
             # Анализируем предметы для поиска потенциально прибыльных
-            profitable_items = await self._analyze_items(items, min_profit_percent, game_name)
+            # JSON разбирается в компактные записи один раз
+            listings = build_market_items(items)
+            profitable_items = await self._analyze_items(
+                listings, min_profit_percent, game_name, top_k=limit
+            )
             
             self.logger.info(f"Найдено {len(profitable_items)} потенциально прибыльных предметов для {game_name}")
             return profitable_items
@@ -203,105 +318,138 @@ class ArbitrageAnalyzer:
             self.logger.error(f"Ошибка при анализе игры {game_name}: {e}")
             return []
     
+    async def _fetch_sales_histories(
+        self,
+        items: List[MarketItem],
+        limit: int = 10
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        Параллельно получает историю продаж для списка предметов.
+        
+        Истории, которые есть в кэше и не устарели, берутся из него.
+        Количество одновременных запросов ограничено семафором на
+        history_concurrency запросов и общим бюджетом запросов анализатора.
+        Ошибка для одного предмета не влияет на остальные: вместо его
+        истории возвращается None.
+        
+        Args:
+            items: Список предметов
+            limit: Лимит количества записей истории для каждого предмета
+            
+        Returns:
+            Истории продаж в том же порядке, что и предметы (None - история не загружена)
+        """
+        semaphore = asyncio.Semaphore(self.history_concurrency)
+        request_budget = self._get_request_budget()
+        
+        async def fetch_history(item: MarketItem) -> Optional[List[Dict[str, Any]]]:
+            item_id = item.item_id
+            cached_history = self.history_cache.get(item_id)
+            if cached_history is not None:
+                return cached_history
+            
+            async with semaphore, request_budget:
+                try:
+                    response = await self._call_api(
+                        f'/exchange/v1/item-history/{item_id}',
+                        self.api.get_item_history_async,
+                        item_id,
+                        limit=limit
+                    )
+                except Exception as e:
+                    self.logger.debug(f"Не удалось получить историю продаж для {item.title}: {e}")
+                    return None
+            
+            # Ответ с ошибкой не кэшируем, чтобы повторить запрос при следующем сканировании
+            if "error" in response:
+                return None
+            history = response.get("history", [])
+            self.history_cache.set(item_id, history)
+            return history
+        
+        # gather сохраняет порядок результатов в соответствии с порядком предметов
+        return await asyncio.gather(*(fetch_history(item) for item in items))
+    
     async def _analyze_items(
         self, 
-        items: List[Dict[str, Any]], 
+        items: List[MarketItem], 
         min_profit_percent: float,
-        game_name: str
-    ) -> List[Dict[str, Any]]:
+        game_name: str,
+        top_k: Optional[int] = None
+    ) -> List[Opportunity]:
         """
         Анализирует список предметов для поиска потенциально прибыльных.
         
+        Цены и ордера на покупку разбираются в столбцы NumPy, истории продаж
+        подходящих предметов загружаются параллельно, после чего прибыль всех
+        предметов рассчитывается одним векторным проходом. Предметы, историю
+        которых не удалось загрузить, не оцениваются: без истории средней ценой
+        продажи считалась бы текущая цена, и временная ошибка API давала бы
+        ложную прибыль. Их истории не кэшируются, поэтому при следующем
+        сканировании запрос повторяется.
+        
         Args:
-            items: Список предметов
+            items: Записи предметов (build_market_items)
             min_profit_percent: Минимальный процент прибыли
             game_name: Название игры для логирования
+            top_k: Вернуть только top_k лучших предметов по полю self.rank_by (None - все)
             
         Returns:
-            Список потенциально прибыльных предметов
+            Список потенциально прибыльных предметов по убыванию поля self.rank_by
         """
-        profitable_items = []
+        # Этап 1: цены и ордера на покупку
+        columns = build_listing_columns(items)
+        if not len(columns):
+            return []
         
-        for item in items:
-            try:
-                # Получаем основную информацию о предмете
-                item_name = item.get("title", "Неизвестный предмет")
-                item_id = item.get("itemId", "")
-                market_price = float(item.get("price", {}).get("USD", 0))
-                
-                if market_price <= 0:
-                    continue
-                
-                # Получаем ордера на покупку для этого предмета (если они есть)
-                buy_orders = item.get("buyOrders", [])
-                best_buy_order_price = 0.0
-                if buy_orders:
-                    # Находим лучшую цену покупки
-                    for order in buy_orders:
-                        order_price = float(order.get("price", {}).get("USD", 0))
-                        if order_price > best_buy_order_price:
-                            best_buy_order_price = order_price
-                
-                # Если нет ордеров на покупку, используем приблизительную оценку
-                if best_buy_order_price <= 0:
-                    # Оценка цены покупки как 90% от рыночной цены
-                    estimated_buy_price = market_price * 0.9
-                    best_buy_order_price = estimated_buy_price
-                
-                # Получаем историю продаж, если доступно
-                sales_history = []
-                try:
-                    # Получаем данные о последних продажах
-                    sales_history_response = await self.api.get_item_history_async(item_id, limit=10)
-                    sales_history = sales_history_response.get("history", [])
-                except Exception as e:
-                    self.logger.debug(f"Не удалось получить историю продаж для {item_name}: {e}")
-                
-                # Рассчитываем среднюю цену продаж, если есть история
-                avg_sale_price = 0.0
-                if sales_history:
-                    sale_prices = [float(sale.get("price", {}).get("USD", 0)) for sale in sales_history]
-                    if sale_prices:
-                        avg_sale_price = sum(sale_prices) / len(sale_prices)
-                else:
-                    # Если нет истории продаж, используем текущую рыночную цену
-                    avg_sale_price = market_price
-                
-                # Рассчитываем потенциальную прибыль
-                potential_profit = avg_sale_price - best_buy_order_price
-                profit_percent = (potential_profit / best_buy_order_price) * 100 if best_buy_order_price > 0 else 0
-                
-                # Проверяем, соответствует ли предмет критериям прибыльности
-                if profit_percent >= min_profit_percent:
-                    # Собираем информацию о прибыльном предмете
-                    profitable_item = {
-                        "name": item_name,
-                        "id": item_id,
-                        "current_price": market_price,
-                        "buy_price": best_buy_order_price,
-                        "avg_sale_price": avg_sale_price,
-                        "potential_profit": potential_profit,
-                        "profit_percent": profit_percent,
-                        "sales_history_count": len(sales_history),
-                        "game": game_name
-                    }
-                    
-                    profitable_items.append(profitable_item)
-                    
-                    # Логируем найденную возможность
-                    self.logger.info(f"Найден потенциально прибыльный предмет: {item_name} в игре {game_name}")
-                    self.logger.info(f"  Цена покупки: ${best_buy_order_price:.2f}, "
-                                   f"Средняя цена продажи: ${avg_sale_price:.2f}, "
-                                   f"Прибыль: ${potential_profit:.2f} ({profit_percent:.2f}%)")
-            
-            except Exception as e:
-                item_name = item.get("title", "Неизвестный предмет")
-                self.logger.error(f"Ошибка при анализе предмета {item_name}: {e}")
-                continue
+        # Этап 2: параллельная загрузка историй продаж
+        histories = await self._fetch_sales_histories(items, limit=10)
+        if any(history is None for history in histories):
+            loaded = [row for row, history in enumerate(histories) if history is not None]
+            self.logger.debug(
+                f"{game_name}: не загружена история {len(items) - len(loaded)} предметов, "
+                f"они не оцениваются"
+            )
+            items = [items[row] for row in loaded]
+            histories = [histories[row] for row in loaded]
+            if not items:
+                return []
+            columns = build_listing_columns(items)
+        add_history_columns(columns, histories)
+        
+        # Этап 3: векторный расчет прибыли (крупные страницы - по срезам в пуле процессов)
+        rows, scores = await select_top_rows_async(
+            columns, min_profit_percent, top_k, self.rank_by, processor=self.parallel_processor
+        )
         
-        # Сортируем результаты по проценту прибыли (по убыванию)
-        profitable_items.sort(key=lambda x: x["profit_percent"], reverse=True)
+        profitable_items = []
+        for position, row in enumerate(rows.tolist()):
+            item = items[row]
+            profitable_item = Opportunity(
+                item_id=item.item_id,
+                name=item.title,
+                game=game_name,
+                current_price_cents=item.price_cents,
+                buy_price_cents=int(scores.buy_price_cents[position]),
+                avg_sale_price_cents=int(scores.avg_sale_price_cents[position]),
+                profit_cents=int(scores.profit_cents[position]),
+                profit_percent=float(scores.profit_percent[position]),
+                sales_history_count=int(columns.sale_count[row])
+            )
+            profitable_items.append(profitable_item)
+            
+            # Логируем найденную возможность
+            self.logger.info(
+                f"Найден потенциально прибыльный предмет: {item.title} в игре {game_name}"
+            )
+            self.logger.info(
+                f"  Цена покупки: ${format_usd(profitable_item.buy_price_cents)}, "
+                f"Средняя цена продажи: ${format_usd(profitable_item.avg_sale_price_cents)}, "
+                f"Прибыль: ${format_usd(profitable_item.profit_cents)} "
+                f"({profitable_item.profit_percent:.2f}%)"
+            )
         
+        # Строки уже упорядочены по полю ранжирования (по убыванию)
         return profitable_items
 
     async def analyze_all_games(
@@ -309,23 +457,28 @@ class ArbitrageAnalyzer:
         price_from: float = 1.0,
         price_to: float = 100.0,
         min_profit_percent: float = 5.0,
-        max_items_per_game: int = 200
+        max_items_per_game: int = 200,
+        top_k: Optional[int] = None,
+        full_results: bool = False
     ) -> Dict[str, List[Dict[str, Any]]]:
         """
         Анализирует все поддерживаемые игры для поиска арбитражных возможностей.
         
+        Игры сканируются одновременно, поэтому общее время примерно равно
+        времени анализа самой медленной игры.
+        
         Args:
             price_from: Минимальная цена предметов
             price_to: Максимальная цена предметов
             min_profit_percent: Минимальный процент прибыли
             max_items_per_game: Максимальное количество предметов для анализа в каждой игре
+            top_k: Количество лучших возможностей для каждой игры (по умолчанию self.top_k)
+            full_results: Вернуть все найденные возможности без ограничения top_k
             
         Returns:
             Словарь с результатами анализа по играм
         """
-        results = {}
-        
-        for game_name, game_id in GAME_IDS.items():
+        async def analyze_game_timed(game_name: str, game_id: str) -> List[Dict[str, Any]]:
             start_time = time.time()
             self.logger.info(f"Начинаем анализ игры {game_name}...")
             
@@ -335,21 +488,40 @@ class ArbitrageAnalyzer:
                 price_from=price_from,
                 price_to=price_to,
                 min_profit_percent=min_profit_percent,
-                max_items=max_items_per_game
+                max_items=max_items_per_game,
+                top_k=top_k,
+                full_results=full_results
             )
             
-            results[game_name] = opportunities
-            
             elapsed_time = time.time() - start_time
             self.logger.info(f"Анализ игры {game_name} завершен за {elapsed_time:.2f} сек. "
                            f"Найдено {len(opportunities)} возможностей.")
-            
-            # Добавляем задержку между запросами к разным играм, чтобы не перегружать API
-            await asyncio.sleep(1)
+            return opportunities
+        
+        # Игры анализируются параллельно; нагрузку на API ограничивает общий
+        # бюджет запросов (_get_request_budget) вместо фиксированной паузы между играми
+        game_names = list(GAME_IDS.keys())
+        game_results = await asyncio.gather(
+            *(analyze_game_timed(game_name, GAME_IDS[game_name]) for game_name in game_names),
+            return_exceptions=True
+        )
+        
+        results = {}
+        for game_name, game_result in zip(game_names, game_results):
+            if isinstance(game_result, Exception):
+                self.logger.error(f"Ошибка при анализе игры {game_name}: {game_result}")
+                game_result = []
+            results[game_name] = game_result
+        
+        cache_stats = self.history_cache.get_stats()
+        self.logger.info(f"Кэш историй продаж: попаданий {cache_stats['hits']}, "
+                         f"промахов {cache_stats['misses']}, "
+                         f"вытеснений {cache_stats['evictions']}, "
+                         f"размер {cache_stats['size']}")
         
         return results
 
-    def save_results(self, results: Dict[str, List[Dict[str, Any]]], filename: str = None):
+    def save_results(self, results: Dict[str, List[Opportunity]], filename: str = None):
         """
         Сохраняет результаты анализа в JSON-файл.
         
@@ -370,7 +542,10 @@ class ArbitrageAnalyzer:
         # Подготавливаем данные для сохранения
         output_data = {
             "timestamp": datetime.datetime.now().isoformat(),
-            "results": results,
+            "results": {
+                game: [opportunity_to_dict(opportunity) for opportunity in opportunities]
+                for game, opportunities in results.items()
+            },
             "summary": {
                 "total_opportunities": sum(len(opportunities) for opportunities in results.values()),
                 "opportunities_per_game": {game: len(opportunities) for game, opportunities in results.items()}
@@ -385,7 +560,7 @@ class ArbitrageAnalyzer:
         
         return file_path
 
-    def print_summary(self, results: Dict[str, List[Dict[str, Any]]]):
+    def print_summary(self, results: Dict[str, List[Opportunity]]):
         """
         Выводит сводку результатов анализа.
         
@@ -414,7 +589,7 @@ class ArbitrageAnalyzer:
                     "Название", "Цена покупки", "Цена продажи", "Прибыль", "Прибыль %"))
                 print("-" * 80)
                 
-                for item in opportunities[:5]:
+                for item in map(opportunity_to_dict, opportunities[:5]):
                     print("{:<40} ${:<9.2f} ${:<9.2f} ${:<9.2f} {:<9.2f}%".format(
                         item["name"][:38], 
                         item["buy_price"], 
@@ -441,12 +616,15 @@ async def main():
     max_items_per_game = 200  # Максимальное количество предметов для анализа в каждой игре
     
     # Анализируем все игры
-    results = await analyzer.analyze_all_games(
-        price_from=price_from,
-        price_to=price_to,
-        min_profit_percent=min_profit_percent,
-        max_items_per_game=max_items_per_game
-    )
+    try:
+        results = await analyzer.analyze_all_games(
+            price_from=price_from,
+            price_to=price_to,
+            min_profit_percent=min_profit_percent,
+            max_items_per_game=max_items_per_game
+        )
+    finally:
+        await analyzer.close()
     
     # Сохраняем результаты в файл
     analyzer.save_results(results)
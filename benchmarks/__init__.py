@@ -0,0 +1,3 @@
+"""
+Нагрузочные тесты и замеры производительности.
+"""
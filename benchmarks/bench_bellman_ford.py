@@ -0,0 +1,120 @@
+"""
+Замер скорости поиска арбитражных циклов на синтетических графах.
+
+Для каждого размера генерируются котировки N предметов на площадках
+MARKETPLACES со случайным спредом; у части предметов цена продажи на одной
+площадке завышена, чтобы в графе были прибыльные циклы. Замеряются
+построение графа и поиск циклов.
+
+Запуск:
+    python benchmarks/bench_bellman_ford.py
+    python benchmarks/bench_bellman_ford.py --items 1000 5000 20000 \
+        --json results/bench_bellman_ford.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.arbitrage.bellman_ford import ArbitrageGraph, PriceQuote, find_arbitrage_cycles
+
+# Площадки синтетических котировок
+MARKETPLACES = ("dmarket", "bitskins", "csmoney", "backpacktf")
+
+
+def generate_quotes(
+    num_items: int, profitable_share: float = 0.01, seed: int = 42
+) -> List[PriceQuote]:
+    """
+    Генерирует котировки предметов на всех площадках.
+
+    Args:
+        num_items: Количество предметов
+        profitable_share: Доля предметов с завышенной ценой продажи на одной площадке
+        seed: Зерно генератора
+
+    Returns:
+        Котировки
+    """
+    rng = random.Random(seed)
+    quotes = []
+    for index in range(num_items):
+        base = rng.randint(100, 100000)
+        boosted = rng.choice(MARKETPLACES) if rng.random() < profitable_share else None
+        for marketplace in MARKETPLACES:
+            ask = int(base * rng.uniform(1.0, 1.1))
+            bid = int(base * rng.uniform(0.85, 0.97))
+            if marketplace == boosted:
+                bid = int(ask * rng.uniform(1.1, 1.3))
+            quotes.append(PriceQuote(f"item-{index}", marketplace, ask, bid))
+    return quotes
+
+
+def run(num_items: int, repeats: int) -> Dict[str, Any]:
+    """Замеряет построение графа и поиск циклов для num_items предметов."""
+    quotes = generate_quotes(num_items)
+
+    started = time.perf_counter()
+    graph = ArbitrageGraph.from_quotes(quotes)
+    graph.arrays()
+    build_time = time.perf_counter() - started
+
+    search_times = []
+    cycles = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        cycles = find_arbitrage_cycles(graph, max_cycles=50)
+        search_times.append(time.perf_counter() - started)
+
+    return {
+        "items": num_items,
+        "nodes": graph.num_nodes,
+        "edges": graph.num_edges,
+        "build_seconds": build_time,
+        "search_seconds": min(search_times),
+        "cycles": len(cycles),
+        "best_profit_percent": cycles[0].profit_percent if cycles else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Замер поиска арбитражных циклов")
+    parser.add_argument(
+        "--items",
+        type=int,
+        nargs="+",
+        default=[250, 1000, 5000, 20000],
+        help="Количества предметов",
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Количество повторов поиска")
+    parser.add_argument("--json", type=str, default=None, help="Файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'Предметов':>10} {'Вершин':>8} {'Ребер':>8} {'Граф, с':>9} "
+        f"{'Поиск, с':>9} {'Циклов':>7} {'Лучший %':>9}"
+    )
+    for num_items in args.items:
+        result = run(num_items, args.repeats)
+        results.append(result)
+        print(
+            f"{result['items']:>10} {result['nodes']:>8} {result['edges']:>8} "
+            f"{result['build_seconds']:>9.3f} {result['search_seconds']:>9.3f} "
+            f"{result['cycles']:>7} {result['best_profit_percent']:>9.2f}"
+        )
+
+    if args.json:
+        path = Path(args.json)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+"""
+Замер конвейера анализа рынка на синтетическом рынке.
+
+Для каждого размера генерируется рынок SyntheticMarket (предложения, ордера
+на покупку и истории продаж всех игр GAME_IDS), который отвечает на запросы
+API вместо DMarket без сети и ограничения частоты. Замеряются:
+
+    analyze_items - оценка страниц предложений ArbitrageAnalyzer._analyze_items
+                    (с загрузкой историй продаж, кэш историй пуст; --repeats проходов)
+    full_scan     - полный проход analyze_all_games по всем играм (холодный)
+    rescan        - повторный инкрементальный проход без изменений рынка
+    persist       - запись лучших цен предметов страниц в PriceStore (временная база SQLite,
+                    новая для каждого из --repeats проходов)
+
+Для каждого замера выводятся пропускная способность (предметов в секунду),
+задержки p50/p99 (страницы или прохода) и пиковая память (tracemalloc,
+отдельным прогоном, чтобы не искажать время). Результаты можно сохранить
+как эталон и сравнивать с ним последующие прогоны: при падении пропускной
+способности или росте памяти больше допуска скрипт завершается с кодом 1.
+Эталон стоит записывать с --runs: каждый размер замеряется несколько раз, и
+в отчет идут медианы, а не результат одного прогона.
+
+С --stub запросы идут по HTTP через настоящий SimpleDMarketAPI к локальному
+заменителю API (benchmarks/stub_server.py), который запускается в том же
+процессе с задержкой --latency/--jitter и долей ответов 429 --throttle-share.
+С --base-url запросы идут к уже запущенному серверу, который должен отдавать
+тот же рынок (одинаковые размер и зерно). Клиент ограничивает частоту
+запросов (API_RATE_LIMIT, API_RATE_LIMIT_MAX), поэтому для замеров
+пропускной способности эти лимиты нужно поднять.
+
+Запуск:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 --runs 5 --save-baseline
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 \
+        --compare benchmarks/baseline.json --tolerance 0.3
+    API_RATE_LIMIT=500 API_RATE_LIMIT_MAX=1000 \
+        python benchmarks/bench_pipeline.py --sizes 1000 --stub --latency 0.02
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Ключи нужны только для подписи запросов, которые не уходят в сеть
+os.environ.setdefault("DMARKET_API_KEY", "benchmark")
+os.environ.setdefault("DMARKET_API_SECRET", "benchmark")
+
+from benchmarks.stub_server import DMarketStubServer
+from benchmarks.synthetic_market import SyntheticMarket
+from simple_arbitrage_test import GAME_IDS, MARKET_PAGE_SIZE, ArbitrageAnalyzer, SimpleDMarketAPI
+from src.api.rate_limiter import RateLimiter
+from src.api.request_coalescer import RequestCoalescer
+from src.arbitrage.records import build_market_items
+from src.db.price_store import PriceStore
+from src.utils.instrumentation import Instrumentation
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+BENCHMARKS = ("analyze_items", "full_scan", "rescan", "persist")
+
+MIN_PROFIT_PERCENT = 5.0
+TOP_K = 50
+
+
+class SyntheticDMarketAPI(SimpleDMarketAPI):
+    """
+    Клиент API, которому отвечает SyntheticMarket; объединение GET-запросов сохраняется.
+
+    Ответы передаются готовыми словарями, без HTTP и декодирования JSON.
+    """
+
+    def __init__(self, market: SyntheticMarket, latency: float = 0.0, **kwargs):
+        super().__init__("benchmark", "benchmark", **kwargs)
+        self.market = market
+        self.latency = latency
+
+    async def _send_request(
+        self, method: str, endpoint: str, params: Dict = None, data: Dict = None, handler=None
+    ) -> Dict:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return self.market.respond(endpoint, params)
+
+
+def make_analyzer(
+    market: SyntheticMarket,
+    latency: float,
+    incremental: bool = True,
+    base_url: Optional[str] = None,
+) -> ArbitrageAnalyzer:
+    """
+    Создает анализатор с отключенными замерами этапов.
+
+    Без base_url рынок отвечает клиенту напрямую, с base_url запросы идут по
+    HTTP; ограничитель частоты и объединение запросов у каждого анализатора
+    свои, так как замеры выполняются в разных циклах событий.
+    """
+    metrics = Instrumentation(enabled=False)
+    analyzer = ArbitrageAnalyzer(
+        "benchmark",
+        "benchmark",
+        history_cache_size=market.total_items + 1,
+        history_cache_path=None,
+        top_k=TOP_K,
+        incremental=incremental,
+        price_store=None,
+        poll_budget=0,
+        metrics=metrics,
+    )
+    if base_url:
+        analyzer.api = SimpleDMarketAPI(
+            "benchmark",
+            "benchmark",
+            base_url=base_url,
+            rate_limiter=RateLimiter(),
+            coalescer=RequestCoalescer(),
+            metrics=metrics,
+        )
+    else:
+        analyzer.api = SyntheticDMarketAPI(
+            market, latency, coalescer=RequestCoalescer(), metrics=metrics
+        )
+    return analyzer
+
+
+def market_pages(market: SyntheticMarket) -> List[tuple]:
+    """Разбивает рынок на страницы (название игры, записи предметов) размера MARKET_PAGE_SIZE."""
+    pages = []
+    for game_name, game_id in GAME_IDS.items():
+        listings = build_market_items(market.items.get(game_id, []))
+        for start in range(0, len(listings), MARKET_PAGE_SIZE):
+            pages.append((game_name, listings[start : start + MARKET_PAGE_SIZE]))
+    return pages
+
+
+async def analyze_pages(
+    market: SyntheticMarket, pages: List[tuple], latency: float, base_url: Optional[str]
+) -> List[float]:
+    """Оценивает страницы новым анализатором (кэш историй пуст)."""
+    latencies = []
+    async with make_analyzer(market, latency, incremental=False, base_url=base_url) as analyzer:
+        for game_name, listings in pages:
+            started = time.perf_counter()
+            await analyzer._analyze_items(listings, MIN_PROFIT_PERCENT, game_name, top_k=TOP_K)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def bench_analyze_items(
+    market: SyntheticMarket, latency: float, base_url: Optional[str], repeats: int
+) -> List[float]:
+    pages = market_pages(market)
+    latencies = []
+    for _ in range(repeats):
+        latencies += await analyze_pages(market, pages, latency, base_url)
+        # Циклические ссылки анализатора прошлого прохода не должны попадать в пик памяти
+        gc.collect()
+    return latencies
+
+
+async def run_full_scan(analyzer: ArbitrageAnalyzer) -> float:
+    started = time.perf_counter()
+    await analyzer.analyze_all_games(
+        price_from=0.01,
+        price_to=100000.0,
+        min_profit_percent=MIN_PROFIT_PERCENT,
+        max_items_per_game=None,
+    )
+    return time.perf_counter() - started
+
+
+async def bench_full_scan(
+    market: SyntheticMarket, latency: float, base_url: Optional[str], repeats: int
+) -> List[float]:
+    latencies = []
+    for _ in range(repeats):
+        async with make_analyzer(market, latency, base_url=base_url) as analyzer:
+            latencies.append(await run_full_scan(analyzer))
+        del analyzer
+        gc.collect()
+    return latencies
+
+
+async def bench_rescan(
+    market: SyntheticMarket, latency: float, base_url: Optional[str], repeats: int
+) -> List[float]:
+    async with make_analyzer(market, latency, base_url=base_url) as analyzer:
+        await run_full_scan(analyzer)
+        return [await run_full_scan(analyzer) for _ in range(repeats)]
+
+
+async def bench_persist(
+    market: SyntheticMarket, latency: float, base_url: Optional[str], repeats: int
+) -> List[float]:
+    pages = market_pages(market)
+    latencies = []
+    # Один проход по страницам занимает миллисекунды и сильно зависит от
+    # диска, поэтому проходов несколько, каждый в новую базу
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = PriceStore(str(Path(tmp_dir) / "prices.db"))
+            try:
+                for game_name, listings in pages:
+                    started = time.perf_counter()
+                    best_prices: Dict[str, int] = {}
+                    for listing in listings:
+                        price = best_prices.get(listing.title)
+                        if price is None or listing.price_cents < price:
+                            best_prices[listing.title] = listing.price_cents
+                    store.record_prices(best_prices, game_name)
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                store.close()
+    return latencies
+
+
+def peak_memory(run: Callable[[], Awaitable[Any]]) -> float:
+    """Возвращает пиковую память прогона в МБ."""
+    tracemalloc.start()
+    try:
+        asyncio.run(run())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def run(
+    size: int,
+    repeats: int,
+    latency: float,
+    seed: int,
+    measure_memory: bool,
+    only: List[str],
+    base_url: Optional[str] = None,
+    stub: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Выполняет замеры для рынка из size предметов (поровну между играми).
+
+    Args:
+        base_url: Адрес сервера API с тем же рынком (None - рынок отвечает без HTTP)
+        stub: Параметры DMarketStubServer, запускаемого на время каждого замера
+    """
+    market = SyntheticMarket(items_per_game=max(1, size // len(GAME_IDS)), seed=seed)
+    items = market.total_items
+
+    # Замер -> (прогон, число проходов по страницам; None - задержки целых проходов)
+    benches = {
+        "analyze_items": (lambda url: bench_analyze_items(market, latency, url, repeats), repeats),
+        "full_scan": (lambda url: bench_full_scan(market, latency, url, repeats), None),
+        "rescan": (lambda url: bench_rescan(market, latency, url, repeats), None),
+        "persist": (lambda url: bench_persist(market, latency, url, repeats), repeats),
+    }
+
+    def scenario_for(
+        bench: Callable[[Optional[str]], Awaitable[List[float]]]
+    ) -> Callable[[], Awaitable[List[float]]]:
+        async def scenario() -> List[float]:
+            if stub is None:
+                return await bench(base_url)
+            async with DMarketStubServer(market, **stub) as server:
+                return await bench(server.base_url)
+
+        return scenario
+
+    scenarios = {
+        name: (scenario_for(bench), page_passes) for name, (bench, page_passes) in benches.items()
+    }
+
+    benchmarks = {}
+    for name, (scenario, page_passes) in scenarios.items():
+        if name not in only:
+            continue
+        latencies = asyncio.run(scenario())
+        peak_mb = peak_memory(scenario) if measure_memory else None
+        samples = np.array(latencies)
+        # Страничные замеры делят суммарное время на число проходов по рынку,
+        # замеры проходов усредняют время целого прохода
+        seconds_per_pass = (
+            float(samples.sum()) / page_passes if page_passes else float(samples.mean())
+        )
+        benchmarks[name] = {
+            "throughput": items / seconds_per_pass if seconds_per_pass > 0 else 0.0,
+            "p50_ms": float(np.percentile(samples, 50) * 1000),
+            "p99_ms": float(np.percentile(samples, 99) * 1000),
+            "samples": len(samples),
+            "peak_mb": peak_mb,
+        }
+
+    return {"items": items, "benchmarks": benchmarks}
+
+
+def merge_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Объединяет результаты нескольких прогонов одного размера.
+
+    Пропускная способность и задержки - медианы прогонов, пиковая память -
+    максимум: медиана не дает одному прогону на занятой машине сдвинуть эталон.
+    """
+    benchmarks = {}
+    for name in runs[0]["benchmarks"]:
+        samples = [result["benchmarks"][name] for result in runs]
+        peaks = [bench["peak_mb"] for bench in samples if bench["peak_mb"] is not None]
+        benchmarks[name] = {
+            "throughput": float(np.median([bench["throughput"] for bench in samples])),
+            "p50_ms": float(np.median([bench["p50_ms"] for bench in samples])),
+            "p99_ms": float(np.median([bench["p99_ms"] for bench in samples])),
+            "samples": sum(bench["samples"] for bench in samples),
+            "peak_mb": max(peaks) if peaks else None,
+        }
+    return {"items": runs[0]["items"], "benchmarks": benchmarks}
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Сравнивает результаты с эталоном.
+
+    Returns:
+        Описания регрессий: пропускная способность ниже эталона или пиковая
+        память выше эталона больше чем на tolerance
+    """
+    reference = {result["items"]: result["benchmarks"] for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base_benchmarks = reference.get(result["items"])
+        if base_benchmarks is None:
+            continue
+        for name, current in result["benchmarks"].items():
+            base = base_benchmarks.get(name)
+            if base is None:
+                continue
+            if current["throughput"] < base["throughput"] * (1 - tolerance):
+                regressions.append(
+                    f"{name} @ {result['items']}: {current['throughput']:.0f} предм./с "
+                    f"против {base['throughput']:.0f} в эталоне"
+                )
+            if (
+                current["peak_mb"] is not None
+                and base.get("peak_mb") is not None
+                and current["peak_mb"] > base["peak_mb"] * (1 + tolerance)
+            ):
+                regressions.append(
+                    f"{name} @ {result['items']}: пиковая память {current['peak_mb']:.1f} МБ "
+                    f"против {base['peak_mb']:.1f} МБ в эталоне"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Замер конвейера анализа рынка на синтетическом рынке"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Количества предметов рынка (поровну между играми)",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Количество повторов проходов в одном прогоне"
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=1,
+        help="Количество прогонов каждого размера; в отчет идут медианы (для эталона)",
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа API, секунды")
+    parser.add_argument(
+        "--stub", action="store_true", help="Запрашивать рынок по HTTP у локального заменителя API"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Случайная добавка к задержке заменителя, секунды"
+    )
+    parser.add_argument(
+        "--throttle-share", type=float, default=0.0, help="Доля ответов 429 заменителя"
+    )
+    parser.add_argument(
+        "--base-url",
+        type=str,
+        default=None,
+        help="Адрес запущенного сервера API с тем же рынком (--sizes и --seed)",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора рынка")
+    parser.add_argument(
+        "--only",
+        type=str,
+        nargs="+",
+        choices=BENCHMARKS,
+        default=list(BENCHMARKS),
+        help="Выполнить только указанные замеры",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="Не замерять пиковую память")
+    parser.add_argument("--json", type=str, default=None, help="Файл для сохранения результатов")
+    parser.add_argument(
+        "--save-baseline",
+        nargs="?",
+        const=str(DEFAULT_BASELINE),
+        default=None,
+        help="Сохранить результаты как эталон (по умолчанию benchmarks/baseline.json)",
+    )
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        const=str(DEFAULT_BASELINE),
+        default=None,
+        help="Сравнить результаты с эталоном (по умолчанию benchmarks/baseline.json)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Допустимое ухудшение относительно эталона (доля)",
+    )
+    args = parser.parse_args()
+
+    # Сообщения о найденных возможностях не должны попадать в замер
+    logging.disable(logging.INFO)
+
+    # Задержку и ответы 429 заменителя создает сервер, а не клиент
+    stub = None
+    latency = args.latency
+    if args.stub:
+        stub = {
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "throttle_share": args.throttle_share,
+            "seed": args.seed,
+        }
+        latency = 0.0
+
+    results = []
+    print(
+        f"{'Предметов':>10} {'Замер':<14} {'Предм./с':>11} "
+        f"{'p50, мс':>9} {'p99, мс':>9} {'Память, МБ':>11}"
+    )
+    for size in args.sizes:
+        runs = [
+            run(
+                size,
+                args.repeats,
+                latency,
+                args.seed,
+                not args.no_memory,
+                args.only,
+                args.base_url,
+                stub,
+            )
+            for _ in range(max(1, args.runs))
+        ]
+        result = merge_runs(runs)
+        results.append(result)
+        for name, bench in result["benchmarks"].items():
+            peak = f"{bench['peak_mb']:.1f}" if bench["peak_mb"] is not None else "-"
+            print(
+                f"{result['items']:>10} {name:<14} {bench['throughput']:>11.0f} "
+                f"{bench['p50_ms']:>9.2f} {bench['p99_ms']:>9.2f} {peak:>11}"
+            )
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeats": args.repeats,
+        "runs": max(1, args.runs),
+        "latency": args.latency,
+        "transport": "stub" if args.stub else ("http" if args.base_url else "direct"),
+        "page_size": MARKET_PAGE_SIZE,
+        "results": results,
+    }
+
+    for target in (args.json, args.save_baseline):
+        if target:
+            path = Path(target)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nРегрессии относительно эталона:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nРегрессий относительно эталона нет")
+
+
+if __name__ == "__main__":
+    main()
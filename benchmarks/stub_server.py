@@ -0,0 +1,282 @@
+"""
+Локальный сервер-заменитель DMarket API для нагрузочного тестирования.
+
+Сервер aiohttp отвечает на /exchange/v1/market/items (с пагинацией по
+offset или cursor и ограничением размера страницы) и
+/exchange/v1/item-history/{itemId} данными SyntheticMarket: сгенерированными
+или загруженными из JSON с записанными ответами. Ответы задерживаются на
+latency плюс случайную добавку до jitter секунд. Ответ 429 с заголовком
+Retry-After возвращается на случайную долю запросов (throttle_share) и при
+превышении общего лимита частоты (rate_limit запросов в секунду), поэтому на
+сервере можно проверить пул соединений, ограничитель частоты и повторы
+клиента без расхода лимита настоящего API. Подписи запросов не проверяются.
+Ответы содержат ETag (хэш тела); на запрос с совпадающим If-None-Match
+возвращается 304 без тела, что позволяет проверить HTTP-кэш клиента.
+
+Счетчики запросов доступны по GET /stub/stats.
+
+Запуск:
+    python benchmarks/stub_server.py --items-per-game 2500 --port 8800 --latency 0.05 --jitter 0.02
+    python benchmarks/stub_server.py --data results/market.json \
+        --throttle-share 0.05 --rate-limit 50
+
+Клиенты направляются на сервер переменной окружения DMARKET_API_URL
+(например, DMARKET_API_URL=http://127.0.0.1:8800) или параметром base_url.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic_market import (
+    ITEM_HISTORY_ENDPOINT,
+    MARKET_ITEMS_ENDPOINT,
+    SyntheticMarket,
+)
+
+
+class TokenBucket:
+    """Лимит частоты сервера: rate запросов в секунду с запасом burst."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """Берет токен; возвращает 0 или время в секундах до появления токена."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class DMarketStubServer:
+    """
+    Сервер-заменитель DMarket API.
+
+    Пример использования:
+        async with DMarketStubServer(SyntheticMarket(1000), latency=0.02) as server:
+            api = SimpleDMarketAPI(key, secret, base_url=server.base_url)
+    """
+
+    def __init__(
+        self,
+        market: SyntheticMarket,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_share: float = 0.0,
+        rate_limit: float = 0.0,
+        retry_after: float = 1.0,
+        max_page_size: int = 100,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            market: Данные рынка
+            latency: Базовая задержка ответа, секунды
+            jitter: Максимальная случайная добавка к задержке, секунды
+            throttle_share: Доля запросов, на которые возвращается 429
+            rate_limit: Лимит частоты запросов в секунду (0 - без лимита)
+            retry_after: Значение Retry-After для случайных ответов 429, секунды
+            max_page_size: Максимальный размер страницы market/items
+            seed: Зерно генератора задержек и ответов 429
+        """
+        self.market = market
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_share = throttle_share
+        self.retry_after = retry_after
+        self.max_page_size = max_page_size
+        self._bucket = TokenBucket(rate_limit) if rate_limit > 0 else None
+        self._rng = random.Random(seed)
+
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+
+        # Статистика по эндпоинтам
+        self.requests: Dict[str, int] = {"market": 0, "history": 0}
+        self.throttled: Dict[str, int] = {"market": 0, "history": 0}
+        self.not_modified: Dict[str, int] = {"market": 0, "history": 0}
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(MARKET_ITEMS_ENDPOINT, self._market_items)
+        app.router.add_get(ITEM_HISTORY_ENDPOINT + "{item_id}", self._item_history)
+        app.router.add_get("/stub/stats", self._stats)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Запускает сервер.
+
+        Args:
+            host: Адрес
+            port: Порт (0 - свободный порт)
+
+        Returns:
+            Базовый URL сервера для клиентов
+        """
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "DMarketStubServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.stop()
+
+    async def _respond(
+        self, request: web.Request, kind: str, endpoint: str, params: Dict[str, Any]
+    ) -> web.Response:
+        """Отвечает с задержкой, 429 или 304; kind - группа статистики."""
+        self.requests[kind] += 1
+
+        retry_after = None
+        if self._bucket is not None:
+            wait = self._bucket.take()
+            if wait > 0:
+                retry_after = wait
+        if (
+            retry_after is None
+            and self.throttle_share > 0
+            and self._rng.random() < self.throttle_share
+        ):
+            retry_after = self.retry_after
+
+        delay = self.latency + (self._rng.uniform(0.0, self.jitter) if self.jitter > 0 else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if retry_after is not None:
+            self.throttled[kind] += 1
+            return web.json_response(
+                {"error": "Too Many Requests"},
+                status=429,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+        body = json.dumps(self.market.respond(endpoint, params)).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified[kind] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+    async def _market_items(self, request: web.Request) -> web.Response:
+        params: Dict[str, Any] = dict(request.query)
+        try:
+            params["limit"] = min(int(params.get("limit", self.max_page_size)), self.max_page_size)
+            params["offset"] = int(params.get("offset", 0))
+        except ValueError:
+            return web.json_response({"error": "Некорректные параметры пагинации"}, status=400)
+        return await self._respond(request, "market", MARKET_ITEMS_ENDPOINT, params)
+
+    async def _item_history(self, request: web.Request) -> web.Response:
+        return await self._respond(request, "history", request.path, dict(request.query))
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.get_stats())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(self.requests),
+            "throttled": dict(self.throttled),
+            "not_modified": dict(self.not_modified),
+            "items": self.market.total_items,
+        }
+
+
+async def serve(server: DMarketStubServer, host: str, port: int) -> None:
+    base_url = await server.start(host, port)
+    print(f"Заменитель DMarket API запущен: {base_url} (предметов: {server.market.total_items})")
+    print(f"Для клиентов: DMARKET_API_URL={base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        print(f"Статистика: {json.dumps(server.get_stats(), ensure_ascii=False)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальный заменитель DMarket API")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Адрес")
+    parser.add_argument("--port", type=int, default=8800, help="Порт")
+    parser.add_argument("--items-per-game", type=int, default=1000, help="Предложений каждой игры")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора рынка и ответов")
+    parser.add_argument(
+        "--data",
+        type=str,
+        default=None,
+        help="JSON с рынком (SyntheticMarket.save или записанные ответы) вместо генерации",
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, секунды")
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Случайная добавка к задержке, секунды"
+    )
+    parser.add_argument(
+        "--throttle-share", type=float, default=0.0, help="Доля запросов с ответом 429"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help="Лимит запросов в секунду, сверх которого отвечать 429 (0 - без лимита)",
+    )
+    parser.add_argument(
+        "--retry-after", type=float, default=1.0, help="Retry-After случайных ответов 429, секунды"
+    )
+    parser.add_argument(
+        "--max-page-size", type=int, default=100, help="Максимальный размер страницы рынка"
+    )
+    args = parser.parse_args()
+
+    market = (
+        SyntheticMarket.load(args.data)
+        if args.data
+        else SyntheticMarket(args.items_per_game, seed=args.seed)
+    )
+    server = DMarketStubServer(
+        market,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_share=args.throttle_share,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        max_page_size=args.max_page_size,
+        seed=args.seed,
+    )
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Синтетический рынок DMarket для замеров и локального тестирования.
+
+Генератор с фиксированным зерном создает предложения всех игр GAME_IDS в
+формате ответа /exchange/v1/market/items (цены, ордера на покупку) и
+истории продаж в формате /exchange/v1/item-history/<itemId>. У каждого
+названия предмета есть "справедливая" цена, вокруг которой разбросаны
+цены предложений и продаж; небольшая доля предложений выставлена заметно
+ниже нее, чтобы анализатор находил возможности.
+
+Рынок можно сохранить в JSON и загрузить обратно, в том числе из записанных
+ответов настоящего API в том же формате.
+
+Пример использования:
+    market = SyntheticMarket(items_per_game=1000, seed=42)
+    params = {"gameId": "a8db", "limit": 100, "offset": 0}
+    page = market.respond("/exchange/v1/market/items", params)
+    market.save("results/market.json")
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+# Идентификаторы игр, как в simple_arbitrage_test.GAME_IDS
+GAME_IDS = {"CS2": "a8db", "DOTA2": "9a92", "TF2": "tf2", "RUST": "rust"}
+
+MARKET_ITEMS_ENDPOINT = "/exchange/v1/market/items"
+ITEM_HISTORY_ENDPOINT = "/exchange/v1/item-history/"
+
+
+def _price(cents: int) -> Dict[str, str]:
+    """Объект цены DMarket в долларах."""
+    return {"USD": f"{cents // 100}.{cents % 100:02d}"}
+
+
+class SyntheticMarket:
+    """
+    Детерминированный рынок всех игр.
+
+    Attributes:
+        items: gameId -> предложения в формате API (по возрастанию itemId)
+        histories: itemId -> история продаж в формате API (последние продажи первыми)
+    """
+
+    def __init__(
+        self,
+        items_per_game: int,
+        seed: int = 42,
+        listings_per_title: int = 5,
+        underpriced_share: float = 0.05,
+        max_history: int = 10,
+        games: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Args:
+            items_per_game: Количество предложений каждой игры
+            seed: Зерно генератора
+            listings_per_title: Среднее количество предложений одного названия
+            underpriced_share: Доля предложений заметно ниже справедливой цены
+            max_history: Максимальное количество продаж в истории предложения
+            games: Игры (по умолчанию GAME_IDS)
+        """
+        self.seed = seed
+        self.items_per_game = items_per_game
+        self.items: Dict[str, List[Dict[str, Any]]] = {}
+        self.histories: Dict[str, List[Dict[str, Any]]] = {}
+        # (gameId, priceFrom, priceTo) -> предложения в диапазоне цен,
+        # чтобы не фильтровать рынок на каждой странице
+        self._filtered: Dict[tuple, List[Dict[str, Any]]] = {}
+
+        rng = random.Random(seed)
+        for game_name, game_id in (games or GAME_IDS).items():
+            num_titles = max(1, items_per_game // max(listings_per_title, 1))
+            # Справедливые цены названий: от $1 до $100, дешевых предметов больше
+            fair_prices = [int(100 * 100 ** rng.random()) for _ in range(num_titles)]
+            objects = []
+            for index in range(items_per_game):
+                title_index = rng.randrange(num_titles)
+                fair = fair_prices[title_index]
+                discount = (
+                    rng.uniform(0.6, 0.8)
+                    if rng.random() < underpriced_share
+                    else rng.uniform(0.95, 1.25)
+                )
+                price = max(1, int(fair * discount))
+                item_id = f"{game_id}-{index:07d}"
+                objects.append(
+                    {
+                        "itemId": item_id,
+                        "title": f"{game_name} item {title_index}",
+                        "gameId": game_id,
+                        "price": _price(price),
+                        "buyOrders": [
+                            {
+                                "price": _price(max(1, int(fair * rng.uniform(0.7, 0.97)))),
+                                "amount": rng.randint(1, 5),
+                            }
+                            for _ in range(rng.randint(0, 3))
+                        ],
+                    }
+                )
+                self.histories[item_id] = [
+                    {
+                        "price": _price(max(1, int(fair * rng.uniform(0.9, 1.1)))),
+                        "date": 1700000000 - sale * 3600,
+                    }
+                    for sale in range(rng.randint(0, max_history))
+                ]
+            self.items[game_id] = objects
+
+    @property
+    def total_items(self) -> int:
+        return sum(len(objects) for objects in self.items.values())
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Сохраняет предложения и истории продаж в JSON."""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(
+            json.dumps({"items": self.items, "histories": self.histories}), encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "SyntheticMarket":
+        """
+        Загружает рынок из JSON.
+
+        Файл содержит {"items": {gameId: [предложения]}, "histories": {itemId: [продажи]}}
+        в формате ответов API; так можно воспроизвести записанные данные DMarket.
+        """
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        market = cls(items_per_game=0, games={})
+        market.items = data.get("items", {})
+        market.histories = data.get("histories", {})
+        market.items_per_game = max((len(objects) for objects in market.items.values()), default=0)
+        return market
+
+    def market_page(
+        self,
+        game_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        price_from: Optional[int] = None,
+        price_to: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Возвращает страницу предложений игры.
+
+        Args:
+            game_id: Идентификатор игры
+            limit: Размер страницы
+            offset: Смещение
+            price_from: Минимальная цена в центах
+            price_to: Максимальная цена в центах
+            cursor: Курсор из предыдущего ответа; если указан, заменяет offset
+
+        Returns:
+            Ответ в формате /exchange/v1/market/items; cursor указывает на
+            следующую страницу, если она есть
+        """
+        if cursor:
+            offset = int(cursor)
+        objects = self.items.get(game_id, [])
+        if price_from is not None or price_to is not None:
+            key = (game_id, price_from, price_to)
+            filtered = self._filtered.get(key)
+            if filtered is None:
+                low = price_from if price_from is not None else 0
+                high = price_to if price_to is not None else float("inf")
+                filtered = self._filtered[key] = [
+                    obj for obj in objects if low <= self._cents(obj) <= high
+                ]
+            objects = filtered
+        page = objects[offset : offset + limit]
+        response = {"objects": page, "total": {"items": len(objects)}}
+        if offset + len(page) < len(objects):
+            response["cursor"] = str(offset + len(page))
+        return response
+
+    @staticmethod
+    def _cents(obj: Dict[str, Any]) -> int:
+        dollars, cents = obj["price"]["USD"].split(".")
+        return int(dollars) * 100 + int(cents)
+
+    def item_history(self, item_id: str, limit: int = 10) -> Dict[str, Any]:
+        """Возвращает историю продаж предложения в формате /exchange/v1/item-history."""
+        return {"history": self.histories.get(item_id, [])[:limit]}
+
+    def respond(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Отвечает на GET-запрос к API так же, как DMarket.
+
+        Args:
+            endpoint: Путь запроса
+            params: Query параметры
+
+        Returns:
+            Тело ответа; для неизвестного пути - {"error": ...}
+        """
+        params = params or {}
+        if endpoint == MARKET_ITEMS_ENDPOINT:
+            return self.market_page(
+                game_id=str(params.get("gameId", "a8db")),
+                limit=int(params.get("limit", 100)),
+                offset=int(params.get("offset", 0)),
+                price_from=int(params["priceFrom"]) if "priceFrom" in params else None,
+                price_to=int(params["priceTo"]) if "priceTo" in params else None,
+                cursor=params.get("cursor"),
+            )
+        if endpoint.startswith(ITEM_HISTORY_ENDPOINT):
+            return self.item_history(
+                endpoint[len(ITEM_HISTORY_ENDPOINT) :], int(params.get("limit", 10))
+            )
+        return {"error": f"Неизвестный эндпоинт: {endpoint}"}
@@ -9,6 +9,7 @@ import sys
 import argparse
 import logging
 import asyncio
+import functools
 import os
 import shutil
 from pathlib import Path
@@ -320,6 +321,8 @@ def main() -> int:
     Returns:
         int: Код возврата (0 - успех, 1 - ошибка)
     """
+    from src.arbitrage.scan_daemon import positive_interval
+    
     parser = argparse.ArgumentParser(description='DMarket Trading Bot')
     
     parser.add_argument('--component', choices=['trading', 'telegram', 'arbitrage', 'ml', 'keyboards', 'simple-telegram'], 
@@ -329,6 +332,14 @@ def main() -> int:
     
     parser.add_argument('--install-deps', action='store_true', help='Установить недостающие зависимости')
     
+    parser.add_argument('--daemon', action='store_true',
+                        help='Для компонента arbitrage: повторять сканирование по расписанию '
+                             'в одном процессе')
+    
+    parser.add_argument('--interval', type=positive_interval, default=None,
+                        help='Интервал между циклами сканирования в секундах '
+                             '(по умолчанию CHECK_INTERVAL)')
+    
     args = parser.parse_args()
     
     # Установка уровня логирования
@@ -424,6 +435,17 @@ def main() -> int:
                         return 1
                 
         elif args.component == 'arbitrage':
+            if args.daemon:
+                # Долгоживущий процесс: сессия API, кэши и снимки рынка сохраняются между циклами
+                # Ключи API проверяет run_daemon: импорт модуля не завершает процесс
+                try:
+                    from simple_arbitrage_test import run_daemon
+                    from src.arbitrage.scan_daemon import CHECK_INTERVAL
+                except ImportError as e:
+                    logger.error(f"Не удалось импортировать режим демона сканирования: {e}")
+                    return 1
+                interval = args.interval if args.interval is not None else CHECK_INTERVAL
+                return run_component(functools.partial(run_daemon, interval))
             try:
                 from src.arbitrage.dmarket_arbitrage_finder import main as arbitrage_main
                 return run_component(arbitrage_main)
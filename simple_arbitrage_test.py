@@ -6,6 +6,7 @@
 для поиска потенциально прибыльных возможностей покупки и продажи.
 """
 
+import argparse
 import os
 import sys
 import json
@@ -18,10 +19,49 @@ import hashlib
 import hmac
 import base64
 import uuid
-from typing import Dict, List, Any, Optional, Tuple, Set, Union
+import signal
+from operator import attrgetter
+from typing import (
+    Dict, List, Any, Optional, Tuple, Set, Union, AsyncIterator, Awaitable, Callable, Sequence
+)
 from pathlib import Path
 from dotenv import load_dotenv
 
+from src.api.exceptions import APIError, RateLimitError
+from src.api.http_cache import HTTP_CACHE_ENABLED, CachingTransport
+from src.api.rate_limiter import RateLimiter, get_rate_limiter, parse_retry_after
+from src.api.request_coalescer import RequestCoalescer, get_request_coalescer
+from src.api.transport import HTTPTransport, Transport, create_transport, iter_body_chunks
+from src.arbitrage.bellman_ford import (
+    ArbitrageCycle,
+    find_all_arbitrage_opportunities_async,
+    quotes_from_order_books,
+)
+from src.arbitrage.incremental_scanner import IncrementalScanner
+from src.arbitrage.linear_programming import PortfolioOptimizer, PortfolioSelection
+from src.arbitrage.order_book import OrderBook, OrderBooks
+from src.arbitrage.polling_scheduler import POLL_REQUEST_BUDGET, PollingScheduler
+from src.arbitrage.records import (
+    MARKET_ITEM_FIELDS,
+    RANK_ATTRS,
+    MarketItem,
+    Opportunity,
+    build_market_items,
+)
+from src.arbitrage.scan_daemon import CHECK_INTERVAL, ScanDaemon, positive_interval
+from src.arbitrage.scoring import add_history_columns, build_listing_columns, select_top_rows_async
+from src.arbitrage.stat_arbitrage import MeanReversionSignal, RollingPriceStats
+from src.db.price_store import PriceStore
+from src.utils.json_stream import ArrayItemParser, loads as json_loads
+from src.utils.instrumentation import (
+    METRICS_EXPORT_PATH, STAGE_HISTORY_FETCH, STAGE_MARKET_FETCH, STAGE_NOTIFY, STAGE_PARSE,
+    STAGE_PERSIST, STAGE_SCORE, Instrumentation, get_instrumentation
+)
+from src.utils.top_k import TopKSelector
+from src.utils.parallel_processor import PARALLEL_SCORING, ParallelProcessor
+from src.utils.price import format_usd, usd_to_cents
+from src.utils.ttl_cache import CACHE_TTL, TTLCache
+
 # Загрузка переменных окружения
 load_dotenv()
 
@@ -45,9 +85,41 @@ logger = logging.getLogger("simple_arbitrage_test")
 DMARKET_API_KEY = os.getenv("DMARKET_API_KEY")
 DMARKET_API_SECRET = os.getenv("DMARKET_API_SECRET")
 
-if not DMARKET_API_KEY or not DMARKET_API_SECRET:
-    logger.critical("Не указаны DMARKET_API_KEY или DMARKET_API_SECRET в файле .env")
-    sys.exit(1)
+# Базовый URL DMarket API; для нагрузочных тестов - адрес локального заменителя
+# (benchmarks/stub_server.py)
+DMARKET_API_URL = os.getenv("DMARKET_API_URL", "https://api.dmarket.com").rstrip("/")
+
+# Настройки пула HTTP-соединений
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "30"))
+API_POOL_LIMIT = int(os.getenv("API_POOL_LIMIT", "100"))
+API_POOL_LIMIT_PER_HOST = int(os.getenv("API_POOL_LIMIT_PER_HOST", "20"))
+API_KEEPALIVE_TIMEOUT = float(os.getenv("API_KEEPALIVE_TIMEOUT", "30"))
+API_DNS_CACHE_TTL = int(os.getenv("API_DNS_CACHE_TTL", "300"))
+
+# Количество повторных попыток после ответа 429
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+
+# Максимальное количество одновременных запросов истории продаж
+HISTORY_CONCURRENCY = int(os.getenv("HISTORY_CONCURRENCY", "10"))
+
+# Общий лимит одновременных запросов к API для всех игр
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "20"))
+
+# Кэш историй продаж: максимальное количество предметов и файл для сохранения между запусками
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "50000"))
+HISTORY_CACHE_PATH = os.getenv("HISTORY_CACHE_PATH", "")
+
+# Количество лучших возможностей, сохраняемых для каждой игры
+TOP_K_OPPORTUNITIES = int(os.getenv("TOP_K_OPPORTUNITIES", "50"))
+
+# Размер страницы при постраничном обходе рынка
+MARKET_PAGE_SIZE = int(os.getenv("MARKET_PAGE_SIZE", "100"))
+
+# Сохранять лучшие цены предметов за проход в таблицу item_prices (DATABASE_URL), только изменения
+STORE_PRICES = os.getenv("STORE_PRICES", "false").lower() == "true"
+
+# Искать циклы покупка-продажа по книгам заявок (алгоритм Беллмана-Форда) после каждого прохода
+FIND_CYCLES = os.getenv("FIND_CYCLES", "false").lower() == "true"
 
 # Идентификаторы игр для DMarket API
 GAME_IDS = {
@@ -57,57 +129,350 @@ GAME_IDS = {
     "RUST": "rust"
 }
 
-class SimpleDMarketAPI:
-    """Простая обертка для DMarket API."""
+
+def check_api_keys() -> bool:
+    """
+    Проверяет, что ключи DMarket API заданы.
+    
+    Проверка выполняется при запуске анализа, а не при импорте модуля,
+    чтобы импорт (например, из run.py) не завершал процесс.
     
-    def __init__(self, api_key: str, api_secret: str, base_url: str = "https://api.dmarket.com"):
+    Returns:
+        True, если ключи заданы; иначе в лог пишется критическая ошибка
+    """
+    if not DMARKET_API_KEY or not DMARKET_API_SECRET:
+        logger.critical("Не указаны DMARKET_API_KEY или DMARKET_API_SECRET в файле .env")
+        return False
+    return True
+
+
+class SimpleDMarketAPI:
+    """
+    Простая обертка для DMarket API.
+
+    Клиент владеет одной долгоживущей сессией aiohttp с пулом соединений,
+    поэтому последовательные запросы переиспользуют TCP/TLS соединения.
+    Сессия создается лениво при первом запросе и закрывается через close()
+    или при выходе из блока `async with`.
+
+    Все запросы проходят через общий для процесса RateLimiter, который
+    адаптирует скорость по ответам 429 и заголовку Retry-After. Одинаковые
+    одновременные GET-запросы объединяются через RequestCoalescer и
+    выполняются один раз.
+
+    Запросы отправляются через транспорт (src.api.transport), который может
+    записывать ответы в кассету или воспроизводить их без сети
+    (API_TRANSPORT_MODE); при воспроизведении ограничитель частоты не нужен.
+    При HTTP_CACHE_ENABLED=true GET-ответы сети кэшируются на диске
+    (src.api.http_cache); запросы, на которые отвечает кэш, не расходуют лимит
+    и не учитываются в задержках запросов.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        base_url: str = DMARKET_API_URL,
+        pool_limit: int = API_POOL_LIMIT,
+        pool_limit_per_host: int = API_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = API_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = API_DNS_CACHE_TTL,
+        request_timeout: float = API_TIMEOUT,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = API_RETRIES,
+        coalescer: Optional[RequestCoalescer] = None,
+        metrics: Optional[Instrumentation] = None,
+        transport: Optional[Transport] = None
+    ):
         self.api_key = api_key
         self.api_secret = api_secret.encode('utf-8')
         self.base_url = base_url
         self.logger = logging.getLogger("SimpleDMarketAPI")
-    
+
+        # Параметры пула соединений
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.request_timeout = request_timeout
+
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        # Ограничение частоты запросов
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.max_retries = max_retries
+
+        # Объединение одинаковых одновременных GET-запросов
+        self.coalescer = coalescer or get_request_coalescer()
+
+        # Гистограммы задержек запросов по эндпоинтам
+        self.metrics = metrics or get_instrumentation()
+
+        # Транспорт запросов: сеть, запись в кассету или воспроизведение
+        if transport is None:
+            transport = create_transport(self._get_session)
+            # Кэшируются только ответы сети: кассета должна содержать полные ответы
+            if HTTP_CACHE_ENABLED and isinstance(transport, HTTPTransport):
+                transport = CachingTransport(transport)
+        self.transport = transport
+        if isinstance(transport, CachingTransport):
+            self.metrics.register_cache("http", transport.get_stats)
+
+    async def __aenter__(self) -> "SimpleDMarketAPI":
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает общую сессию клиента, создавая ее при необходимости.
+
+        Returns:
+            Сессия aiohttp с настроенным пулом соединений
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+            self.logger.debug(
+                f"Создана HTTP-сессия: limit={self.pool_limit}, "
+                f"limit_per_host={self.pool_limit_per_host}, keepalive={self.keepalive_timeout}s"
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Закрывает транспорт (сохраняя записанную кассету) и HTTP-сессию с соединениями пула."""
+        await self.transport.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     async def _make_request(self, method: str, endpoint: str, params: Dict = None, data: Dict = None) -> Dict:
         """
         Выполняет запрос к DMarket API.
-        
+
         Args:
             method: HTTP метод (GET, POST, etc.)
             endpoint: Эндпоинт API
             params: Query параметры для GET запросов
             data: Данные для POST запросов
-            
+
+        Returns:
+            Ответ от API в виде словаря. Ответ на GET-запрос может быть общим
+            для нескольких вызывающих, поэтому изменять его нельзя.
+
+        Raises:
+            RateLimitError: Если лимит запросов превышен после всех повторных попыток
+            APIError: Если API вернул ошибку
+        """
+        method = method.upper()
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
+
+        if method == "GET":
+            key = RequestCoalescer.make_key(method, f"{self.base_url}{endpoint}", params)
+            return await self.coalescer.run(
+                key, lambda: self._send_request(method, endpoint, params, data)
+            )
+
+        return await self._send_request(method, endpoint, params, data)
+
+    async def _make_streamed_request(
+        self,
+        endpoint: str,
+        params: Dict,
+        fields: Optional[Sequence[str]],
+        array_key: str = "objects",
+        on_items: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ) -> Dict:
+        """
+        Выполняет GET-запрос, разбирая массив array_key ответа потоково.
+
+        Элементы массива декодируются по мере получения тела ответа, и у них
+        остаются только поля fields. Без on_items одинаковые одновременные
+        запросы объединяются, как в _make_request.
+
+        Args:
+            endpoint: Эндпоинт API
+            params: Query параметры
+            fields: Поля элементов (None - все поля)
+            array_key: Ключ массива в ответе
+            on_items: Функция, получающая элементы по мере разбора; тогда массив в ответе пуст
+
+        Returns:
+            Ответ от API в виде словаря
+        """
+        fields = tuple(fields) if fields is not None else None
+
+        def handler(response: Any) -> Awaitable[Dict]:
+            return self._handle_stream_response(response, array_key, fields, on_items)
+
+        if on_items is not None:
+            return await self._send_request("GET", endpoint, params, handler=handler)
+
+        key = RequestCoalescer.make_key("GET", f"{self.base_url}{endpoint}", params)
+        key += (array_key, fields)
+        return await self.coalescer.run(
+            key, lambda: self._send_request("GET", endpoint, params, handler=handler)
+        )
+
+    async def _send_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Dict = None,
+        data: Dict = None,
+        handler: Optional[Callable[[Any], Awaitable[Any]]] = None
+    ) -> Any:
+        """
+        Отправляет запрос с учетом ограничения частоты и повторяет его после ответа 429.
+
+        Args:
+            method: HTTP метод в верхнем регистре (GET или POST)
+            endpoint: Эндпоинт API
+            params: Query параметры для GET запросов
+            data: Данные для POST запросов
+            handler: Обработчик ответа (по умолчанию _handle_response)
+
         Returns:
             Ответ от API в виде словаря
         """
         url = f"{self.base_url}{endpoint}"
-        headers = self._generate_headers(method, endpoint, data)
-        
-        async with aiohttp.ClientSession() as session:
-            if method.upper() == "GET":
-                async with session.get(url, headers=headers, params=params) as response:
-                    return await self._handle_response(response)
-            elif method.upper() == "POST":
-                async with session.post(url, headers=headers, json=data) as response:
-                    return await self._handle_response(response)
-                    
-    async def _handle_response(self, response: aiohttp.ClientResponse) -> Dict:
+        rate_limited = self.transport.rate_limited
+        handler = handler or self._handle_response
+
+        for attempt in range(self.max_retries + 1):
+            # Время отправки запроса к API; None - ответ получен из HTTP-кэша
+            started: Optional[float] = None
+
+            async def on_send() -> Dict[str, str]:
+                nonlocal started
+                # Ответ из HTTP-кэша не ждет ограничителя и не расходует лимит частоты
+                if rate_limited:
+                    await self.rate_limiter.acquire(endpoint)
+                started = time.perf_counter()
+                # Подпись содержит время и nonce, поэтому генерируется для каждой отправки
+                return self._generate_headers(method, endpoint, data)
+
+            def observe(status: int) -> None:
+                # Ответы кэша не искажают гистограммы задержек сети
+                if started is not None:
+                    self.metrics.observe_request(endpoint, time.perf_counter() - started, status)
+
+            try:
+                async with self.transport.request(
+                    method,
+                    url,
+                    params=params if method == "GET" else None,
+                    json_body=data if method == "POST" else None,
+                    on_send=on_send
+                ) as response:
+                    result = await handler(response)
+            except RateLimitError as e:
+                observe(429)
+                if rate_limited:
+                    self.rate_limiter.record_rate_limited(endpoint, e.retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                self.logger.warning(
+                    f"Превышен лимит запросов к {endpoint}, "
+                    f"попытка {attempt + 1}/{self.max_retries}"
+                )
+                continue
+            except APIError as e:
+                observe(e.status or 0)
+                raise
+            except Exception:
+                observe(0)
+                raise
+
+            observe(200)
+            if rate_limited and started is not None:
+                self.rate_limiter.record_success(endpoint)
+            return result
+
+    async def _handle_response(self, response: Any) -> Dict:
         """
         Обрабатывает ответ от DMarket API.
         
+        Тело декодируется целиком быстрым декодером (ujson, если установлен).
+        
         Args:
-            response: Ответ от aiohttp.ClientSession
+            response: Ответ транспорта (aiohttp.ClientResponse или RecordedResponse)
             
         Returns:
             Обработанный ответ в виде словаря
             
         Raises:
-            Exception: Если статус ответа не 200 OK
+            RateLimitError: Если API вернул 429 Too Many Requests
+            APIError: Если статус ответа не 200 OK
         """
+        await self._check_response(response)
+        return await response.json(loads=json_loads)
+    
+    async def _handle_stream_response(
+        self,
+        response: Any,
+        array_key: str,
+        fields: Optional[Tuple[str, ...]],
+        on_items: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ) -> Dict:
+        """
+        Обрабатывает ответ, разбирая массив array_key по мере получения тела.
+        
+        Returns:
+            Ответ в виде словаря; без on_items массив содержит элементы с полями fields
+            
+        Raises:
+            RateLimitError: Если API вернул 429 Too Many Requests
+            APIError: Если статус ответа не 200 OK или тело некорректно
+        """
+        await self._check_response(response)
+        parser = ArrayItemParser(array_key, fields)
+        items: List[Dict[str, Any]] = []
+        emit = on_items or items.extend
+        try:
+            async for chunk in iter_body_chunks(response):
+                parsed = parser.feed(chunk)
+                if parsed:
+                    emit(parsed)
+            parsed = parser.close()
+        except ValueError as e:
+            raise APIError(f"Некорректный ответ API: {e}", status=response.status) from e
+        if parsed:
+            emit(parsed)
+        result = dict(parser.document)
+        result[array_key] = items
+        return result
+    
+    async def _check_response(self, response: Any) -> None:
+        """
+        Проверяет статус ответа.
+        
+        Raises:
+            RateLimitError: Если API вернул 429 Too Many Requests
+            APIError: Если статус ответа не 200 OK
+        """
+        if response.status == 429:
+            error_text = await response.text()
+            raise RateLimitError(
+                f"API Error: 429 - {error_text}",
+                retry_after=parse_retry_after(response.headers.get("Retry-After"))
+            )
+
         if response.status != 200:
             error_text = await response.text()
-            raise Exception(f"API Error: {response.status} - {error_text}")
-        
-        return await response.json()
+            raise APIError(f"API Error: {response.status} - {error_text}", status=response.status)
     
     def _generate_headers(self, method: str, endpoint: str, body: Dict = None) -> Dict:
         """
@@ -152,6 +517,36 @@ class SimpleDMarketAPI:
         
         return headers
     
+    @staticmethod
+    def _market_items_params(
+        game_id: str,
+        limit: int,
+        offset: int,
+        price_from: Optional[float],
+        price_to: Optional[float],
+        currency: str,
+        cursor: Optional[str]
+    ) -> Dict[str, Any]:
+        """Формирует query параметры запроса предметов рынка."""
+        params = {
+            'gameId': game_id,
+            'limit': limit,
+            'offset': offset,
+            'currency': currency
+        }
+        
+        # API ожидает цены в центах; round вместо int, чтобы 0.29 не стало 28 центами
+        if price_from is not None:
+            params['priceFrom'] = str(usd_to_cents(price_from))
+        
+        if price_to is not None:
+            params['priceTo'] = str(usd_to_cents(price_to))
+        
+        if cursor:
+            params['cursor'] = cursor
+        
+        return params
+    
     async def get_market_items(
         self, 
         game_id: str = 'a8db', 
@@ -159,7 +554,9 @@ class SimpleDMarketAPI:
         offset: int = 0, 
         price_from: float = None,
         price_to: float = None,
-        currency: str = 'USD'
+        currency: str = 'USD',
+        cursor: str = None,
+        fields: Optional[Sequence[str]] = None
     ) -> Dict[str, Any]:
         """
         Получает предметы с рынка DMarket.
@@ -171,33 +568,206 @@ class SimpleDMarketAPI:
             price_from: Минимальная цена
             price_to: Максимальная цена
             currency: Валюта
+            cursor: Курсор следующей страницы из предыдущего ответа (если API его вернул)
+            fields: Поля предметов, которые нужно оставить (например, MARKET_ITEM_FIELDS);
+                если указаны, страница разбирается потоково без декодирования остальных
+                полей в памяти
             
         Returns:
             Список предметов от API
         """
         endpoint = '/exchange/v1/market/items'
-        params = {
-            'gameId': game_id,
-            'limit': limit,
-            'offset': offset,
-            'currency': currency
-        }
-        
-        # Исправляем формат цен - преобразуем в центы (API ожидает цены в центах)
-        if price_from is not None:
-            # Переводим в центы и округляем до целого
-            params['priceFrom'] = str(int(price_from * 100))
-        
-        if price_to is not None:
-            # Переводим в центы и округляем до целого
-            params['priceTo'] = str(int(price_to * 100))
+        params = self._market_items_params(
+            game_id, limit, offset, price_from, price_to, currency, cursor
+        )
         
         try:
+            if fields is not None:
+                return await self._make_streamed_request(endpoint, params, fields)
             return await self._make_request('GET', endpoint, params=params)
         except Exception as e:
             self.logger.error(f"Ошибка при получении предметов: {e}")
-            return {"objects": []}
+            return {"objects": [], "error": str(e)}
+    
+    async def stream_market_items(
+        self,
+        game_id: str = 'a8db',
+        limit: int = 100,
+        offset: int = 0,
+        price_from: float = None,
+        price_to: float = None,
+        currency: str = 'USD',
+        cursor: str = None,
+        fields: Optional[Sequence[str]] = MARKET_ITEM_FIELDS,
+        page_info: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Получает страницу рынка, выдавая предметы по мере получения ответа.
+        
+        Первый предмет крупной страницы доступен до загрузки всей страницы,
+        а в памяти остаются только поля fields. Параметры совпадают с
+        get_market_items.
+        
+        Args:
+            page_info: Словарь, в который после обхода записываются остальные поля ответа
+                (cursor, total)
+            
+        Yields:
+            Предметы страницы
+            
+        Raises:
+            RateLimitError: Если лимит запросов превышен после всех повторных попыток
+            APIError: Если API вернул ошибку
+        """
+        endpoint = '/exchange/v1/market/items'
+        params = self._market_items_params(
+            game_id, limit, offset, price_from, price_to, currency, cursor
+        )
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        
+        async def fetch() -> Dict:
+            try:
+                return await self._make_streamed_request(
+                    endpoint, params, fields, on_items=queue.put_nowait
+                )
+            finally:
+                queue.put_nowait(finished)
+        
+        task = asyncio.ensure_future(fetch())
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is finished:
+                    break
+                for item in batch:
+                    yield item
+            response = await task
+            if page_info is not None:
+                page_info.update(
+                    (key, value) for key, value in response.items() if key != "objects"
+                )
+        finally:
+            if not task.done():
+                task.cancel()
 
+    async def iter_market_pages(
+        self,
+        game_id: str = 'a8db',
+        price_from: float = None,
+        price_to: float = None,
+        page_size: int = MARKET_PAGE_SIZE,
+        max_items: Optional[int] = None,
+        currency: str = 'USD',
+        fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Постранично обходит рынок DMarket.
+        
+        Следующая страница запрашивается сразу после получения текущей, поэтому
+        ее загрузка идет параллельно с обработкой текущей страницы. В памяти
+        одновременно находятся не более двух страниц. Обход завершается на
+        пустой или неполной странице либо при достижении max_items.
+        
+        Args:
+            game_id: Идентификатор игры
+            price_from: Минимальная цена
+            price_to: Максимальная цена
+            page_size: Количество предметов на странице
+            max_items: Максимальное общее количество предметов (None - весь рынок)
+            currency: Валюта
+            fields: Поля предметов, которые нужно оставить (None - все поля, см. get_market_items)
+            
+        Yields:
+            Списки предметов очередной страницы
+        """
+        def request_page(offset: int, cursor: Optional[str], limit: int) -> "asyncio.Future":
+            return asyncio.ensure_future(self.get_market_items(
+                game_id=game_id,
+                limit=limit,
+                offset=offset,
+                price_from=price_from,
+                price_to=price_to,
+                currency=currency,
+                cursor=cursor,
+                fields=fields
+            ))
+        
+        fetched = 0
+        first_limit = page_size if max_items is None else min(page_size, max_items)
+        next_page: Optional[asyncio.Future] = request_page(0, None, first_limit)
+        
+        try:
+            while next_page is not None:
+                response = await next_page
+                next_page = None
+                
+                if "error" in response:
+                    # Неполный обход нельзя выдавать за весь рынок
+                    raise APIError(f"Не удалось получить страницу рынка: {response['error']}")
+                
+                items = response.get("objects", [])
+                if not items:
+                    break
+                
+                requested = first_limit if fetched == 0 else page_size
+                fetched += len(items)
+                
+                remaining = None if max_items is None else max_items - fetched
+                if len(items) >= requested and (remaining is None or remaining > 0):
+                    # Запускаем загрузку следующей страницы до передачи текущей
+                    limit = page_size if remaining is None else min(page_size, remaining)
+                    next_page = request_page(fetched, response.get("cursor"), limit)
+                
+                yield items
+        finally:
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+
+    async def iter_market_items(
+        self,
+        game_id: str = 'a8db',
+        price_from: float = None,
+        price_to: float = None,
+        page_size: int = MARKET_PAGE_SIZE,
+        max_items: Optional[int] = None,
+        currency: str = 'USD',
+        fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Обходит все предметы рынка по одному, загружая страницы с упреждением.
+        
+        Параметры совпадают с iter_market_pages.
+        
+        Yields:
+            Предметы рынка
+        """
+        pages = self.iter_market_pages(
+            game_id, price_from, price_to, page_size, max_items, currency, fields
+        )
+        try:
+            async for page in pages:
+                for item in page:
+                    yield item
+        finally:
+            await pages.aclose()
+
+    @staticmethod
+    def _item_history_request(item_id: str, limit: int) -> Tuple[str, Dict[str, Any]]:
+        """Формирует эндпоинт и query параметры запроса истории продаж предмета."""
+        return f'/exchange/v1/item-history/{item_id}', {'limit': limit}
+    
+    async def invalidate_item_history(self, item_id: str, limit: int = 10) -> None:
+        """
+        Помечает сохраненную в HTTP-кэше историю продаж предмета устаревшей.
+        
+        Следующий get_item_history с тем же limit обратится к API (условным
+        запросом, если у ответа есть ETag или Last-Modified).
+        """
+        endpoint, params = self._item_history_request(item_id, limit)
+        await self.transport.invalidate('GET', f"{self.base_url}{endpoint}", params)
+    
     async def get_item_history(self, item_id: str, limit: int = 10) -> Dict[str, Any]:
         """
         Получает историю продаж предмета.
@@ -209,22 +779,111 @@ class SimpleDMarketAPI:
         Returns:
             История продаж предмета
         """
-        endpoint = f'/exchange/v1/item-history/{item_id}'
-        params = {
-            'limit': limit
-        }
+        endpoint, params = self._item_history_request(item_id, limit)
         
         try:
             return await self._make_request('GET', endpoint, params=params)
         except Exception as e:
             self.logger.error(f"Ошибка при получении истории предмета: {e}")
-            return {"history": []}
+            return {"history": [], "error": str(e)}
 
 
 class ArbitrageAnalyzer:
-    def __init__(self, api_key: str, api_secret: str):
-        self.api = SimpleDMarketAPI(api_key, api_secret)
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        history_concurrency: int = HISTORY_CONCURRENCY,
+        max_concurrent_requests: int = MAX_CONCURRENT_REQUESTS,
+        history_cache_ttl: float = CACHE_TTL,
+        history_cache_size: int = HISTORY_CACHE_SIZE,
+        history_cache_path: Optional[str] = HISTORY_CACHE_PATH or None,
+        top_k: int = TOP_K_OPPORTUNITIES,
+        rank_by: str = "profit_percent",
+        incremental: bool = True,
+        price_store: Optional[PriceStore] = None,
+        poll_budget: int = POLL_REQUEST_BUDGET,
+        metrics: Optional[Instrumentation] = None,
+        base_url: str = DMARKET_API_URL
+    ):
+        # Время этапов сканирования; при INSTRUMENTATION_ENABLED=false замеры почти бесплатны
+        self.metrics = metrics or get_instrumentation()
+        
+        self.api = SimpleDMarketAPI(api_key, api_secret, base_url=base_url, metrics=self.metrics)
         self.logger = logging.getLogger("ArbitrageAnalyzer")
+        
+        # Максимальное количество одновременных запросов истории продаж
+        self.history_concurrency = history_concurrency
+        
+        # Общий бюджет одновременных запросов, разделяемый всеми играми
+        self.max_concurrent_requests = max_concurrent_requests
+        self._request_budget: Optional[asyncio.Semaphore] = None
+        
+        # Кэш историй продаж по itemId; при указании пути переживает перезапуск
+        self.history_cache = TTLCache(
+            ttl=history_cache_ttl,
+            maxsize=history_cache_size,
+            persist_path=history_cache_path
+        )
+        
+        # Для каждой игры сохраняются только top_k лучших возможностей по полю rank_by
+        self.top_k = top_k
+        self.rank_by = rank_by
+        
+        # Пул процессов для оценки крупных страниц (PARALLEL_SCORING);
+        # используется, когда это окупается
+        self.parallel_processor: Optional[ParallelProcessor] = (
+            ParallelProcessor(use_processes=True) if PARALLEL_SCORING else None
+        )
+        
+        # Снимки рынка между вызовами: повторно оцениваются только изменившиеся предметы
+        self.scanner: Optional[IncrementalScanner] = IncrementalScanner() if incremental else None
+        
+        # Приоритетный опрос: бюджет запросов истории на проход игры тратится сначала
+        # на горячие предметы
+        self.poll_scheduler: Optional[PollingScheduler] = (
+            PollingScheduler(poll_budget) if incremental and poll_budget > 0 else None
+        )
+        
+        # Книги заявок по играм (лучшие цены, глубина, поиск циклов);
+        # в инкрементальном режиме обновляются изменениями страниц
+        self.order_books: Dict[str, OrderBooks] = {}
+        
+        # Скользящая статистика лучших цен предложений (одна точка на предмет за проход) по играм
+        self.price_stats: Dict[str, RollingPriceStats] = {}
+        
+        # Хранилище цен; по умолчанию включается переменной окружения STORE_PRICES
+        if price_store is None and STORE_PRICES:
+            price_store = PriceStore()
+        self.price_store = price_store
+        
+        self.metrics.register_cache("history", self.history_cache.get_stats)
+
+    async def __aenter__(self) -> "ArbitrageAnalyzer":
+        await self.api.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Сохраняет кэш историй продаж и закрывает HTTP-сессию API клиента."""
+        self.history_cache.save()
+        if self.price_store is not None:
+            self.price_store.close()
+        if self.parallel_processor is not None:
+            await self.parallel_processor.close_async()
+        await self.api.close()
+    
+    def _get_request_budget(self) -> asyncio.Semaphore:
+        """
+        Возвращает общий для всех игр семафор одновременных запросов к API.
+        
+        Семафор создается лениво, чтобы он принадлежал работающему циклу событий.
+        """
+        if self._request_budget is None:
+            self._request_budget = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._request_budget
     
     async def analyze_game(
         self, 
@@ -233,43 +892,160 @@ class ArbitrageAnalyzer:
         price_from: float = 1.0, 
         price_to: float = 100.0, 
         min_profit_percent: float = 5.0,
-        max_items: int = 200
-    ) -> List[Dict[str, Any]]:
+        max_items: Optional[int] = 200,
+        top_k: Optional[int] = None,
+        full_results: bool = False
+    ) -> List[Opportunity]:
         """
         Анализирует предметы из указанной игры для поиска арбитражных возможностей.
         
+        Рынок обходится постранично: пока анализируется текущая страница,
+        следующая уже загружается. Если включен инкрементальный режим,
+        заново оцениваются только новые и изменившиеся с прошлого вызова
+        предметы, а возможности по исчезнувшим предметам снимаются. При
+        заданном бюджете запросов (POLL_REQUEST_BUDGET) предметы для оценки
+        выбирает PollingScheduler по приоритету после обхода всех страниц.
+        
         Args:
             game_id: Идентификатор игры для DMarket API
             game_name: Название игры для логирования
             price_from: Минимальная цена предметов
             price_to: Максимальная цена предметов
             min_profit_percent: Минимальный процент прибыли
-            max_items: Максимальное количество предметов для анализа
+            max_items: Максимальное количество предметов для анализа (None - весь рынок)
+            top_k: Количество лучших возможностей в результате (по умолчанию self.top_k)
+            full_results: Вернуть все найденные возможности без ограничения top_k
             
         Returns:
-            Список потенциально прибыльных предметов
+            Список потенциально прибыльных предметов по убыванию поля self.rank_by
         """
+        limit = None if full_results else (top_k if top_k is not None else self.top_k)
+        
         self.logger.info(f"Анализ игры {game_name} (ID: {game_id})")
         
-        try:
-            # Получаем предметы с рынка
-            response = await self.api.get_market_items(
-                game_id=game_id,
-                limit=max_items,
-                price_from=price_from,
-                price_to=price_to,
-                currency="USD"
+        pages = self.api.iter_market_pages(
+            game_id=game_id,
+            price_from=price_from,
+            price_to=price_to,
+            max_items=max_items,
+            currency="USD",
+            fields=MARKET_ITEM_FIELDS
+        )
+        
+        # Снимок зависит от всех параметров, влияющих на состав и оценку предметов
+        scan = None
+        if self.scanner is not None:
+            scan = self.scanner.begin_pass(
+                f"{game_id}:{price_from}:{price_to}:{max_items}:{min_profit_percent}"
             )
+            order_books = self.order_books.setdefault(game_name, OrderBooks())
+        else:
+            # Без снимка исчезнувшие предложения неизвестны,
+            # поэтому книги строятся заново на каждом проходе
+            order_books = self.order_books[game_name] = OrderBooks()
+        
+        try:
+            # Лучшие возможности отбираются потоково, без накопления всех найденных
+            selector = TopKSelector(limit, key=attrgetter(RANK_ATTRS[self.rank_by]))
+            items_count = 0
+            # Предметы прохода: по каждому в статистику цен добавляется одно наблюдение
+            titles: Set[str] = set()
             
-            items = response.get("objects", [])
-            if not items:
+            # При приоритетном опросе план составляется постранично: до конца прохода
+            # хранятся только кандидаты на запрос истории (не больше бюджета)
+            poll_round = None
+            if self.poll_scheduler is not None and scan is not None:
+                poll_round = self.poll_scheduler.begin(
+                    needs_request=lambda item: item.item_id not in self.history_cache
+                )
+            
+            # Время ожидания очередной страницы - этап загрузки рынка
+            fetch_started = time.perf_counter()
+            async for items in pages:
+                self.metrics.record_stage(
+                    STAGE_MARKET_FETCH, time.perf_counter() - fetch_started, len(items)
+                )
+                items_count += len(items)
+                self.logger.debug(f"Получена страница из {len(items)} предметов для {game_name}")
+                
+                # JSON страницы разбирается в компактные записи один раз;
+                # ордера попадают в книги заявок
+                with self.metrics.stage(STAGE_PARSE, len(items)):
+                    listings = build_market_items(items, order_books)
+                titles.update(item.title for item in listings)
+                
+                if scan is None:
+                    # Анализируем предметы страницы для поиска потенциально прибыльных
+                    selector.extend(await self._analyze_items(
+                        listings, min_profit_percent, game_name, top_k=limit
+                    ))
+                    fetch_started = time.perf_counter()
+                    continue
+                
+                # Снимок хранит все возможности, поэтому top_k здесь не применяется
+                changed = scan.filter_changed(listings)
+                if poll_round is not None:
+                    self.poll_scheduler.observe(listings)
+                    changed_ids = {item.item_id for item in changed}
+                    changed, deferred = poll_round.add(
+                        changed, (item for item in listings if item.item_id not in changed_ids)
+                    )
+                    scan.defer(deferred)
+                if changed:
+                    failed: List[MarketItem] = []
+                    opportunities = await self._analyze_items(
+                        changed, min_profit_percent, game_name, failed=failed
+                    )
+                    scan.update(changed, opportunities, failed)
+                fetch_started = time.perf_counter()
+            
+            if poll_round is not None:
+                plan = poll_round.finish()
+                scan.mark_rescored(plan.refresh)
+                # Досрочное обновление должно дойти до API, минуя оба кэша историй
+                for item in plan.refresh:
+                    self.history_cache.delete(item.item_id)
+                await asyncio.gather(
+                    *(self.api.invalidate_item_history(item.item_id) for item in plan.refresh)
+                )
+                if plan.rescore:
+                    failed = []
+                    opportunities = await self._analyze_items(
+                        plan.rescore, min_profit_percent, game_name, failed=failed
+                    )
+                    scan.update(plan.rescore, opportunities, failed)
+                self.logger.info(
+                    f"{game_name}: запросов истории {plan.requests} "
+                    f"из {self.poll_scheduler.budget}, "
+                    f"досрочно обновлено {len(plan.refresh)}, отложено {poll_round.deferred}"
+                )
+            
+            if scan is not None:
+                stats = scan.commit()
+                order_books.remove_orders(scan.removed)
+                if self.poll_scheduler is not None:
+                    self.poll_scheduler.forget(scan.removed)
+                self.logger.info(
+                    f"{game_name}: новых {stats['new']}, изменившихся {stats['changed']}, "
+                    f"без изменений {stats['unchanged']}, исчезло {stats['removed']} "
+                    f"(снято возможностей: {stats['retired']})"
+                )
+                selector.extend(self.scanner.opportunities(scan.key))
+            
+            # По каждому предмету прохода - одна цена: лучшая цена предложения из книги заявок
+            best_asks = self._best_asks(titles, order_books)
+            self._observe_prices(game_name, best_asks)
+            if self.price_store is not None and best_asks:
+                with self.metrics.stage(STAGE_PERSIST, len(best_asks)):
+                    await self.price_store.record_prices_async(best_asks, game_name)
+            
+            if not items_count:
                 self.logger.warning(f"Не найдены предметы для {game_name}")
                 return []
             
-            self.logger.info(f"Получено {len(items)} предметов для {game_name}")
+            self.logger.info(f"Получено {items_count} предметов для {game_name}")
             
-            # Анализируем предметы для поиска потенциально прибыльных
-            profitable_items = await self._analyze_items(items, min_profit_percent, game_name)
+            profitable_items = selector.result()
             
             self.logger.info(f"Найдено {len(profitable_items)} потенциально прибыльных предметов для {game_name}")
             return profitable_items
@@ -277,106 +1053,214 @@ class ArbitrageAnalyzer:
         except Exception as e:
             self.logger.error(f"Ошибка при анализе игры {game_name}: {e}")
             return []
+        finally:
+            await pages.aclose()
+    
+    def get_order_book(self, game_name: str, title: str) -> Optional[OrderBook]:
+        """
+        Возвращает книгу заявок предмета по данным последних проходов.
+        
+        В инкрементальном режиме книги обновляются изменениями страниц, иначе
+        содержат данные последнего прохода.
+        """
+        order_books = self.order_books.get(game_name)
+        return order_books.get(title) if order_books is not None else None
+    
+    @staticmethod
+    def _best_asks(titles: Set[str], order_books: OrderBooks) -> Dict[str, int]:
+        """Возвращает лучшие цены предложений предметов в центах по книгам заявок после прохода."""
+        best_asks = {}
+        for title in titles:
+            best_ask = order_books.best_ask(title)
+            if best_ask > 0:
+                best_asks[title] = best_ask
+        return best_asks
+    
+    def _observe_prices(self, game_name: str, best_asks: Dict[str, int]) -> None:
+        """
+        Добавляет в скользящую статистику игры одно наблюдение на предмет за проход.
+        
+        Наблюдение - лучшая цена предложения после прохода, поэтому окно
+        предмета - ряд его цен во времени, а не цены разных предложений одного
+        прохода (износ, наклейки).
+        """
+        if not best_asks:
+            return
+        stats = self.price_stats.get(game_name)
+        if stats is None:
+            stats = self.price_stats[game_name] = RollingPriceStats()
+        stats.update_many(list(best_asks), list(best_asks.values()))
+    
+    def mean_reversion_signals(
+        self,
+        limit: Optional[int] = None
+    ) -> Dict[str, List[MeanReversionSignal]]:
+        """
+        Возвращает возможности возврата цены к среднему по играм.
+        
+        Args:
+            limit: Количество сигналов с наибольшим |z| для каждой игры (по умолчанию self.top_k)
+            
+        Returns:
+            Сигналы по убыванию |z|
+        """
+        limit = self.top_k if limit is None else limit
+        return {game: stats.signals()[:limit] for game, stats in self.price_stats.items()}
+    
+    async def find_cycles(self, min_profit_percent: float = 0.0) -> Dict[str, List[ArbitrageCycle]]:
+        """
+        Ищет прибыльные циклы по лучшим ценам книг заявок каждой игры.
+        
+        Поиск выполняется в пуле потоков, цикл событий не блокируется.
+        
+        Args:
+            min_profit_percent: Минимальная прибыль цикла в процентах с учетом комиссии
+            
+        Returns:
+            Циклы по убыванию прибыли для каждой игры
+        """
+        cycles = {}
+        for game_name, order_books in self.order_books.items():
+            cycles[game_name] = await find_all_arbitrage_opportunities_async(
+                quotes_from_order_books(order_books),
+                min_profit_percent=min_profit_percent,
+                max_cycles=self.top_k
+            )
+        return cycles
+    
+    async def _fetch_sales_histories(
+        self,
+        items: List[MarketItem],
+        limit: int = 10
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Параллельно получает историю продаж для списка предметов.
+        
+        Истории, которые есть в кэше и не устарели, берутся из него.
+        Количество одновременных запросов ограничено семафором на
+        history_concurrency запросов и общим бюджетом запросов анализатора.
+        Ошибка для одного предмета не влияет на остальные: вместо его
+        истории возвращается None.
+        
+        Args:
+            items: Список предметов
+            limit: Лимит количества записей истории для каждого предмета
+            
+        Returns:
+            Истории продаж в том же порядке, что и предметы (None - история не загружена)
+        """
+        semaphore = asyncio.Semaphore(self.history_concurrency)
+        request_budget = self._get_request_budget()
+        
+        async def fetch_history(item: MarketItem) -> Optional[List[Dict[str, Any]]]:
+            item_id = item.item_id
+            cached_history = self.history_cache.get(item_id)
+            if cached_history is not None:
+                return cached_history
+            
+            async with semaphore, request_budget:
+                try:
+                    response = await self.api.get_item_history(item_id, limit=limit)
+                except Exception as e:
+                    self.logger.debug(f"Не удалось получить историю продаж для {item.title}: {e}")
+                    return None
+            
+            # Ответ с ошибкой не кэшируем, чтобы повторить запрос при следующем сканировании
+            if "error" in response:
+                return None
+            history = response.get("history", [])
+            self.history_cache.set(item_id, history)
+            return history
+        
+        # gather сохраняет порядок результатов в соответствии с порядком предметов
+        return await asyncio.gather(*(fetch_history(item) for item in items))
     
     async def _analyze_items(
         self, 
-        items: List[Dict[str, Any]], 
+        items: List[MarketItem], 
         min_profit_percent: float,
-        game_name: str
-    ) -> List[Dict[str, Any]]:
+        game_name: str,
+        top_k: Optional[int] = None,
+        failed: Optional[List[MarketItem]] = None
+    ) -> List[Opportunity]:
         """
         Анализирует список предметов для поиска потенциально прибыльных.
         
+        Цены и лучшие ордера на покупку предложений собираются в столбцы
+        NumPy, истории продаж подходящих предметов загружаются параллельно,
+        после чего прибыль всех предметов рассчитывается одним векторным
+        проходом. Предметы, историю которых не удалось загрузить, не
+        оцениваются: без истории средней ценой продажи считалась бы текущая
+        цена, и временная ошибка API давала бы ложную прибыль.
+        
         Args:
-            items: Список предметов
+            items: Записи предметов (build_market_items)
             min_profit_percent: Минимальный процент прибыли
             game_name: Название игры для логирования
+            top_k: Вернуть только top_k лучших предметов по полю self.rank_by (None - все)
+            failed: Список, в который добавляются неоцененные предметы без загруженной истории
             
         Returns:
-            Список потенциально прибыльных предметов
+            Список потенциально прибыльных предметов по убыванию поля self.rank_by
         """
-        profitable_items = []
+        # Этап 1: цены и ордера на покупку
+        with self.metrics.stage(STAGE_PARSE):
+            columns = build_listing_columns(items)
+        if not len(columns):
+            return []
         
-        for item in items:
-            try:
-                # Получаем основную информацию о предмете
-                item_name = item.get("title", "Неизвестный предмет")
-                item_id = item.get("itemId", "")
-                market_price = float(item.get("price", {}).get("USD", 0))
-                
-                if market_price <= 0:
-                    continue
-                
-                # Получаем ордера на покупку для этого предмета (если они есть)
-                buy_orders = item.get("buyOrders", [])
-                best_buy_order_price = 0.0
-                if buy_orders:
-                    # Находим лучшую цену покупки
-                    for order in buy_orders:
-                        order_price = float(order.get("price", {}).get("USD", 0))
-                        if order_price > best_buy_order_price:
-                            best_buy_order_price = order_price
-                
-                # Если нет ордеров на покупку, используем приблизительную оценку
-                if best_buy_order_price <= 0:
-                    # Оценка цены покупки как 90% от рыночной цены
-                    estimated_buy_price = market_price * 0.9
-                    best_buy_order_price = estimated_buy_price
-                
-                # Получаем историю продаж, если доступно
-                sales_history = []
-                try:
-                    # Получаем данные о последних продажах
-                    sales_history_response = await self.api.get_item_history(item_id, limit=10)
-                    sales_history = sales_history_response.get("history", [])
-                except Exception as e:
-                    self.logger.debug(f"Не удалось получить историю продаж для {item_name}: {e}")
-                
-                # Рассчитываем среднюю цену продаж, если есть история
-                avg_sale_price = 0.0
-                if sales_history:
-                    sale_prices = [float(sale.get("price", {}).get("USD", 0)) for sale in sales_history]
-                    if sale_prices:
-                        avg_sale_price = sum(sale_prices) / len(sale_prices)
-                else:
-                    # Если нет истории продаж, используем текущую рыночную цену
-                    avg_sale_price = market_price
-                
-                # Рассчитываем потенциальную прибыль
-                potential_profit = avg_sale_price - best_buy_order_price
-                profit_percent = (potential_profit / best_buy_order_price) * 100 if best_buy_order_price > 0 else 0
-                
-                # Проверяем, соответствует ли предмет критериям прибыльности
-                if profit_percent >= min_profit_percent:
-                    # Собираем информацию о прибыльном предмете
-                    profitable_item = {
-                        "name": item_name,
-                        "id": item_id,
-                        "current_price": market_price,
-                        "buy_price": best_buy_order_price,
-                        "avg_sale_price": avg_sale_price,
-                        "potential_profit": potential_profit,
-                        "profit_percent": profit_percent,
-                        "sales_history_count": len(sales_history),
-                        "game": game_name
-                    }
-                    
-                    profitable_items.append(profitable_item)
-                    
-                    # Логируем найденную возможность
-                    self.logger.info(f"Найден потенциально прибыльный предмет: {item_name} в игре {game_name}")
-                    self.logger.info(f"  Цена покупки: ${best_buy_order_price:.2f}, "
-                                   f"Средняя цена продажи: ${avg_sale_price:.2f}, "
-                                   f"Прибыль: ${potential_profit:.2f} ({profit_percent:.2f}%)")
-            
-            except Exception as e:
-                item_name = item.get("title", "Неизвестный предмет")
-                self.logger.error(f"Ошибка при анализе предмета {item_name}: {e}")
-                continue
+        # Этап 2: параллельная загрузка историй продаж
+        with self.metrics.stage(STAGE_HISTORY_FETCH, len(items)):
+            histories = await self._fetch_sales_histories(items, limit=10)
+        if any(history is None for history in histories):
+            if failed is not None:
+                failed.extend(item for item, history in zip(items, histories) if history is None)
+            loaded = [row for row, history in enumerate(histories) if history is not None]
+            items = [items[row] for row in loaded]
+            histories = [histories[row] for row in loaded]
+            if not items:
+                return []
+            columns = build_listing_columns(items)
+        with self.metrics.stage(STAGE_PARSE):
+            add_history_columns(columns, histories)
         
-        # Сортируем результаты по проценту прибыли (по убыванию)
-        profitable_items.sort(key=lambda x: x["profit_percent"], reverse=True)
+        # Этап 3: векторный расчет прибыли (крупные страницы - по срезам в пуле процессов)
+        with self.metrics.stage(STAGE_SCORE, len(items)):
+            rows, scores = await select_top_rows_async(
+                columns, min_profit_percent, top_k, self.rank_by, processor=self.parallel_processor
+            )
         
+            profitable_items = []
+            for position, row in enumerate(rows.tolist()):
+                item = items[row]
+                profitable_item = Opportunity(
+                    item_id=item.item_id,
+                    name=item.title,
+                    game=game_name,
+                    current_price_cents=item.price_cents,
+                    buy_price_cents=int(scores.buy_price_cents[position]),
+                    avg_sale_price_cents=int(scores.avg_sale_price_cents[position]),
+                    profit_cents=int(scores.profit_cents[position]),
+                    profit_percent=float(scores.profit_percent[position]),
+                    sales_history_count=int(columns.sale_count[row])
+                )
+                profitable_items.append(profitable_item)
+            
+                # Логируем найденную возможность
+                self.logger.info(
+                    f"Найден потенциально прибыльный предмет: {item.title} в игре {game_name}"
+                )
+                self.logger.info(
+                    f"  Цена покупки: ${format_usd(profitable_item.buy_price_cents)}, "
+                    f"Средняя цена продажи: ${format_usd(profitable_item.avg_sale_price_cents)}, "
+                    f"Прибыль: ${format_usd(profitable_item.profit_cents)} "
+                    f"({profitable_item.profit_percent:.2f}%)"
+                )
+        
+        if self.poll_scheduler is not None:
+            self.poll_scheduler.record_scored(items, columns.sale_count.tolist(), profitable_items)
+        
+        # Строки уже упорядочены по полю ранжирования (по убыванию)
         return profitable_items
 
     async def analyze_all_games(
@@ -384,23 +1268,29 @@ class ArbitrageAnalyzer:
         price_from: float = 1.0,
         price_to: float = 100.0,
         min_profit_percent: float = 5.0,
-        max_items_per_game: int = 200
-    ) -> Dict[str, List[Dict[str, Any]]]:
+        max_items_per_game: Optional[int] = 200,
+        top_k: Optional[int] = None,
+        full_results: bool = False
+    ) -> Dict[str, List[Opportunity]]:
         """
         Анализирует все поддерживаемые игры для поиска арбитражных возможностей.
         
+        Игры сканируются одновременно, поэтому общее время примерно равно
+        времени анализа самой медленной игры.
+        
         Args:
             price_from: Минимальная цена предметов
             price_to: Максимальная цена предметов
             min_profit_percent: Минимальный процент прибыли
             max_items_per_game: Максимальное количество предметов для анализа в каждой игре
+                (None - весь рынок)
+            top_k: Количество лучших возможностей для каждой игры (по умолчанию self.top_k)
+            full_results: Вернуть все найденные возможности без ограничения top_k
             
         Returns:
             Словарь с результатами анализа по играм
         """
-        results = {}
-        
-        for game_name, game_id in GAME_IDS.items():
+        async def analyze_game_timed(game_name: str, game_id: str) -> List[Opportunity]:
             start_time = time.time()
             self.logger.info(f"Начинаем анализ игры {game_name}...")
             
@@ -410,27 +1300,71 @@ class ArbitrageAnalyzer:
                 price_from=price_from,
                 price_to=price_to,
                 min_profit_percent=min_profit_percent,
-                max_items=max_items_per_game
+                max_items=max_items_per_game,
+                top_k=top_k,
+                full_results=full_results
             )
             
-            results[game_name] = opportunities
-            
             elapsed_time = time.time() - start_time
             self.logger.info(f"Анализ игры {game_name} завершен за {elapsed_time:.2f} сек. "
                            f"Найдено {len(opportunities)} возможностей.")
-            
-            # Добавляем задержку между запросами к разным играм, чтобы не перегружать API
-            await asyncio.sleep(1)
+            return opportunities
+        
+        # Игры анализируются параллельно; нагрузку на API ограничивает общий
+        # бюджет запросов (_get_request_budget) вместо фиксированной паузы между играми
+        game_names = list(GAME_IDS.keys())
+        game_results = await asyncio.gather(
+            *(analyze_game_timed(game_name, GAME_IDS[game_name]) for game_name in game_names),
+            return_exceptions=True
+        )
+        
+        results = {}
+        for game_name, game_result in zip(game_names, game_results):
+            if isinstance(game_result, Exception):
+                self.logger.error(f"Ошибка при анализе игры {game_name}: {game_result}")
+                game_result = []
+            results[game_name] = game_result
+        
+        cache_stats = self.history_cache.get_stats()
+        self.logger.info(f"Кэш историй продаж: попаданий {cache_stats['hits']}, "
+                         f"промахов {cache_stats['misses']}, "
+                         f"вытеснений {cache_stats['evictions']}, "
+                         f"размер {cache_stats['size']}")
+        
+        coalescer_stats = self.api.coalescer.get_stats()
+        self.logger.info(f"GET-запросов выполнено: {coalescer_stats['executed']}, "
+                         f"сэкономлено объединением одинаковых запросов: "
+                         f"{coalescer_stats['coalesced']}")
+        
+        if self.poll_scheduler is not None:
+            self.logger.info(f"Приоритетный опрос: {self.poll_scheduler.get_stats()}")
+        
+        flagged = sum(len(stats.flagged) for stats in self.price_stats.values())
+        if flagged:
+            self.logger.info(f"Предметов с ценой вдали от скользящего среднего: {flagged}")
+        
+        if self.metrics.enabled:
+            self.logger.info(f"Этапы сканирования: {self.metrics.summary()}")
+            if METRICS_EXPORT_PATH:
+                self.metrics.export(METRICS_EXPORT_PATH)
         
         return results
 
-    def save_results(self, results: Dict[str, List[Dict[str, Any]]], filename: str = None):
+    def save_results(
+        self,
+        results: Dict[str, List[Opportunity]],
+        filename: str = None,
+        portfolio: Optional[PortfolioSelection] = None,
+        cycles: Optional[Dict[str, List[ArbitrageCycle]]] = None
+    ):
         """
         Сохраняет результаты анализа в JSON-файл.
         
         Args:
             results: Результаты анализа
             filename: Имя файла для сохранения (по умолчанию генерируется на основе текущей даты и времени)
+            portfolio: Портфель, выбранный в пределах бюджета
+            cycles: Прибыльные циклы по играм (find_cycles)
         """
         if filename is None:
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -445,12 +1379,30 @@ class ArbitrageAnalyzer:
         # Подготавливаем данные для сохранения
         output_data = {
             "timestamp": datetime.datetime.now().isoformat(),
-            "results": results,
+            "results": {
+                game: [opportunity.to_dict() for opportunity in opportunities]
+                for game, opportunities in results.items()
+            },
             "summary": {
                 "total_opportunities": sum(len(opportunities) for opportunities in results.values()),
                 "opportunities_per_game": {game: len(opportunities) for game, opportunities in results.items()}
             }
         }
+        if portfolio is not None:
+            output_data["portfolio"] = portfolio.to_dict()
+        
+        signals = self.mean_reversion_signals()
+        if any(signals.values()):
+            output_data["mean_reversion"] = {
+                game: [signal.to_dict() for signal in game_signals]
+                for game, game_signals in signals.items()
+            }
+        
+        if cycles is not None:
+            output_data["cycles"] = {
+                game: [cycle.to_dict() for cycle in game_cycles]
+                for game, game_cycles in cycles.items()
+            }
         
         # Сохраняем результаты в файл
         with open(file_path, "w", encoding="utf-8") as f:
@@ -460,12 +1412,17 @@ class ArbitrageAnalyzer:
         
         return file_path
 
-    def print_summary(self, results: Dict[str, List[Dict[str, Any]]]):
+    def print_summary(
+        self,
+        results: Dict[str, List[Opportunity]],
+        portfolio: Optional[PortfolioSelection] = None
+    ):
         """
         Выводит сводку результатов анализа.
         
         Args:
             results: Результаты анализа
+            portfolio: Портфель, выбранный в пределах бюджета
         """
         total_opportunities = sum(len(opportunities) for opportunities in results.values())
         
@@ -490,48 +1447,150 @@ class ArbitrageAnalyzer:
                 print("-" * 80)
                 
                 for item in opportunities[:5]:
-                    print("{:<40} ${:<9.2f} ${:<9.2f} ${:<9.2f} {:<9.2f}%".format(
-                        item["name"][:38], 
-                        item["buy_price"], 
-                        item["avg_sale_price"], 
-                        item["potential_profit"], 
-                        item["profit_percent"]))
+                    print("{:<40} ${:<9} ${:<9} ${:<9} {:<9.2f}%".format(
+                        item.name[:38], 
+                        format_usd(item.buy_price_cents), 
+                        format_usd(item.avg_sale_price_cents), 
+                        format_usd(item.profit_cents), 
+                        item.profit_percent))
+        
+        if portfolio is not None:
+            print(f"\nПортфель в пределах бюджета ${format_usd(portfolio.budget_cents)}: "
+                  f"{len(portfolio.selected)} предметов "
+                  f"на ${format_usd(portfolio.total_cost_cents)}, "
+                  f"ожидаемая прибыль ${format_usd(portfolio.expected_profit_cents)} "
+                  f"({portfolio.method})")
+            for game, cost in portfolio.cost_by_game().items():
+                print(f"  {game}: ${format_usd(cost)}")
         
         print("\n" + "="*80)
         print(f"Результаты анализа сохранены в директории 'results'")
         print("="*80 + "\n")
 
 
-async def main():
-    """Главная функция скрипта."""
-    logger.info("Запуск упрощенного анализа арбитражных возможностей на DMarket")
-    
-    # Создаем анализатор арбитража
-    analyzer = ArbitrageAnalyzer(DMARKET_API_KEY, DMARKET_API_SECRET)
-    
-    # Настройки для анализа
-    price_from = 1.0  # Минимальная цена предметов в USD
-    price_to = 100.0  # Максимальная цена предметов в USD
-    min_profit_percent = 5.0  # Минимальный процент прибыли
-    max_items_per_game = 50  # Максимальное количество предметов для анализа в каждой игре
-    
+# Настройки анализа
+PRICE_FROM = 1.0  # Минимальная цена предметов в USD
+PRICE_TO = 100.0  # Максимальная цена предметов в USD
+MIN_PROFIT_PERCENT = 5.0  # Минимальный процент прибыли
+MAX_ITEMS_PER_GAME = 50  # Максимальное количество предметов для анализа в каждой игре
+
+
+async def run_scan(
+    analyzer: ArbitrageAnalyzer,
+    print_results: bool = True
+) -> Dict[str, List[Opportunity]]:
+    """
+    Выполняет один цикл анализа: поиск возможностей, выбор портфеля, сохранение результатов.
+
+    Args:
+        analyzer: Анализатор арбитража (его сессия и кэши переиспользуются между циклами)
+        print_results: Выводить сводку результатов в консоль
+
+    Returns:
+        Результаты анализа по играм
+    """
     # Анализируем все игры
     results = await analyzer.analyze_all_games(
-        price_from=price_from,
-        price_to=price_to,
-        min_profit_percent=min_profit_percent,
-        max_items_per_game=max_items_per_game
+        price_from=PRICE_FROM,
+        price_to=PRICE_TO,
+        min_profit_percent=MIN_PROFIT_PERCENT,
+        max_items_per_game=MAX_ITEMS_PER_GAME
     )
     
+    # Выбираем набор покупок в пределах бюджета (DEFAULT_BUDGET) и лимитов по играм;
+    # точное решение может занять до OPTIMIZATION_TIME_LIMIT, поэтому вне цикла событий
+    optimizer = PortfolioOptimizer()
+    loop = asyncio.get_running_loop()
+    portfolio = await loop.run_in_executor(None, optimizer.optimize_results, results)
+    
+    # Циклы покупка-продажа по книгам заявок (FIND_CYCLES)
+    cycles = await analyzer.find_cycles(MIN_PROFIT_PERCENT) if FIND_CYCLES else None
+    
     # Сохраняем результаты в файл
-    analyzer.save_results(results)
+    with analyzer.metrics.stage(STAGE_PERSIST):
+        analyzer.save_results(results, portfolio=portfolio, cycles=cycles)
     
     # Выводим сводку результатов
-    analyzer.print_summary(results)
+    if print_results:
+        with analyzer.metrics.stage(STAGE_NOTIFY):
+            analyzer.print_summary(results, portfolio=portfolio)
+    
+    return results
+
+
+async def main():
+    """Главная функция скрипта."""
+    logger.info("Запуск упрощенного анализа арбитражных возможностей на DMarket")
+    
+    # Создаем анализатор арбитража; HTTP-сессия закрывается при выходе из блока
+    async with ArbitrageAnalyzer(DMARKET_API_KEY, DMARKET_API_SECRET) as analyzer:
+        await run_scan(analyzer)
     
     logger.info("Анализ арбитражных возможностей завершен")
 
 
+async def run_daemon(interval: float = CHECK_INTERVAL, max_cycles: Optional[int] = None) -> int:
+    """
+    Запускает анализ по расписанию в одном процессе.
+
+    Анализатор создается один раз: HTTP-сессия, кэш историй продаж и
+    снимки инкрементального сканирования сохраняются между циклами.
+    Останавливается по SIGINT/SIGTERM после текущего цикла.
+
+    Args:
+        interval: Интервал между циклами в секундах (по умолчанию CHECK_INTERVAL)
+        max_cycles: Остановиться после указанного количества циклов
+        
+    Returns:
+        Код возврата: 0 - успех, 1 - не заданы ключи API
+    """
+    if not check_api_keys():
+        return 1
+    
+    logger.info(
+        f"Запуск анализа арбитражных возможностей в режиме демона (интервал {interval:g} сек.)"
+    )
+    
+    async with ArbitrageAnalyzer(DMARKET_API_KEY, DMARKET_API_SECRET) as analyzer:
+        async def scan_cycle() -> Dict[str, List[Opportunity]]:
+            results = await run_scan(analyzer, print_results=False)
+            # Кэш сохраняется после каждого цикла, чтобы пережить аварийную остановку
+            analyzer.history_cache.save()
+            return results
+        
+        daemon = ScanDaemon(scan_cycle, interval=interval, max_cycles=max_cycles)
+        
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, daemon.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows: обработчики сигналов в цикле событий не поддерживаются
+                pass
+        
+        await daemon.run()
+        logger.info(f"Статистика демона: {daemon.get_stats()}")
+    
+    logger.info("Режим демона завершен")
+    return 0
+
+
 if __name__ == "__main__":
-    # Запускаем асинхронную функцию main
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Поиск арбитражных возможностей на DMarket")
+    parser.add_argument("--daemon", action="store_true", help="Повторять анализ по расписанию")
+    parser.add_argument(
+        "--interval",
+        type=positive_interval,
+        default=CHECK_INTERVAL,
+        help="Интервал между циклами в секундах"
+    )
+    args = parser.parse_args()
+    
+    if not check_api_keys():
+        sys.exit(1)
+    
+    if args.daemon:
+        asyncio.run(run_daemon(args.interval))
+    else:
+        # Запускаем асинхронную функцию main
+        asyncio.run(main())
@@ -0,0 +1,6 @@
+"""
+Пакет DMarket Trading Bot.
+
+Содержит переиспользуемые компоненты бота: работу с API, алгоритмы арбитража
+и вспомогательные утилиты. Скрипты в корне проекта импортируют их отсюда.
+"""
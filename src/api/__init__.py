@@ -0,0 +1,3 @@
+"""
+Инфраструктура клиентов DMarket API.
+"""
@@ -0,0 +1,21 @@
+"""
+Исключения, используемые клиентами DMarket API.
+"""
+
+from typing import Optional
+
+
+class APIError(Exception):
+    """Ошибка ответа DMarket API."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class RateLimitError(APIError):
+    """API вернул 429 Too Many Requests."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message, status=429)
+        self.retry_after = retry_after
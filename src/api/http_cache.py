@@ -0,0 +1,441 @@
+"""
+HTTP-кэш GET-запросов DMarket API с хранением на диске.
+
+CachingTransport оборачивает транспорт клиента (src.api.transport):
+
+    hit   - ответ моложе TTL эндпоинта отдается с диска без запроса к API
+    stale - запись устарела: если у нее есть ETag или Last-Modified, запрос
+            отправляется с If-None-Match / If-Modified-Since, и ответ 304
+            продлевает запись без загрузки тела; иначе ответ загружается заново
+    miss  - записи нет, ответ загружается и сохраняется
+
+Сохраняются только ответы 200 эндпоинтов с ненулевым TTL или с
+валидаторами (ETag, Last-Modified). Ответ передается вызывающему частями по
+мере получения (потоковый разбор страниц не ждет всего тела) и сохраняется
+после полного чтения. Тела хранятся в SQLite сжатыми zlib,
+поэтому кэш переживает перезапуск и холодный старт не загружает заново
+медленно меняющиеся данные (истории продаж, справочники игр).
+
+Ключ записи - схема и адрес сервера вместе с ключом запроса кассеты
+(src.api.transport.request_key), поэтому ответы настоящего API и
+локального заменителя (DMARKET_API_URL) не смешиваются в одном файле.
+
+TTL задается по группам эндпоинтов (первые три сегмента пути, как у
+ограничителя частоты): HTTP_CACHE_TTLS="/exchange/v1/item-history=600,/exchange/v1/market/items=0";
+для остальных групп действует HTTP_CACHE_TTL.
+
+Пример использования:
+    transport = CachingTransport(HTTPTransport(get_session), HTTPCacheStore("cache/http_cache.db"))
+    metrics.register_cache("http", transport.get_stats)
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Union
+from urllib.parse import urlsplit
+
+from src.api.rate_limiter import default_endpoint_key
+from src.api.transport import OnSend, RecordedResponse, Transport, iter_body_chunks, request_key
+from src.utils.ttl_cache import CACHE_TTL
+
+logger = logging.getLogger("http_cache")
+
+# Включить HTTP-кэш GET-запросов
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "false").lower() == "true"
+
+# Файл базы HTTP-кэша
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "cache/http_cache.db")
+
+# TTL ответов эндпоинтов без отдельной настройки (секунды)
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "300"))
+
+# TTL по группам эндпоинтов: "группа=секунды,..." (0 - только ревалидация по ETag/Last-Modified)
+HTTP_CACHE_TTLS = os.getenv("HTTP_CACHE_TTLS", "")
+
+# Максимальное количество записей; при превышении удаляются самые старые
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "200000"))
+
+# TTL по умолчанию: страницы рынка меняются постоянно, истории продаж - медленно
+DEFAULT_ENDPOINT_TTLS = {
+    "/exchange/v1/market": 0.0,
+    "/exchange/v1/item-history": CACHE_TTL,
+}
+
+# Количество записей между фиксациями транзакции
+COMMIT_INTERVAL = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS http_cache (
+    key TEXT NOT NULL,
+    endpoint VARCHAR(255) NOT NULL,
+    etag VARCHAR(255),
+    last_modified VARCHAR(64),
+    content_type VARCHAR(100),
+    stored_at FLOAT NOT NULL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (key)
+);
+CREATE INDEX IF NOT EXISTS ix_http_cache_stored_at ON http_cache (stored_at);
+"""
+
+
+def parse_endpoint_ttls(value: str) -> Dict[str, float]:
+    """
+    Разбирает настройку TTL по группам эндпоинтов.
+
+    Args:
+        value: Строка "группа=секунды,..."; некорректные пары пропускаются с предупреждением
+
+    Returns:
+        Группа эндпоинтов -> TTL в секундах
+    """
+    ttls = {}
+    for pair in value.split(","):
+        if not pair.strip():
+            continue
+        endpoint, _, seconds = pair.partition("=")
+        try:
+            ttls[default_endpoint_key(endpoint.strip())] = float(seconds)
+        except ValueError:
+            logger.warning(f"Некорректная настройка TTL HTTP-кэша: {pair!r}")
+    return ttls
+
+
+def cache_key(method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    """Формирует ключ записи: схема и адрес сервера и ключ запроса."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc} {request_key(method, url, params)}"
+
+
+class CacheEntry:
+    """Сохраненный ответ."""
+
+    __slots__ = ("etag", "last_modified", "content_type", "stored_at", "body")
+
+    def __init__(
+        self,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        content_type: Optional[str],
+        stored_at: float,
+        body: bytes,
+    ):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+        self.stored_at = stored_at
+        self.body = body
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def response(self) -> RecordedResponse:
+        headers = {"Content-Type": self.content_type or "application/json"}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        return RecordedResponse(200, headers, self.body)
+
+
+class HTTPCacheStore:
+    """
+    Хранилище ответов в SQLite.
+
+    Запись выполняется в открытой транзакции, которая фиксируется каждые
+    COMMIT_INTERVAL записей и при close(), чтобы не ждать диск на каждом ответе.
+    Методы синхронные; CachingTransport вызывает их в отдельном потоке.
+    """
+
+    def __init__(
+        self, db_path: Union[str, Path] = HTTP_CACHE_PATH, max_entries: int = HTTP_CACHE_MAX_ENTRIES
+    ):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # Соединение используется из потока транспорта, а закрывается из любого
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM http_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT etag, last_modified, content_type, stored_at, body "
+                "FROM http_cache WHERE key = ?",
+                (key,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        etag, last_modified, content_type, stored_at, body = row
+        try:
+            return CacheEntry(etag, last_modified, content_type, stored_at, zlib.decompress(body))
+        except zlib.error:
+            logger.warning(f"Поврежденная запись HTTP-кэша удалена: {key}")
+            self.delete(key)
+            return None
+
+    def put(self, key: str, endpoint: str, entry: CacheEntry) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO http_cache "
+            "(key, endpoint, etag, last_modified, content_type, stored_at, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                endpoint,
+                entry.etag,
+                entry.last_modified,
+                entry.content_type,
+                entry.stored_at,
+                zlib.compress(entry.body),
+            ),
+        )
+        self._written()
+
+    def touch(self, key: str, stored_at: float) -> None:
+        """Продлевает запись после ответа 304 (stored_at=0 - помечает запись устаревшей)."""
+        self._connect().execute(
+            "UPDATE http_cache SET stored_at = ? WHERE key = ?", (stored_at, key)
+        )
+        self._written()
+
+    def delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM http_cache WHERE key = ?", (key,))
+        self._written()
+
+    def _written(self) -> None:
+        self._pending += 1
+        if self._pending >= COMMIT_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        """Фиксирует записи и удаляет самые старые записи сверх max_entries."""
+        if self._conn is None:
+            return
+        if self.max_entries > 0:
+            self._conn.execute(
+                "DELETE FROM http_cache WHERE key IN ("
+                "SELECT key FROM http_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+
+class CapturingResponse:
+    """
+    Ответ сети, тело которого сохраняется по мере чтения.
+
+    Вызывающий читает тело частями (iter_body_chunks) так же, как без кэша,
+    а после полного чтения body содержит тело для записи в кэш.
+    """
+
+    def __init__(self, response: Any):
+        self._response = response
+        self.status = response.status
+        self.headers = response.headers
+        self._chunks: List[bytes] = []
+        self.complete = False
+
+    @property
+    def body(self) -> bytes:
+        return b"".join(self._chunks)
+
+    async def iter_chunks(self, chunk_size: int = 65536) -> AsyncIterator[bytes]:
+        if self.complete:
+            # Тело уже прочитано (например, через read())
+            for start in range(0, len(self.body), chunk_size):
+                yield self.body[start : start + chunk_size]
+            return
+        async for chunk in iter_body_chunks(self._response, chunk_size):
+            self._chunks.append(chunk)
+            yield chunk
+        self.complete = True
+
+    async def read(self) -> bytes:
+        if not self.complete:
+            async for _ in self.iter_chunks():
+                pass
+        return self.body
+
+    async def text(self, encoding: str = "utf-8") -> str:
+        return (await self.read()).decode(encoding)
+
+    async def json(self, loads: Callable[[str], Any] = json.loads) -> Any:
+        return loads(await self.text())
+
+
+class CachingTransport(Transport):
+    """
+    Транспорт с HTTP-кэшем GET-запросов поверх другого транспорта.
+
+    Хранилище (SQLite и zlib) работает в отдельном потоке, чтобы не
+    останавливать цикл событий; на каждый запрос выполняется одно чтение
+    записи. Ответ сети передается вызывающему по мере получения и
+    сохраняется после того, как тело прочитано полностью.
+    """
+
+    def __init__(
+        self,
+        inner: Transport,
+        store: Optional[HTTPCacheStore] = None,
+        ttls: Optional[Mapping[str, float]] = None,
+        default_ttl: float = HTTP_CACHE_TTL,
+    ):
+        """
+        Args:
+            inner: Транспорт, выполняющий запросы
+            store: Хранилище ответов (по умолчанию HTTP_CACHE_PATH)
+            ttls: TTL по группам эндпоинтов (по умолчанию DEFAULT_ENDPOINT_TTLS и HTTP_CACHE_TTLS)
+            default_ttl: TTL остальных эндпоинтов
+        """
+        self.inner = inner
+        self.store = store if store is not None else HTTPCacheStore()
+        if ttls is None:
+            ttls = {**DEFAULT_ENDPOINT_TTLS, **parse_endpoint_ttls(HTTP_CACHE_TTLS)}
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        self.rate_limited = inner.rate_limited
+
+        # Один поток: соединение SQLite не используется одновременно
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="http_cache")
+
+        # Статистика
+        self.hits = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def ttl_for(self, endpoint: str) -> float:
+        return self.ttls.get(default_endpoint_key(endpoint), self.default_ttl)
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет операцию хранилища в потоке кэша."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @contextlib.asynccontextmanager
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Mapping[str, str]] = None,
+        params: Optional[Mapping[str, Any]] = None,
+        json_body: Any = None,
+        on_send: Optional[OnSend] = None,
+    ) -> AsyncIterator[Any]:
+        if method.upper() != "GET":
+            async with self.inner.request(
+                method, url, headers=headers, params=params, json_body=json_body, on_send=on_send
+            ) as response:
+                yield response
+            return
+
+        path = urlsplit(url).path
+        key = cache_key(method, url, params)
+        entry = await self._run(self.store.get, key)
+        ttl = self.ttl_for(path)
+        if entry is not None and time.time() - entry.stored_at < ttl:
+            # Запрос к API не отправляется, on_send не вызывается
+            self.hits += 1
+            yield entry.response()
+            return
+
+        conditional = {}
+        if entry is not None:
+            self.stale += 1
+            if entry.etag:
+                conditional["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                conditional["If-Modified-Since"] = entry.last_modified
+        else:
+            self.misses += 1
+
+        async def send() -> Dict[str, str]:
+            return {**(await on_send() if on_send is not None else {}), **conditional}
+
+        cached = None
+        async with self.inner.request(
+            method, url, headers=headers, params=params, on_send=send
+        ) as response:
+            response_headers = response.headers
+            if response.status == 304 and entry is not None:
+                self.revalidated += 1
+                await self._run(self.store.touch, key, time.time())
+                cached = entry.response()
+            elif response.status == 200 and (
+                ttl > 0 or "ETag" in response_headers or "Last-Modified" in response_headers
+            ):
+                stored_at = time.time()
+                capturing = CapturingResponse(response)
+                yield capturing
+                # Неполностью прочитанное тело не сохраняется
+                if capturing.complete:
+                    fresh = CacheEntry(
+                        response_headers.get("ETag"),
+                        response_headers.get("Last-Modified"),
+                        response_headers.get("Content-Type"),
+                        stored_at,
+                        capturing.body,
+                    )
+                    await self._run(self.store.put, key, path, fresh)
+            else:
+                if response.status == 200 and entry is not None:
+                    await self._run(self.store.delete, key)
+                yield response
+        if cached is not None:
+            yield cached
+
+    async def invalidate(
+        self, method: str, url: str, params: Optional[Mapping[str, Any]] = None
+    ) -> None:
+        """
+        Помечает запись устаревшей: следующий запрос уйдет к API.
+
+        Валидаторы записи сохраняются, поэтому запрос будет условным, и
+        ответ 304 подтвердит, что данные не изменились.
+        """
+        await self._run(self.store.touch, cache_key(method, url, params), 0.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики попаданий, устаревших записей (и ответов 304) и промахов."""
+        return {
+            "hits": self.hits,
+            "stale": self.stale,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
+
+    async def close(self) -> None:
+        await self._run(self.store.close)
+        self._executor.shutdown(wait=False)
+        await self.inner.close()
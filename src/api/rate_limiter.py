@@ -0,0 +1,277 @@
+"""
+Асинхронный ограничитель частоты запросов к API.
+
+Для каждой группы эндпоинтов поддерживается отдельное ведро токенов
+(token bucket). Скорость подстраивается по схеме AIMD: после успешного ответа
+она аддитивно растет до max_rate, а после ответа 429 мультипликативно
+снижается до min_rate, при этом ведро блокируется на время Retry-After.
+
+Пример использования:
+    limiter = get_rate_limiter()
+    await limiter.acquire("/exchange/v1/market/items")
+    ...
+    limiter.record_success("/exchange/v1/market/items")
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("rate_limiter")
+
+# Начальная, минимальная и максимальная скорость запросов (запросов в секунду)
+API_RATE_LIMIT = float(os.getenv("API_RATE_LIMIT", "10"))
+API_RATE_LIMIT_MIN = float(os.getenv("API_RATE_LIMIT_MIN", "0.5"))
+API_RATE_LIMIT_MAX = float(os.getenv("API_RATE_LIMIT_MAX", "20"))
+
+# Пауза после 429, если сервер не прислал Retry-After (в секундах)
+DEFAULT_RETRY_AFTER = 1.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Разбирает заголовок Retry-After.
+
+    Args:
+        value: Значение заголовка: число секунд или HTTP-дата
+
+    Returns:
+        Задержка в секундах или None, если заголовок отсутствует или некорректен
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+def default_endpoint_key(endpoint: str) -> str:
+    """
+    Группирует эндпоинты для лимитирования.
+
+    DMarket использует пути вида /exchange/v1/<ресурс>[/<id>], поэтому
+    ключом служат первые три сегмента пути: все запросы истории
+    /exchange/v1/item-history/<id> попадают в одно ведро.
+
+    Args:
+        endpoint: Путь запроса
+
+    Returns:
+        Ключ ведра токенов
+    """
+    path = endpoint.split("?", 1)[0]
+    segments = [segment for segment in path.split("/") if segment]
+    return "/" + "/".join(segments[:3])
+
+
+class TokenBucket:
+    """Ведро токенов одной группы эндпоинтов с адаптивной скоростью."""
+
+    def __init__(
+        self, rate: float, min_rate: float, max_rate: float, burst: Optional[float] = None
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Статистика
+        self.waiting = 0
+        self.requests = 0
+        self.rate_limited = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """
+        Очередь ожидающих токен (asyncio.Lock обслуживает ожидающих по порядку).
+
+        Блокировка привязывается к циклу событий при первом ожидании, поэтому
+        для каждого нового цикла (например, очередного asyncio.run) создается
+        своя: общий ограничитель процесса переживает смену цикла.
+        """
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def try_take(self) -> float:
+        """
+        Пытается взять токен.
+
+        Returns:
+            0, если токен взят, иначе время в секундах до появления токена
+        """
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Общий ограничитель частоты запросов с ведром токенов на группу эндпоинтов.
+
+    Attributes:
+        increase_step: Прирост скорости (запросов/сек) после успешного ответа
+        decrease_factor: Множитель скорости после ответа 429
+    """
+
+    def __init__(
+        self,
+        rate: float = API_RATE_LIMIT,
+        min_rate: float = API_RATE_LIMIT_MIN,
+        max_rate: float = API_RATE_LIMIT_MAX,
+        increase_step: float = 0.1,
+        decrease_factor: float = 0.5,
+        key_func: Callable[[str], str] = default_endpoint_key,
+    ):
+        self.initial_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.key_func = key_func
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _get_bucket(self, endpoint: str) -> TokenBucket:
+        key = self.key_func(endpoint)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.initial_rate, self.min_rate, self.max_rate)
+            self._buckets[key] = bucket
+        return bucket
+
+    async def acquire(self, endpoint: str) -> None:
+        """
+        Ожидает разрешения на запрос к эндпоинту.
+
+        Args:
+            endpoint: Путь запроса
+        """
+        bucket = self._get_bucket(endpoint)
+        bucket.requests += 1
+        if not bucket.lock.locked() and bucket.try_take() == 0:
+            return
+
+        # Ожидающие обслуживаются по очереди; время ожидания пересчитывается
+        # после каждого сна, поэтому снижение скорости и Retry-After
+        # сразу применяются ко всей очереди
+        bucket.waiting += 1
+        try:
+            async with bucket.lock:
+                while True:
+                    delay = bucket.try_take()
+                    if delay <= 0:
+                        return
+                    await asyncio.sleep(delay)
+        finally:
+            bucket.waiting -= 1
+
+    def record_success(self, endpoint: str) -> None:
+        """Аддитивно увеличивает скорость после успешного ответа."""
+        bucket = self._get_bucket(endpoint)
+        bucket.rate = min(bucket.max_rate, bucket.rate + self.increase_step)
+
+    def record_rate_limited(self, endpoint: str, retry_after: Optional[float] = None) -> None:
+        """
+        Мультипликативно снижает скорость и блокирует ведро после ответа 429.
+
+        Args:
+            endpoint: Путь запроса
+            retry_after: Задержка из заголовка Retry-After в секундах
+        """
+        bucket = self._get_bucket(endpoint)
+        bucket.rate_limited += 1
+        now = time.monotonic()
+
+        # Ответы на запросы, отправленные до первого 429, не должны снижать
+        # скорость повторно: пока ведро заблокировано, уменьшение не применяется
+        if now >= bucket.blocked_until:
+            bucket.rate = max(bucket.min_rate, bucket.rate * self.decrease_factor)
+
+        pause = retry_after if retry_after is not None else DEFAULT_RETRY_AFTER
+        bucket.blocked_until = max(bucket.blocked_until, now + pause)
+        bucket._refill(now)
+        bucket.tokens = min(bucket.tokens, 0.0)
+
+        logger.warning(
+            f"Получен 429 для {self.key_func(endpoint)}: скорость снижена до "
+            f"{bucket.rate:.2f} запр/с, пауза {pause:.1f} сек"
+        )
+
+    def current_rate(self, endpoint: str) -> float:
+        """Возвращает текущую разрешенную скорость для эндпоинта (запросов/сек)."""
+        return self._get_bucket(endpoint).rate
+
+    def queue_depth(self, endpoint: Optional[str] = None) -> int:
+        """
+        Возвращает количество запросов, ожидающих токен.
+
+        Args:
+            endpoint: Путь запроса; если не указан, считается по всем ведрам
+        """
+        if endpoint is not None:
+            return self._get_bucket(endpoint).waiting
+        return sum(bucket.waiting for bucket in self._buckets.values())
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает состояние всех ведер: скорость, очередь и счетчики."""
+        return {
+            key: {
+                "rate": round(bucket.rate, 3),
+                "queue_depth": bucket.waiting,
+                "requests": bucket.requests,
+                "rate_limited": bucket.rate_limited,
+                "blocked_for": round(max(0.0, bucket.blocked_until - time.monotonic()), 3),
+            }
+            for key, bucket in self._buckets.items()
+        }
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Возвращает общий для процесса ограничитель запросов.
+
+    Все клиенты DMarket API в одном процессе должны использовать один
+    экземпляр, чтобы суммарная нагрузка не превышала лимиты API.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
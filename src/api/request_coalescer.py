@@ -0,0 +1,103 @@
+"""
+Объединение одинаковых одновременных запросов к API (single-flight).
+
+Если несколько корутин одновременно запрашивают одно и то же (тот же метод,
+URL и параметры), к API уходит только один запрос, а все ожидающие получают
+его результат или исключение.
+
+Пример использования:
+    coalescer = get_request_coalescer()
+    key = RequestCoalescer.make_key("GET", url, params)
+    data = await coalescer.run(key, lambda: fetch(url, params))
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+logger = logging.getLogger("request_coalescer")
+
+
+class RequestCoalescer:
+    """
+    Реестр выполняющихся запросов, позволяющий разделять их результат.
+
+    Результат отдается всем ожидающим как один и тот же объект, поэтому
+    вызывающий код не должен его изменять.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> Tuple:
+        """
+        Формирует ключ запроса из метода, URL и параметров.
+
+        Порядок параметров не важен, значения приводятся к строкам так же,
+        как при формировании query string.
+        """
+        normalized_params = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return (method.upper(), url, normalized_params)
+
+    async def run(self, key: Hashable, request_factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет запрос или присоединяется к уже выполняющемуся с тем же ключом.
+
+        Args:
+            key: Ключ запроса (см. make_key)
+            request_factory: Функция, создающая корутину запроса
+
+        Returns:
+            Результат запроса
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            logger.debug(f"Запрос {key} объединен с уже выполняющимся")
+        else:
+            self.executed += 1
+            future = asyncio.ensure_future(request_factory())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._on_done(key, done))
+
+        # shield: отмена одного из ожидающих не должна отменять общий запрос
+        return await asyncio.shield(future)
+
+    def _on_done(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Помечаем исключение как полученное на случай, если все ожидающие были отменены
+        if not future.cancelled():
+            future.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """Количество выполняющихся уникальных запросов."""
+        return len(self._in_flight)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает счетчики: выполнено запросов, сэкономлено запросов, в процессе."""
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+        }
+
+
+_request_coalescer: Optional[RequestCoalescer] = None
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """
+    Возвращает общий для процесса реестр запросов.
+
+    Благодаря общему экземпляру запросы бота, торгового компонента и
+    разовых сканирований в одном процессе объединяются между собой.
+    """
+    global _request_coalescer
+    if _request_coalescer is None:
+        _request_coalescer = RequestCoalescer()
+    return _request_coalescer
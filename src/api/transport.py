@@ -0,0 +1,422 @@
+"""
+Транспорт HTTP-запросов клиента DMarket API с записью и воспроизведением.
+
+Клиент отправляет запросы через транспорт:
+
+    async with transport.request("GET", url, params=params, on_send=sign) as response:
+        status, body = response.status, await response.read()
+
+on_send вызывается непосредственно перед отправкой запроса к API и
+возвращает заголовки (подпись), поэтому клиент ждет ограничителя частоты и
+замеряет задержку только для запросов, которые действительно уходят в сеть.
+
+HTTPTransport выполняет запросы через сессию aiohttp. RecordingTransport
+выполняет их через другой транспорт и сохраняет ответы (статус, заголовки,
+тело, время ответа) в кассету - JSON Lines, сжатый gzip. ReplayTransport
+отвечает из кассеты без сети: сразу или с исходным временем ответа.
+
+Ключ запроса в кассете - метод, путь, query-параметры и тело. Заголовки
+(подпись, время, nonce) и адрес сервера в ключ не входят, поэтому
+записанные ответы воспроизводятся при любых ключах API. Если один запрос
+записан несколько раз, ответы воспроизводятся по порядку, последний
+повторяется.
+
+Режим по умолчанию задается переменной окружения API_TRANSPORT_MODE.
+
+Пример использования:
+    transport = RecordingTransport(HTTPTransport(get_session), "cassettes/scan.jsonl.gz")
+    ...
+    await transport.close()  # кассета сохраняется
+"""
+
+import asyncio
+import contextlib
+import gzip
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Mapping, Optional, Union
+from urllib.parse import parse_qsl, urlsplit
+
+import aiohttp
+
+from src.api.exceptions import APIError
+
+logger = logging.getLogger("transport")
+
+# Режим транспорта: live - запросы к API, record - запросы с записью в кассету,
+# replay - ответы из кассеты
+API_TRANSPORT_MODE = os.getenv("API_TRANSPORT_MODE", "live").lower()
+
+# Файл кассеты для режимов record и replay
+API_CASSETTE_PATH = os.getenv("API_CASSETTE_PATH", "cassettes/dmarket.jsonl.gz")
+
+# Время ответов при воспроизведении: fast - без задержек, original - как при записи
+API_REPLAY_TIMING = os.getenv("API_REPLAY_TIMING", "fast").lower()
+
+TRANSPORT_MODES = ("live", "record", "replay")
+REPLAY_TIMINGS = ("fast", "original")
+
+# Заголовки ответа, которые сохраняются в кассете
+RECORDED_HEADERS = ("Content-Type", "Retry-After", "ETag", "Last-Modified", "Cache-Control")
+
+
+def request_key(
+    method: str, url: str, params: Optional[Mapping[str, Any]] = None, json_body: Any = None
+) -> str:
+    """
+    Формирует ключ запроса для кассеты.
+
+    Значения параметров приводятся к строкам, как в query string; параметры
+    из самого URL объединяются с params.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query.extend((str(name), str(value)) for name, value in (params or {}).items())
+    body = (
+        json.dumps(json_body, sort_keys=True, separators=(",", ":"))
+        if json_body is not None
+        else ""
+    )
+    return json.dumps(
+        [method.upper(), parts.path, sorted(query), body], ensure_ascii=False, separators=(",", ":")
+    )
+
+
+# Функция, вызываемая перед отправкой запроса; возвращает дополнительные заголовки
+OnSend = Callable[[], Awaitable[Mapping[str, str]]]
+
+
+class RecordedResponse:
+    """Ответ, полностью прочитанный в память (записанный или воспроизводимый)."""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: Mapping[str, str], body: bytes):
+        self.status = status
+        self.headers = dict(headers)
+        self.body = body
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding)
+
+    async def json(self, loads: Callable[[str], Any] = json.loads) -> Any:
+        return loads(self.body.decode("utf-8"))
+
+    async def iter_chunks(self, chunk_size: int = 65536) -> AsyncIterator[bytes]:
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start : start + chunk_size]
+
+
+async def iter_body_chunks(response: Any, chunk_size: int = 65536) -> AsyncIterator[bytes]:
+    """
+    Читает тело ответа транспорта частями по мере получения.
+
+    Args:
+        response: aiohttp.ClientResponse или ответ с методом iter_chunks (RecordedResponse)
+        chunk_size: Максимальный размер части в байтах
+    """
+    iter_chunks = getattr(response, "iter_chunks", None)
+    if iter_chunks is not None:
+        async for chunk in iter_chunks(chunk_size):
+            yield chunk
+    else:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            yield chunk
+
+
+async def send_headers(
+    headers: Optional[Mapping[str, str]], on_send: Optional[OnSend]
+) -> Dict[str, str]:
+    """Объединяет заголовки запроса с заголовками, которые возвращает on_send."""
+    request_headers = dict(headers or {})
+    if on_send is not None:
+        request_headers.update(await on_send())
+    return request_headers
+
+
+class Transport:
+    """
+    Базовый транспорт.
+
+    Attributes:
+        rate_limited: Идут ли запросы к настоящему API (для них действует ограничитель
+            частоты клиента)
+    """
+
+    rate_limited = True
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Mapping[str, str]] = None,
+        params: Optional[Mapping[str, Any]] = None,
+        json_body: Any = None,
+        on_send: Optional[OnSend] = None,
+    ) -> "contextlib.AbstractAsyncContextManager[Any]":
+        """
+        Выполняет запрос.
+
+        Args:
+            on_send: Вызывается непосредственно перед отправкой запроса к API и
+                возвращает дополнительные заголовки; не вызывается, если ответ
+                получен без обращения к API (например, из кэша)
+
+        Returns:
+            Асинхронный контекстный менеджер ответа с атрибутами status и
+            headers и методами read(), text() и json(); тело можно читать
+            частями через iter_body_chunks
+        """
+        raise NotImplementedError
+
+    async def invalidate(
+        self, method: str, url: str, params: Optional[Mapping[str, Any]] = None
+    ) -> None:
+        """Помечает сохраненный ответ на запрос устаревшим (для транспортов с кэшем)."""
+
+    async def close(self) -> None:
+        """Освобождает ресурсы транспорта."""
+
+
+class HTTPTransport(Transport):
+    """Запросы через сессию aiohttp, которой владеет клиент."""
+
+    def __init__(self, get_session: Callable[[], Awaitable[aiohttp.ClientSession]]):
+        """
+        Args:
+            get_session: Функция, возвращающая общую сессию клиента
+        """
+        self._get_session = get_session
+
+    @contextlib.asynccontextmanager
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Mapping[str, str]] = None,
+        params: Optional[Mapping[str, Any]] = None,
+        json_body: Any = None,
+        on_send: Optional[OnSend] = None,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        session = await self._get_session()
+        headers = await send_headers(headers, on_send)
+        async with session.request(
+            method, url, headers=headers, params=params, json=json_body
+        ) as response:
+            yield response
+
+
+class Cassette:
+    """
+    Записанные ответы по ключам запросов.
+
+    Файл - JSON Lines, сжатый gzip: одна строка на ответ с полями key,
+    status, headers, body (текст) и elapsed (секунды).
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._positions: Dict[str, int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def add(
+        self, key: str, status: int, headers: Mapping[str, str], body: bytes, elapsed: float
+    ) -> None:
+        self._entries[key].append(
+            {
+                "key": key,
+                "status": status,
+                "headers": {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+                "body": body.decode("utf-8", errors="replace"),
+                "elapsed": round(elapsed, 6),
+            }
+        )
+
+    def next(self, key: str) -> Optional[Dict[str, Any]]:
+        """Возвращает следующий записанный ответ на запрос (последний повторяется) или None."""
+        entries = self._entries.get(key)
+        if not entries:
+            return None
+        position = self._positions[key]
+        self._positions[key] = position + 1
+        return entries[min(position, len(entries) - 1)]
+
+    def rewind(self) -> None:
+        """Возвращает воспроизведение к первым ответам."""
+        self._positions.clear()
+
+    def load(self) -> int:
+        """
+        Загружает кассету из файла.
+
+        Returns:
+            Количество загруженных ответов
+        """
+        self._entries.clear()
+        self._positions.clear()
+        if not self.path.exists():
+            return 0
+        with gzip.open(self.path, "rt", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+        return len(self)
+
+    def save(self) -> None:
+        """Сохраняет кассету в файл через временный файл, чтобы не оставить поврежденную кассету."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+            for entries in self._entries.values():
+                for entry in entries:
+                    file.write(json.dumps(entry, ensure_ascii=False))
+                    file.write("\n")
+        os.replace(tmp_path, self.path)
+
+
+class RecordingTransport(Transport):
+    """Выполняет запросы через другой транспорт и записывает ответы в кассету."""
+
+    def __init__(self, inner: Transport, cassette: Union[Cassette, str, Path]):
+        """
+        Args:
+            inner: Транспорт, выполняющий запросы
+            cassette: Кассета или путь к ее файлу; новые ответы дописываются к уже записанным
+        """
+        self.inner = inner
+        if not isinstance(cassette, Cassette):
+            cassette = Cassette(cassette)
+            cassette.load()
+        self.cassette = cassette
+        self.rate_limited = inner.rate_limited
+
+    @contextlib.asynccontextmanager
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Mapping[str, str]] = None,
+        params: Optional[Mapping[str, Any]] = None,
+        json_body: Any = None,
+        on_send: Optional[OnSend] = None,
+    ) -> AsyncIterator[RecordedResponse]:
+        started = time.perf_counter()
+        async with self.inner.request(
+            method, url, headers=headers, params=params, json_body=json_body, on_send=on_send
+        ) as response:
+            body = await response.read()
+            status = response.status
+            response_headers = response.headers
+        elapsed = time.perf_counter() - started
+        self.cassette.add(
+            request_key(method, url, params, json_body), status, response_headers, body, elapsed
+        )
+        yield RecordedResponse(
+            status, {name: response_headers[name] for name in response_headers}, body
+        )
+
+    async def close(self) -> None:
+        self.cassette.save()
+        logger.info(f"Кассета сохранена: {self.cassette.path} (ответов: {len(self.cassette)})")
+        await self.inner.close()
+
+
+class ReplayTransport(Transport):
+    """Отвечает на запросы из кассеты без обращения к сети."""
+
+    rate_limited = False
+
+    def __init__(
+        self, cassette: Union[Cassette, str, Path], timing: str = "fast", speed: float = 1.0
+    ):
+        """
+        Args:
+            cassette: Кассета или путь к ее файлу
+            timing: fast - отвечать сразу, original - с записанным временем ответа
+            speed: Ускорение воспроизведения при timing="original"
+
+        Raises:
+            ValueError: Если timing неизвестен
+        """
+        if timing not in REPLAY_TIMINGS:
+            raise ValueError(f"Неизвестный режим воспроизведения: {timing}")
+        if not isinstance(cassette, Cassette):
+            cassette = Cassette(cassette)
+            if not cassette.load():
+                logger.warning(f"Кассета {cassette.path} пуста или не найдена")
+        self.cassette = cassette
+        self.timing = timing
+        self.speed = speed if speed > 0 else 1.0
+
+        # Статистика
+        self.replayed = 0
+        self.missed = 0
+
+    @contextlib.asynccontextmanager
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Mapping[str, str]] = None,
+        params: Optional[Mapping[str, Any]] = None,
+        json_body: Any = None,
+        on_send: Optional[OnSend] = None,
+    ) -> AsyncIterator[RecordedResponse]:
+        key = request_key(method, url, params, json_body)
+        entry = self.cassette.next(key)
+        if entry is None:
+            self.missed += 1
+            raise APIError(
+                f"Запрос отсутствует в кассете {self.cassette.path}: {method} {urlsplit(url).path}"
+            )
+        self.replayed += 1
+        # Воспроизведение заменяет отправку запроса к API
+        await send_headers(headers, on_send)
+        if self.timing == "original" and entry["elapsed"] > 0:
+            await asyncio.sleep(entry["elapsed"] / self.speed)
+        yield RecordedResponse(entry["status"], entry["headers"], entry["body"].encode("utf-8"))
+
+
+def create_transport(
+    get_session: Callable[[], Awaitable[aiohttp.ClientSession]],
+    mode: str = API_TRANSPORT_MODE,
+    cassette_path: Union[str, Path] = API_CASSETTE_PATH,
+    timing: str = API_REPLAY_TIMING,
+) -> Transport:
+    """
+    Создает транспорт клиента для режима mode.
+
+    Args:
+        get_session: Функция, возвращающая общую сессию клиента
+        mode: live, record или replay
+        cassette_path: Файл кассеты
+        timing: Время ответов при воспроизведении
+
+    Raises:
+        ValueError: Если режим неизвестен
+    """
+    if mode == "live":
+        return HTTPTransport(get_session)
+    if mode == "record":
+        logger.info(f"Ответы API записываются в кассету {cassette_path}")
+        return RecordingTransport(HTTPTransport(get_session), cassette_path)
+    if mode == "replay":
+        logger.info(f"Ответы API воспроизводятся из кассеты {cassette_path} ({timing})")
+        return ReplayTransport(cassette_path, timing)
+    raise ValueError(
+        f"Неизвестный режим транспорта: {mode} (ожидается одно из {', '.join(TRANSPORT_MODES)})"
+    )
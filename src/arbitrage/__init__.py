@@ -0,0 +1,3 @@
+"""
+Алгоритмы поиска и оценки арбитражных возможностей.
+"""
@@ -0,0 +1,541 @@
+"""
+Поиск арбитражных циклов между торговыми площадками алгоритмом Беллмана-Форда.
+
+Котировки предметов на площадках превращаются в граф: вершины - деньги и предметы
+на каждой площадке, ребра - покупка, продажа и перевод между площадками с
+весом -log(курс). Цикл с отрицательным весом соответствует
+последовательности сделок, после которой денег становится больше, чем
+было вначале.
+
+Релаксация выполняется векторно по всем ребрам, исходящим из вершин,
+изменившихся на предыдущей итерации (SPFA по "волнам"). Граф предков
+периодически проверяется на циклы, поэтому цикл обычно находится задолго
+до V итераций. Поиск блокирует процессор, поэтому асинхронный интерфейс
+выполняет его в пуле потоков или процессов.
+
+Котировки DMarket строятся из книг заявок сканера (quotes_from_order_books)
+или из записей предметов (quotes_from_listings); котировки других площадок
+передает вызывающий код.
+
+Пример использования:
+    quotes = quotes_from_order_books(order_books) + other_market_quotes
+    cycles = await find_all_arbitrage_opportunities_async(quotes, min_profit_percent=2.0)
+    for cycle in cycles:
+        print(cycle.profit_percent, cycle.describe())
+"""
+
+import asyncio
+import logging
+import math
+import os
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.arbitrage.order_book import OrderBooks
+from src.arbitrage.records import MarketItem
+from src.utils.price import Cents, usd_to_cents
+
+logger = logging.getLogger("bellman_ford")
+
+# Комиссия с продажи на площадке по умолчанию (доля)
+MARKETPLACE_FEE = float(os.getenv("MARKETPLACE_FEE", "0.05"))
+
+# Потери при переводе предмета между площадками (доля)
+TRANSFER_FEE = float(os.getenv("TRANSFER_FEE", "0.0"))
+
+# Обозначение денег в вершинах графа
+CASH = "USD"
+
+# Допуск при сравнении весов: улучшения меньше допуска не считаются
+TOLERANCE = 1e-12
+
+
+class PriceQuote:
+    """
+    Котировка предмета на площадке.
+
+    Attributes:
+        item: Название предмета (одинаковое на всех площадках)
+        marketplace: Площадка
+        ask_cents: Цена покупки (минимальное предложение), 0 - купить нельзя
+        bid_cents: Цена продажи (лучший ордер на покупку), 0 - продать нельзя
+    """
+
+    __slots__ = ("item", "marketplace", "ask_cents", "bid_cents")
+
+    def __init__(self, item: str, marketplace: str, ask_cents: Cents = 0, bid_cents: Cents = 0):
+        self.item = item
+        self.marketplace = marketplace
+        self.ask_cents = ask_cents
+        self.bid_cents = bid_cents
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PriceQuote":
+        """Создает котировку из словаря {"item", "marketplace", "ask", "bid"} (цены в долларах)."""
+        return cls(
+            item=data["item"],
+            marketplace=data["marketplace"],
+            ask_cents=usd_to_cents(data.get("ask")),
+            bid_cents=usd_to_cents(data.get("bid")),
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"PriceQuote({self.item!r}, {self.marketplace!r}, "
+            f"ask_cents={self.ask_cents}, bid_cents={self.bid_cents})"
+        )
+
+
+def quotes_from_listings(
+    listings: Iterable[MarketItem], marketplace: str = "dmarket"
+) -> List[PriceQuote]:
+    """
+    Сводит предложения площадки в котировки по названиям предметов.
+
+    Цена покупки - минимальная цена предложения, цена продажи - лучший
+    ордер на покупку среди предложений предмета.
+
+    Args:
+        listings: Записи предметов площадки
+        marketplace: Площадка
+
+    Returns:
+        По одной котировке на предмет
+    """
+    quotes: Dict[str, PriceQuote] = {}
+    for listing in listings:
+        quote = quotes.get(listing.title)
+        if quote is None:
+            quotes[listing.title] = PriceQuote(
+                listing.title, marketplace, listing.price_cents, listing.best_bid_cents
+            )
+            continue
+        if listing.price_cents > 0 and (
+            quote.ask_cents == 0 or listing.price_cents < quote.ask_cents
+        ):
+            quote.ask_cents = listing.price_cents
+        quote.bid_cents = max(quote.bid_cents, listing.best_bid_cents)
+    return list(quotes.values())
+
+
+def quotes_from_order_books(
+    order_books: OrderBooks, marketplace: str = "dmarket"
+) -> List[PriceQuote]:
+    """
+    Строит котировки по книгам заявок: лучшее предложение и лучший ордер на покупку.
+
+    Args:
+        order_books: Книги заявок предметов площадки
+        marketplace: Площадка
+
+    Returns:
+        По одной котировке на предмет
+    """
+    return [
+        PriceQuote(title, marketplace, book.best_ask(), book.best_bid())
+        for title, book in order_books.items()
+    ]
+
+
+class ArbitrageGraph:
+    """
+    Граф обменов с весами ребер -log(курс).
+
+    Вершина - пара (актив, площадка), где актив - название предмета или CASH.
+    Массивы ребер для поиска собираются лениво при первом обращении.
+    """
+
+    def __init__(self):
+        self.nodes: List[Tuple[str, str]] = []
+        self._node_index: Dict[Tuple[str, str], int] = {}
+        self._src: List[int] = []
+        self._dst: List[int] = []
+        self._rates: List[float] = []
+        self.actions: List[str] = []
+        self._arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self._src)
+
+    def node(self, asset: str, marketplace: str) -> int:
+        """Возвращает номер вершины (asset, marketplace), добавляя ее при необходимости."""
+        key = (asset, marketplace)
+        index = self._node_index.get(key)
+        if index is None:
+            index = self._node_index[key] = len(self.nodes)
+            self.nodes.append(key)
+        return index
+
+    def add_edge(self, source: int, target: int, rate: float, action: str) -> None:
+        """
+        Добавляет обмен: единица актива source превращается в rate единиц target.
+
+        Ребра с неположительным курсом не добавляются.
+        """
+        if rate <= 0:
+            return
+        self._src.append(source)
+        self._dst.append(target)
+        self._rates.append(rate)
+        self.actions.append(action)
+        self._arrays = None
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Возвращает массивы (источник, назначение, вес) всех ребер."""
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self._src, dtype=np.int64),
+                np.asarray(self._dst, dtype=np.int64),
+                -np.log(np.asarray(self._rates, dtype=np.float64)),
+            )
+        return self._arrays
+
+    @classmethod
+    def from_quotes(
+        cls,
+        quotes: Iterable[PriceQuote],
+        fees: Optional[Dict[str, float]] = None,
+        default_fee: float = MARKETPLACE_FEE,
+        transfer_fee: float = TRANSFER_FEE,
+        cash_transfer_fee: float = 0.0,
+    ) -> "ArbitrageGraph":
+        """
+        Строит граф по котировкам.
+
+        Для каждой котировки добавляются покупка (деньги -> предмет по курсу
+        1/ask) и продажа (предмет -> деньги по курсу bid за вычетом комиссии
+        площадки). Предмет, котируемый на нескольких площадках, можно
+        перевести между ними, деньги - между любыми площадками.
+
+        Args:
+            quotes: Котировки
+            fees: Комиссии с продажи по площадкам
+            default_fee: Комиссия для площадок, отсутствующих в fees
+            transfer_fee: Потери при переводе предмета между площадками
+            cash_transfer_fee: Потери при переводе денег между площадками
+
+        Returns:
+            Граф обменов
+        """
+        fees = fees or {}
+        graph = cls()
+        markets_by_item: Dict[str, List[str]] = {}
+        marketplaces: List[str] = []
+
+        for quote in quotes:
+            if (CASH, quote.marketplace) not in graph._node_index:
+                marketplaces.append(quote.marketplace)
+            cash = graph.node(CASH, quote.marketplace)
+            item = graph.node(quote.item, quote.marketplace)
+            if quote.ask_cents > 0:
+                graph.add_edge(cash, item, 1.0 / quote.ask_cents, "buy")
+            if quote.bid_cents > 0:
+                fee = fees.get(quote.marketplace, default_fee)
+                graph.add_edge(item, cash, quote.bid_cents * (1.0 - fee), "sell")
+            markets_by_item.setdefault(quote.item, []).append(quote.marketplace)
+
+        for item_name, item_markets in markets_by_item.items():
+            for source_market in item_markets:
+                for target_market in item_markets:
+                    if source_market != target_market:
+                        graph.add_edge(
+                            graph.node(item_name, source_market),
+                            graph.node(item_name, target_market),
+                            1.0 - transfer_fee,
+                            "transfer",
+                        )
+
+        for source_market in marketplaces:
+            for target_market in marketplaces:
+                if source_market != target_market:
+                    graph.add_edge(
+                        graph.node(CASH, source_market),
+                        graph.node(CASH, target_market),
+                        1.0 - cash_transfer_fee,
+                        "transfer",
+                    )
+
+        return graph
+
+
+class ArbitrageCycle:
+    """
+    Найденный прибыльный цикл сделок.
+
+    Attributes:
+        nodes: Вершины цикла (актив, площадка) в порядке сделок; первая вершина не
+            повторяется в конце
+        actions: Сделки между соседними вершинами ("buy", "sell", "transfer")
+        rates: Курсы сделок
+        rate: Итоговый множитель капитала за один проход цикла
+        profit_percent: Прибыль за один проход цикла в процентах
+    """
+
+    __slots__ = ("nodes", "actions", "rates", "rate", "profit_percent")
+
+    def __init__(self, nodes: List[Tuple[str, str]], actions: List[str], rates: List[float]):
+        self.nodes = nodes
+        self.actions = actions
+        self.rates = rates
+        self.rate = math.prod(rates)
+        self.profit_percent = (self.rate - 1.0) * 100
+
+    def describe(self) -> str:
+        """Возвращает цикл в виде строки "USD@dmarket -> AK-47@dmarket -> ..."."""
+        path = [f"{asset}@{marketplace}" for asset, marketplace in self.nodes + self.nodes[:1]]
+        return " -> ".join(path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает цикл в формате файла результатов."""
+        return {
+            "cycle": self.describe(),
+            "steps": [
+                {
+                    "action": action,
+                    "from": f"{source[0]}@{source[1]}",
+                    "to": f"{target[0]}@{target[1]}",
+                    "rate": rate,
+                }
+                for action, rate, source, target in zip(
+                    self.actions, self.rates, self.nodes, self.nodes[1:] + self.nodes[:1]
+                )
+            ],
+            "rate": self.rate,
+            "profit_percent": self.profit_percent,
+        }
+
+    def __repr__(self) -> str:
+        return f"ArbitrageCycle({self.describe()!r}, profit_percent={self.profit_percent:.2f})"
+
+
+def _predecessor_cycles(src: np.ndarray, pred_edge: np.ndarray) -> List[List[int]]:
+    """
+    Находит циклы в графе предков.
+
+    У каждой вершины не больше одного предка, поэтому вершины, лежащие на
+    циклах, - это образы всех вершин после V переходов к предку. V переходов
+    вычисляются удвоением (f -> f∘f) за O(V log V).
+
+    Returns:
+        Циклы как списки номеров ребер в порядке обхода
+    """
+    num_nodes = len(pred_edge)
+    parent = np.where(pred_edge >= 0, src[np.maximum(pred_edge, 0)], num_nodes)
+    # Вершина num_nodes - корень для вершин без предка, замкнутый сам на себя
+    jump = np.append(parent, num_nodes)
+    for _ in range(max(1, math.ceil(math.log2(num_nodes + 1)))):
+        jump = jump[jump]
+
+    cycles = []
+    visited = set()
+    for start in np.unique(jump[:num_nodes]).tolist():
+        if start == num_nodes or start in visited:
+            continue
+        edges = []
+        node = start
+        while True:
+            visited.add(node)
+            edges.append(int(pred_edge[node]))
+            node = int(parent[node])
+            if node == start:
+                break
+        edges.reverse()
+        cycles.append(edges)
+    return cycles
+
+
+def find_negative_cycles(
+    src: np.ndarray,
+    dst: np.ndarray,
+    weight: np.ndarray,
+    num_nodes: int,
+    check_every: int = 8,
+    tolerance: float = TOLERANCE,
+) -> List[List[int]]:
+    """
+    Ищет циклы отрицательного веса векторным алгоритмом Беллмана-Форда.
+
+    Расстояния всех вершин начинаются с 0 (как от виртуального источника,
+    соединенного со всеми вершинами), поэтому находятся циклы в любой
+    компоненте графа. На каждой итерации релаксируются только ребра из
+    вершин, улучшенных на предыдущей итерации.
+
+    Args:
+        src: Начала ребер
+        dst: Концы ребер
+        weight: Веса ребер
+        num_nodes: Количество вершин
+        check_every: Проверять граф предков на циклы каждые check_every итераций
+        tolerance: Минимальное улучшение расстояния
+
+    Returns:
+        Циклы графа предков как списки номеров ребер (пустой список, если
+        циклов отрицательного веса нет)
+    """
+    dist = np.zeros(num_nodes, dtype=np.float64)
+    pred_edge = np.full(num_nodes, -1, dtype=np.int64)
+    active = np.ones(num_nodes, dtype=bool)
+
+    for iteration in range(1, num_nodes + 1):
+        edges = np.flatnonzero(active[src])
+        candidate = dist[src[edges]] + weight[edges]
+        improving = candidate < dist[dst[edges]] - tolerance
+        if not improving.any():
+            return []
+
+        edges = edges[improving]
+        candidate = candidate[improving]
+        targets = dst[edges]
+
+        # Для каждой улучшаемой вершины выбирается ребро с минимальным расстоянием
+        order = np.lexsort((candidate, targets))
+        targets = targets[order]
+        first = np.ones(len(targets), dtype=bool)
+        first[1:] = targets[1:] != targets[:-1]
+        targets = targets[first]
+        dist[targets] = candidate[order][first]
+        pred_edge[targets] = edges[order][first]
+
+        active[:] = False
+        active[targets] = True
+
+        if iteration % check_every == 0:
+            cycles = _predecessor_cycles(src, pred_edge)
+            if cycles:
+                return cycles
+
+    return _predecessor_cycles(src, pred_edge)
+
+
+def find_arbitrage_cycles(
+    graph: ArbitrageGraph, min_profit_percent: float = 0.0, max_cycles: int = 50
+) -> List[ArbitrageCycle]:
+    """
+    Находит прибыльные циклы графа.
+
+    После каждого поиска у найденных циклов отключается ребро с наименьшим
+    весом (как правило, продажа конкретного предмета на конкретной
+    площадке), и поиск повторяется, пока находятся новые циклы.
+
+    Args:
+        graph: Граф обменов
+        min_profit_percent: Минимальная прибыль цикла в процентах
+        max_cycles: Максимальное количество циклов
+
+    Returns:
+        Циклы по убыванию прибыли
+    """
+    if not graph.num_edges:
+        return []
+
+    src, dst, weight = graph.arrays()
+    enabled = np.ones(graph.num_edges, dtype=bool)
+    found: List[ArbitrageCycle] = []
+    seen = set()
+
+    while len(found) < max_cycles:
+        subset = np.flatnonzero(enabled)
+        cycles = find_negative_cycles(src[subset], dst[subset], weight[subset], graph.num_nodes)
+        if not cycles:
+            break
+
+        for cycle in cycles:
+            edges = subset[cycle]
+            enabled[edges[np.argmin(weight[edges])]] = False
+
+            if weight[edges].sum() >= -TOLERANCE:
+                continue
+            # Один и тот же цикл может начинаться с разных ребер
+            rotation = int(np.argmin(edges))
+            key = tuple(np.roll(edges, -rotation).tolist())
+            if key in seen:
+                continue
+            seen.add(key)
+
+            arbitrage_cycle = ArbitrageCycle(
+                nodes=[graph.nodes[src[edge]] for edge in edges],
+                actions=[graph.actions[edge] for edge in edges],
+                rates=np.exp(-weight[edges]).tolist(),
+            )
+            if arbitrage_cycle.profit_percent >= min_profit_percent:
+                found.append(arbitrage_cycle)
+
+    found.sort(key=lambda cycle: cycle.profit_percent, reverse=True)
+    return found[:max_cycles]
+
+
+def find_all_arbitrage_opportunities(
+    quotes: Union[ArbitrageGraph, Iterable[Union[PriceQuote, Dict[str, Any]]]],
+    min_profit_percent: float = 0.0,
+    max_cycles: int = 50,
+    fees: Optional[Dict[str, float]] = None,
+) -> List[ArbitrageCycle]:
+    """
+    Строит граф по котировкам и находит прибыльные циклы.
+
+    Args:
+        quotes: Котировки (PriceQuote или словари для PriceQuote.from_dict) либо готовый граф
+        min_profit_percent: Минимальная прибыль цикла в процентах
+        max_cycles: Максимальное количество циклов
+        fees: Комиссии с продажи по площадкам
+
+    Returns:
+        Циклы по убыванию прибыли
+    """
+    if isinstance(quotes, ArbitrageGraph):
+        graph = quotes
+    else:
+        graph = ArbitrageGraph.from_quotes(
+            (
+                quote if isinstance(quote, PriceQuote) else PriceQuote.from_dict(quote)
+                for quote in quotes
+            ),
+            fees=fees,
+        )
+
+    cycles = find_arbitrage_cycles(
+        graph, min_profit_percent=min_profit_percent, max_cycles=max_cycles
+    )
+    logger.debug(
+        f"Граф: {graph.num_nodes} вершин, {graph.num_edges} ребер; найдено циклов: {len(cycles)}"
+    )
+    return cycles
+
+
+async def find_all_arbitrage_opportunities_async(
+    quotes: Union[ArbitrageGraph, Sequence[Union[PriceQuote, Dict[str, Any]]]],
+    min_profit_percent: float = 0.0,
+    max_cycles: int = 50,
+    fees: Optional[Dict[str, float]] = None,
+    executor: Optional[Executor] = None,
+) -> List[ArbitrageCycle]:
+    """
+    Асинхронная версия find_all_arbitrage_opportunities.
+
+    Построение графа и поиск выполняются в executor (по умолчанию - пул
+    потоков цикла событий), поэтому цикл событий не блокируется. Для
+    ProcessPoolExecutor котировки и граф передаются в процесс целиком.
+
+    Args:
+        quotes: Котировки или готовый граф
+        min_profit_percent: Минимальная прибыль цикла в процентах
+        max_cycles: Максимальное количество циклов
+        fees: Комиссии с продажи по площадкам
+        executor: Пул для выполнения поиска
+
+    Returns:
+        Циклы по убыванию прибыли
+    """
+    if not isinstance(quotes, ArbitrageGraph):
+        quotes = list(quotes)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, find_all_arbitrage_opportunities, quotes, min_profit_percent, max_cycles, fees
+    )
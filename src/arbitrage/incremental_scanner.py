@@ -0,0 +1,218 @@
+"""
+Инкрементальное повторное сканирование рынка.
+
+Сканер хранит снимок предыдущего прохода по каждой игре: для каждого
+itemId запоминается отпечаток цены и лучшего ордера на покупку. При следующем
+проходе заново оцениваются только новые и изменившиеся предметы, а
+возможности по исчезнувшим предметам снимаются. Стоимость установившегося
+сканирования пропорциональна изменениям рынка, а не его размеру.
+
+Пример использования:
+    scanner = IncrementalScanner()
+    scan = scanner.begin_pass("CS2")
+    for page in pages:
+        changed = scan.filter_changed(build_market_items(page))
+        scan.update(changed, await score(changed))
+    scan.commit()
+    opportunities = scanner.opportunities("CS2")
+"""
+
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.arbitrage.records import MarketItem, Opportunity
+from src.utils.ttl_cache import CACHE_TTL
+
+logger = logging.getLogger("incremental_scanner")
+
+
+class GameSnapshot:
+    """
+    Состояние сканирования одной игры.
+
+    Attributes:
+        fingerprints: itemId -> (отпечаток, время последней оценки)
+        opportunities: itemId -> прибыльная возможность из последней оценки
+    """
+
+    __slots__ = ("fingerprints", "opportunities", "passes")
+
+    def __init__(self):
+        self.fingerprints: Dict[str, Tuple[int, float]] = {}
+        self.opportunities: Dict[str, Opportunity] = {}
+        self.passes = 0
+
+
+class ScanPass:
+    """Один проход по рынку игры; изменения снимка применяются в commit()."""
+
+    def __init__(self, key: str, snapshot: GameSnapshot, rescore_after: Optional[float]):
+        self.key = key
+        self.snapshot = snapshot
+        self.rescore_after = rescore_after
+        self.started_at = time.time()
+        self._seen: Dict[str, Tuple[int, float]] = {}
+        # Исчезнувшие с прошлого прохода предметы (заполняется в commit)
+        self.removed: Set[str] = set()
+
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    def filter_changed(self, items: Iterable[MarketItem]) -> List[MarketItem]:
+        """
+        Отбирает предметы, которые нужно оценить заново.
+
+        Предмет оценивается заново, если его не было в предыдущем снимке,
+        если изменились цена или ордера, либо если с момента оценки прошло
+        больше rescore_after секунд (за это время могла измениться история
+        продаж).
+
+        Args:
+            items: Предметы очередной страницы
+
+        Returns:
+            Новые и изменившиеся предметы
+        """
+        previous = self.snapshot.fingerprints
+        changed_items = []
+
+        for item in items:
+            item_id = item.item_id
+            fingerprint = item.fingerprint
+            known = previous.get(item_id)
+
+            if known is None:
+                self.new += 1
+            elif known[0] != fingerprint or (
+                self.rescore_after is not None and self.started_at - known[1] > self.rescore_after
+            ):
+                self.changed += 1
+            else:
+                self.unchanged += 1
+                self._seen[item_id] = known
+                continue
+
+            self._seen[item_id] = (fingerprint, self.started_at)
+            changed_items.append(item)
+
+        return changed_items
+
+    def defer(self, items: Iterable[MarketItem]) -> None:
+        """
+        Откладывает оценку отобранных filter_changed предметов.
+
+        Отложенный предмет сохраняет прежнюю возможность (если она была) и
+        снова считается изменившимся при следующем проходе.
+        """
+        previous = self.snapshot.fingerprints
+        for item in items:
+            known = previous.get(item.item_id)
+            self._seen[item.item_id] = (-1, known[1] if known is not None else 0.0)
+
+    def mark_rescored(self, items: Iterable[MarketItem]) -> None:
+        """Отмечает предметы без изменений, которые оцениваются заново досрочно."""
+        for item in items:
+            self._seen[item.item_id] = (item.fingerprint, self.started_at)
+
+    def update(
+        self,
+        rescored_items: Iterable[MarketItem],
+        opportunities: Iterable[Opportunity],
+        failed: Iterable[MarketItem] = (),
+    ) -> None:
+        """
+        Заменяет возможности по заново оцененным предметам.
+
+        Предметы из failed (оценка не удалась, например, не загрузилась
+        история продаж) откладываются, как в defer(): прежняя возможность
+        сохраняется, а при следующем проходе предмет оценивается снова.
+
+        Args:
+            rescored_items: Предметы, которые были оценены заново
+            opportunities: Прибыльные возможности среди них
+            failed: Предметы из rescored_items, оценить которые не удалось
+        """
+        failed = list(failed)
+        self.defer(failed)
+        failed_ids = {item.item_id for item in failed}
+        current = self.snapshot.opportunities
+        for item in rescored_items:
+            if item.item_id not in failed_ids:
+                current.pop(item.item_id, None)
+        for opportunity in opportunities:
+            current[opportunity.item_id] = opportunity
+
+    def commit(self) -> Dict[str, int]:
+        """
+        Завершает проход: снимает возможности по исчезнувшим предметам и
+        сохраняет новый снимок.
+
+        Returns:
+            Статистика прохода
+        """
+        removed: Set[str] = set(self.snapshot.fingerprints) - set(self._seen)
+        self.removed = removed
+        retired = 0
+        for item_id in removed:
+            if self.snapshot.opportunities.pop(item_id, None) is not None:
+                retired += 1
+
+        self.snapshot.fingerprints = self._seen
+        self.snapshot.passes += 1
+
+        stats = {
+            "new": self.new,
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+            "removed": len(removed),
+            "retired": retired,
+            "opportunities": len(self.snapshot.opportunities),
+        }
+        logger.debug(f"Проход {self.key} завершен: {stats}")
+        return stats
+
+
+class IncrementalScanner:
+    """
+    Хранит снимки рынка между проходами для нескольких игр.
+
+    Ключ снимка задает вызывающий код; в него стоит включать параметры,
+    влияющие на результат оценки (диапазон цен, порог прибыли), чтобы
+    проходы с разными параметрами не смешивались.
+    """
+
+    def __init__(self, rescore_after: Optional[float] = CACHE_TTL):
+        self.rescore_after = rescore_after
+        self._snapshots: Dict[str, GameSnapshot] = {}
+
+    def begin_pass(self, key: str) -> ScanPass:
+        """Начинает новый проход для снимка key."""
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = self._snapshots[key] = GameSnapshot()
+        return ScanPass(key, snapshot, self.rescore_after)
+
+    def opportunities(self, key: str) -> List[Opportunity]:
+        """Возвращает текущие возможности снимка key."""
+        snapshot = self._snapshots.get(key)
+        return list(snapshot.opportunities.values()) if snapshot else []
+
+    def reset(self, key: Optional[str] = None) -> None:
+        """Удаляет снимок key или все снимки."""
+        if key is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Возвращает размер каждого снимка и количество возможностей в нем."""
+        return {
+            key: {
+                "items": len(snapshot.fingerprints),
+                "opportunities": len(snapshot.opportunities),
+                "passes": snapshot.passes,
+            }
+            for key, snapshot in self._snapshots.items()
+        }
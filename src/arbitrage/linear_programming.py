@@ -0,0 +1,328 @@
+"""
+Выбор портфеля арбитражных возможностей в пределах бюджета.
+
+Из найденных возможностей выбирается набор с максимальной ожидаемой
+прибылью так, чтобы суммарная стоимость покупок не превышала бюджет, а
+вложения в каждую игру - лимит игры. Это задача о рюкзаке с несколькими
+ограничениями:
+
+    max  sum(profit_i * x_i)
+    при  sum(cost_i * x_i) <= budget
+         sum(cost_i * x_i по предметам игры g) <= limit_g
+         x_i in {0, 1}
+
+Для больших наборов используется жадный алгоритм по отношению
+прибыль/стоимость, для небольших - точное решение целочисленной задачи
+через scipy.optimize.milp или PuLP с ограничением времени, если выбран
+соответствующий метод и библиотека установлена. Точное решение
+сравнивается с жадным, поэтому результат никогда не хуже жадного.
+
+Пример использования:
+    optimizer = PortfolioOptimizer(budget_cents=100000)
+    portfolio = optimizer.optimize_results(results)
+    for opportunity in portfolio.selected:
+        print(opportunity.name, opportunity.buy_price)
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.arbitrage.records import Opportunity
+from src.utils.price import Cents, cents_to_usd, usd_to_cents
+
+logger = logging.getLogger("linear_programming")
+
+try:
+    from scipy.optimize import Bounds, LinearConstraint, milp
+
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+try:
+    import pulp
+
+    PULP_AVAILABLE = True
+except ImportError:
+    PULP_AVAILABLE = False
+
+# Метод оптимизации: greedy, pulp или scipy (pulp и scipy не входят в requirements.txt)
+OPTIMIZATION_METHOD = os.getenv("OPTIMIZATION_METHOD", "greedy").strip().lower()
+
+# Бюджет по умолчанию (USD)
+DEFAULT_BUDGET = float(os.getenv("DEFAULT_BUDGET", "1000"))
+
+# Максимальная доля бюджета, вкладываемая в одну игру
+MAX_GAME_EXPOSURE = float(os.getenv("MAX_GAME_EXPOSURE", "0.5"))
+
+# Ограничение времени точного решения (секунды)
+OPTIMIZATION_TIME_LIMIT = float(os.getenv("OPTIMIZATION_TIME_LIMIT", "1.0"))
+
+# Максимальное количество кандидатов для точного решения; для больших наборов - жадный алгоритм
+EXACT_MAX_CANDIDATES = int(os.getenv("EXACT_MAX_CANDIDATES", "500"))
+
+
+class PortfolioSelection:
+    """
+    Выбранный портфель возможностей.
+
+    Attributes:
+        selected: Выбранные возможности по убыванию прибыли
+        budget_cents: Бюджет
+        total_cost_cents: Суммарная стоимость покупок
+        expected_profit_cents: Суммарная ожидаемая прибыль
+        method: Метод, давший результат (greedy, scipy, pulp)
+        optimal: Доказана ли оптимальность решения
+        elapsed: Время оптимизации в секундах
+    """
+
+    __slots__ = (
+        "selected",
+        "budget_cents",
+        "total_cost_cents",
+        "expected_profit_cents",
+        "method",
+        "optimal",
+        "elapsed",
+    )
+
+    def __init__(
+        self,
+        selected: List[Opportunity],
+        budget_cents: Cents,
+        method: str,
+        optimal: bool,
+        elapsed: float = 0.0,
+    ):
+        self.selected = sorted(
+            selected, key=lambda opportunity: opportunity.profit_cents, reverse=True
+        )
+        self.budget_cents = budget_cents
+        self.total_cost_cents = sum(opportunity.buy_price_cents for opportunity in selected)
+        self.expected_profit_cents = sum(opportunity.profit_cents for opportunity in selected)
+        self.method = method
+        self.optimal = optimal
+        self.elapsed = elapsed
+
+    def cost_by_game(self) -> Dict[str, Cents]:
+        """Возвращает стоимость выбранных покупок по играм."""
+        costs: Dict[str, Cents] = {}
+        for opportunity in self.selected:
+            costs[opportunity.game] = costs.get(opportunity.game, 0) + opportunity.buy_price_cents
+        return costs
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает портфель в формате файла результатов."""
+        return {
+            "budget": cents_to_usd(self.budget_cents),
+            "total_cost": cents_to_usd(self.total_cost_cents),
+            "expected_profit": cents_to_usd(self.expected_profit_cents),
+            "method": self.method,
+            "optimal": self.optimal,
+            "elapsed_seconds": self.elapsed,
+            "cost_by_game": {
+                game: cents_to_usd(cost) for game, cost in self.cost_by_game().items()
+            },
+            "items": [opportunity.to_dict() for opportunity in self.selected],
+        }
+
+
+class PortfolioOptimizer:
+    """
+    Выбирает набор возможностей с максимальной ожидаемой прибылью в пределах бюджета.
+
+    Каждая возможность - покупка одного предмета по buy_price_cents с
+    ожидаемой прибылью profit_cents.
+    """
+
+    def __init__(
+        self,
+        budget_cents: Optional[Cents] = None,
+        max_game_exposure: float = MAX_GAME_EXPOSURE,
+        game_limits: Optional[Dict[str, Cents]] = None,
+        method: str = OPTIMIZATION_METHOD,
+        time_limit: float = OPTIMIZATION_TIME_LIMIT,
+        exact_max_candidates: int = EXACT_MAX_CANDIDATES,
+    ):
+        """
+        Args:
+            budget_cents: Бюджет в центах (по умолчанию DEFAULT_BUDGET)
+            max_game_exposure: Доля бюджета, которую можно вложить в одну игру
+            game_limits: Явные лимиты вложений по играм в центах
+            method: Метод точного решения: pulp, scipy или greedy (только жадный алгоритм)
+            time_limit: Ограничение времени точного решения в секундах
+            exact_max_candidates: Максимальное количество кандидатов для точного решения
+        """
+        self.budget_cents = (
+            budget_cents if budget_cents is not None else usd_to_cents(DEFAULT_BUDGET)
+        )
+        self.max_game_exposure = max_game_exposure
+        self.game_limits = game_limits or {}
+        self.method = method
+        self.time_limit = time_limit
+        self.exact_max_candidates = exact_max_candidates
+
+    def game_limit(self, game: str) -> Cents:
+        """Возвращает лимит вложений в игру."""
+        if game in self.game_limits:
+            return self.game_limits[game]
+        return round(self.budget_cents * self.max_game_exposure)
+
+    def optimize_results(self, results: Dict[str, List[Opportunity]]) -> PortfolioSelection:
+        """Выбирает портфель из результатов ArbitrageAnalyzer.analyze_all_games."""
+        return self.optimize(
+            opportunity for opportunities in results.values() for opportunity in opportunities
+        )
+
+    def optimize(self, opportunities: Iterable[Opportunity]) -> PortfolioSelection:
+        """
+        Выбирает портфель.
+
+        Возможности без прибыли и дороже лимита своей игры не рассматриваются.
+
+        Args:
+            opportunities: Возможности
+
+        Returns:
+            Выбранный портфель
+        """
+        started = time.perf_counter()
+        candidates = [
+            opportunity
+            for opportunity in opportunities
+            if opportunity.profit_cents > 0
+            and 0
+            < opportunity.buy_price_cents
+            <= min(self.budget_cents, self.game_limit(opportunity.game))
+        ]
+
+        selection = self._greedy(candidates)
+
+        method = self._exact_method()
+        if method is not None and 0 < len(candidates) <= self.exact_max_candidates:
+            try:
+                exact = self._exact(candidates, method)
+            except Exception as e:
+                logger.warning(f"Точное решение методом {method} не удалось: {e}")
+                exact = None
+            if exact is not None and exact.expected_profit_cents >= selection.expected_profit_cents:
+                selection = exact
+
+        selection.elapsed = time.perf_counter() - started
+        logger.info(
+            f"Портфель ({selection.method}{', оптимальный' if selection.optimal else ''}): "
+            f"{len(selection.selected)} из {len(candidates)} возможностей, "
+            f"стоимость ${cents_to_usd(selection.total_cost_cents):.2f} "
+            f"из ${cents_to_usd(self.budget_cents):.2f}, "
+            f"ожидаемая прибыль ${cents_to_usd(selection.expected_profit_cents):.2f} "
+            f"за {selection.elapsed * 1000:.1f} мс"
+        )
+        return selection
+
+    def _exact_method(self) -> Optional[str]:
+        """Возвращает доступный метод точного решения с учетом настройки."""
+        if self.method == "greedy":
+            return None
+        if self.method == "pulp" and PULP_AVAILABLE:
+            return "pulp"
+        if SCIPY_AVAILABLE:
+            return "scipy"
+        if PULP_AVAILABLE:
+            return "pulp"
+        logger.debug("scipy и PuLP недоступны, используется жадный алгоритм")
+        return None
+
+    def _greedy(self, candidates: List[Opportunity]) -> PortfolioSelection:
+        """
+        Жадный выбор по убыванию отношения прибыль/стоимость за O(n log n).
+
+        Результат сравнивается с самой прибыльной одиночной покупкой, что
+        гарантирует не меньше половины оптимума для одного ограничения.
+        """
+        costs = np.fromiter(
+            (opportunity.buy_price_cents for opportunity in candidates),
+            dtype=np.int64,
+            count=len(candidates),
+        )
+        profits = np.fromiter(
+            (opportunity.profit_cents for opportunity in candidates),
+            dtype=np.int64,
+            count=len(candidates),
+        )
+        order = np.argsort(-(profits / np.maximum(costs, 1)), kind="stable")
+
+        remaining = self.budget_cents
+        game_remaining: Dict[str, Cents] = {}
+        selected = []
+        for index in order.tolist():
+            opportunity = candidates[index]
+            cost = opportunity.buy_price_cents
+            game_left = game_remaining.get(opportunity.game)
+            if game_left is None:
+                game_left = self.game_limit(opportunity.game)
+            if cost <= remaining and cost <= game_left:
+                selected.append(opportunity)
+                remaining -= cost
+                game_remaining[opportunity.game] = game_left - cost
+
+        if len(candidates):
+            best_single = candidates[int(np.argmax(profits))]
+            if best_single.profit_cents > sum(opportunity.profit_cents for opportunity in selected):
+                selected = [best_single]
+
+        return PortfolioSelection(selected, self.budget_cents, "greedy", optimal=False)
+
+    def _constraints(self, candidates: List[Opportunity]):
+        """Возвращает матрицу ограничений (бюджет и игры) и правые части."""
+        games = sorted({opportunity.game for opportunity in candidates})
+        costs = np.array(
+            [opportunity.buy_price_cents for opportunity in candidates], dtype=np.float64
+        )
+        matrix = np.zeros((1 + len(games), len(candidates)), dtype=np.float64)
+        matrix[0] = costs
+        for row, game in enumerate(games, start=1):
+            matrix[row] = np.where(
+                [opportunity.game == game for opportunity in candidates], costs, 0.0
+            )
+        upper = np.array(
+            [self.budget_cents] + [self.game_limit(game) for game in games], dtype=np.float64
+        )
+        return matrix, upper
+
+    def _exact(self, candidates: List[Opportunity], method: str) -> Optional[PortfolioSelection]:
+        """Решает целочисленную задачу с ограничением времени time_limit."""
+        profits = np.array(
+            [opportunity.profit_cents for opportunity in candidates], dtype=np.float64
+        )
+        matrix, upper = self._constraints(candidates)
+
+        if method == "scipy":
+            result = milp(
+                c=-profits,
+                constraints=LinearConstraint(matrix, -np.inf, upper),
+                integrality=np.ones(len(candidates)),
+                bounds=Bounds(0, 1),
+                options={"time_limit": self.time_limit, "disp": False},
+            )
+            if result.x is None:
+                return None
+            chosen = result.x > 0.5
+            optimal = result.status == 0
+        else:
+            problem = pulp.LpProblem("portfolio", pulp.LpMaximize)
+            variables = [pulp.LpVariable(f"x{i}", cat="Binary") for i in range(len(candidates))]
+            problem += pulp.lpDot(profits.tolist(), variables)
+            for row, bound in zip(matrix, upper):
+                problem += pulp.lpDot(row.tolist(), variables) <= bound
+            status = problem.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=self.time_limit))
+            if pulp.LpStatus[status] not in ("Optimal", "Not Solved"):
+                return None
+            chosen = np.array([(variable.value() or 0) > 0.5 for variable in variables])
+            optimal = pulp.LpStatus[status] == "Optimal"
+
+        selected = [candidate for candidate, keep in zip(candidates, chosen.tolist()) if keep]
+        return PortfolioSelection(selected, self.budget_cents, method, optimal=optimal)
@@ -0,0 +1,502 @@
+"""
+Книга заявок предмета с инкрементальными обновлениями.
+
+Для каждой стороны книги (ордера на покупку и предложения продажи)
+количества хранятся в словаре цена -> количество и в дереве Фенвика над
+ценами в центах: узел дерева хранит суммы количества, стоимости и числа
+уровней своего отрезка цен. Изменение уровня, лучшая цена, количество до
+предельной цены и стоимость исполнения заданного количества вычисляются
+за O(log P), где P - верхняя граница цен стороны; количество на уровне -
+за O(1). Узлы хранятся в словаре и создаются только на пути изменений,
+поэтому память не зависит от диапазона цен (O(log P) узлов на уровень).
+Стороны до TREE_MIN_LEVELS уровней (большинство книг сканера) дерево не
+хранят и отвечают перебором словаря за O(TREE_MIN_LEVELS).
+
+Предложения продажи DMarket учитываются как заявки с идентификатором
+itemId, поэтому изменение цены или исчезновение предложения обновляет
+только его уровень. Ордера на покупку предмета повторяются в объекте
+каждого его предложения, поэтому уровни покупки объединяются по всем
+предложениям названия: количество уровня - наибольшее из указанных в
+предложениях. Предложение без ордеров прежние уровни не меняет, уровни
+предложения удаляются вместе с ним.
+
+Пример использования:
+    books = OrderBooks()
+    books.apply_listing(listing, bids)
+    book = books.get(listing.title)
+    print(book.best_bid(), book.best_ask(), book.buy_quantity(limit_price=1500))
+"""
+
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src.arbitrage.records import MarketItem
+from src.utils.price import Cents
+
+logger = logging.getLogger("order_book")
+
+# Стороны книги
+BID = "bid"
+ASK = "ask"
+
+# Число уровней стороны, с которого запросы отвечаются по дереву Фенвика;
+# на малых сторонах перебор словаря быстрее и не требует памяти под узлы
+TREE_MIN_LEVELS = 32
+
+
+class BookSide:
+    """
+    Одна сторона книги: количества на уровнях цен и дерево Фенвика над ценами.
+
+    Лучшая цена - минимальная для предложений продажи и максимальная для
+    ордеров на покупку. Граница дерева удваивается при появлении цены выше
+    нее: новый корень получает суммы всей стороны, остальные узлы не меняются.
+    Дерево строится, когда уровней становится больше TREE_MIN_LEVELS, и
+    удаляется, когда их остается меньше половины порога; до этого запросы
+    перебирают словарь уровней.
+    """
+
+    __slots__ = ("descending", "quantities", "_tree", "_size", "_total")
+
+    def __init__(self, descending: bool):
+        self.descending = descending
+        self.quantities: Dict[Cents, int] = {}
+        # Узел дерева -> [количество, стоимость, число уровней] отрезка цен узла
+        self._tree: Optional[Dict[int, List[int]]] = None
+        self._size = 1
+        self._total = [0, 0, 0]
+
+    def __len__(self) -> int:
+        return len(self.quantities)
+
+    def _update(self, price: Cents, quantity: int, levels: int) -> None:
+        total = self._total
+        if self._tree is not None:
+            self._update_tree(price, quantity, levels, total)
+        total[0] += quantity
+        total[1] += price * quantity
+        total[2] += levels
+
+    def _update_tree(self, price: Cents, quantity: int, levels: int, total: List[int]) -> None:
+        """Добавляет изменение уровня в дерево; total - суммы стороны до изменения."""
+        tree = self._tree
+        while price > self._size:
+            self._size *= 2
+            if total[0] or total[2]:
+                tree[self._size] = list(total)
+        notional = price * quantity
+        size = self._size
+        node = price
+        while node <= size:
+            sums = tree.get(node)
+            if sums is None:
+                tree[node] = [quantity, notional, levels]
+            else:
+                sums[0] += quantity
+                sums[1] += notional
+                sums[2] += levels
+            node += node & -node
+
+    def _resize_tree(self) -> None:
+        """Строит дерево для крупной стороны и удаляет его у стороны, ставшей малой."""
+        levels = len(self.quantities)
+        if self._tree is None:
+            if levels <= TREE_MIN_LEVELS:
+                return
+            self._tree = {}
+            total = [0, 0, 0]
+            for price, quantity in self.quantities.items():
+                self._update_tree(price, quantity, 1, total)
+                total[0] += quantity
+                total[1] += price * quantity
+                total[2] += 1
+        elif levels < TREE_MIN_LEVELS // 2:
+            self._tree = None
+            self._size = 1
+
+    def _prefix(self, price: Cents) -> Tuple[int, int, int]:
+        """Суммы количества, стоимости и числа уровней по ценам не выше price."""
+        tree = self._tree
+        quantity = notional = levels = 0
+        if tree is None:
+            for level_price, level_quantity in self.quantities.items():
+                if level_price <= price:
+                    quantity += level_quantity
+                    notional += level_price * level_quantity
+                    levels += 1
+            return quantity, notional, levels
+        if price >= self._size:
+            quantity, notional, levels = self._total
+            return quantity, notional, levels
+        node = price
+        while node > 0:
+            sums = tree.get(node)
+            if sums is not None:
+                quantity += sums[0]
+                notional += sums[1]
+                levels += sums[2]
+            node &= node - 1
+        return quantity, notional, levels
+
+    def _search(self, quantity: int) -> Tuple[Cents, int, int]:
+        """
+        Находит минимальную цену, на которой накопленное от низших цен количество
+        достигает quantity.
+
+        Returns:
+            (цена, количество и стоимость на всех более низких ценах)
+        """
+        tree = self._tree
+        below_quantity = below_notional = 0
+        if tree is None:
+            price = 0
+            for price in sorted(self.quantities):
+                level_quantity = self.quantities[price]
+                if below_quantity + level_quantity >= quantity:
+                    return price, below_quantity, below_notional
+                below_quantity += level_quantity
+                below_notional += price * level_quantity
+            return price + 1, below_quantity, below_notional
+        position = 0
+        step = self._size
+        while step:
+            node = position + step
+            sums = tree.get(node)
+            if sums is None:
+                # Узел без изменений - отрезок цен без уровней
+                position = node
+            elif below_quantity + sums[0] < quantity:
+                position = node
+                below_quantity += sums[0]
+                below_notional += sums[1]
+            step >>= 1
+        return position + 1, below_quantity, below_notional
+
+    def add(self, price: Cents, delta: int) -> None:
+        """Изменяет количество на уровне price на delta; уровень без количества удаляется."""
+        if not delta:
+            return
+        if price <= 0:
+            raise ValueError(f"Цена уровня книги должна быть положительной: {price}")
+        current = self.quantities.get(price)
+        quantity = (current or 0) + delta
+        if quantity > 0:
+            self.quantities[price] = quantity
+            levels = 0 if current is not None else 1
+            self._update(price, delta, levels)
+        elif current is not None:
+            del self.quantities[price]
+            levels = -1
+            self._update(price, -current, levels)
+        else:
+            return
+        if levels:
+            self._resize_tree()
+
+    def set(self, price: Cents, quantity: int) -> None:
+        """Устанавливает количество на уровне price (0 - удалить уровень)."""
+        self.add(price, quantity - self.quantities.get(price, 0))
+
+    def best(self) -> Cents:
+        """Возвращает лучшую цену (0, если уровней нет)."""
+        total = self._total[0]
+        if not total:
+            return 0
+        if self._tree is None:
+            return max(self.quantities) if self.descending else min(self.quantities)
+        return self._search(total if self.descending else 1)[0]
+
+    def levels_within(self, limit_price: Cents) -> int:
+        """Возвращает количество уровней с ценой не хуже limit_price."""
+        if self.descending:
+            return self._total[2] - self._prefix(limit_price - 1)[2]
+        return self._prefix(limit_price)[2]
+
+    def quantity_within(self, limit_price: Cents) -> int:
+        """Возвращает суммарное количество на уровнях с ценой не хуже limit_price."""
+        if self.descending:
+            return self._total[0] - self._prefix(limit_price - 1)[0]
+        return self._prefix(limit_price)[0]
+
+    def fill(self, quantity: int) -> Tuple[int, int]:
+        """
+        Исполняет quantity по уровням от лучшей цены.
+
+        Returns:
+            (исполненное количество, стоимость в центах); количество меньше
+            запрошенного, если на стороне не хватает заявок
+        """
+        total, total_notional, _ = self._total
+        if quantity >= total:
+            return total, total_notional
+        if quantity <= 0:
+            return 0, 0
+        if not self.descending:
+            # Уровень, на котором накопленное от лучшей цены количество достигает quantity
+            price, below_quantity, below_notional = self._search(quantity)
+            return quantity, below_notional + (quantity - below_quantity) * price
+        # От лучшей (высшей) цены: ниже уровня исполнения остается total - quantity
+        price, below_quantity, below_notional = self._search(total - quantity + 1)
+        level_quantity = self.quantities[price]
+        above_quantity = total - below_quantity - level_quantity
+        above_notional = total_notional - below_notional - level_quantity * price
+        return quantity, above_notional + (quantity - above_quantity) * price
+
+    def total_quantity(self) -> int:
+        return self._total[0]
+
+
+class OrderBook:
+    """Книга заявок одного предмета."""
+
+    __slots__ = ("bids", "asks", "_orders", "_order_levels")
+
+    def __init__(self):
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        # Идентификатор заявки -> (сторона, цена, количество)
+        self._orders: Dict[str, Tuple[str, Cents, int]] = {}
+        # Сторона -> цена -> суммарное количество заявок upsert_order на уровне
+        self._order_levels: Dict[str, Dict[Cents, int]] = {BID: {}, ASK: {}}
+
+    def _side(self, side: str) -> BookSide:
+        if side == BID:
+            return self.bids
+        if side == ASK:
+            return self.asks
+        raise ValueError(f"Неизвестная сторона книги: {side}")
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def _add_order(self, side: str, price_cents: Cents, quantity: int) -> None:
+        self._side(side).add(price_cents, quantity)
+        levels = self._order_levels[side]
+        total = levels.get(price_cents, 0) + quantity
+        if total:
+            levels[price_cents] = total
+        else:
+            del levels[price_cents]
+
+    def upsert_order(self, order_id: str, side: str, price_cents: Cents, quantity: int = 1) -> None:
+        """Добавляет заявку или изменяет ее цену и количество."""
+        previous = self._orders.get(order_id)
+        if previous == (side, price_cents, quantity):
+            return
+        # Сторона проверяется до изменения книги
+        self._side(side)
+        if previous is not None:
+            self._add_order(previous[0], previous[1], -previous[2])
+        self._add_order(side, price_cents, quantity)
+        self._orders[order_id] = (side, price_cents, quantity)
+
+    def remove_order(self, order_id: str) -> bool:
+        """Удаляет заявку; возвращает False, если ее не было."""
+        previous = self._orders.pop(order_id, None)
+        if previous is None:
+            return False
+        self._add_order(previous[0], previous[1], -previous[2])
+        return True
+
+    def set_level(self, side: str, price_cents: Cents, quantity: int) -> int:
+        """
+        Устанавливает агрегированное количество на уровне цены (0 - удалить уровень).
+
+        Заявки upsert_order на этом уровне сохраняются.
+
+        Returns:
+            1, если количество на уровне изменилось, иначе 0
+        """
+        book_side = self._side(side)
+        quantity += self._order_levels[side].get(price_cents, 0)
+        if book_side.quantities.get(price_cents, 0) == quantity:
+            return 0
+        book_side.set(price_cents, quantity)
+        return 1
+
+    def replace_levels(self, side: str, levels: Iterable[Tuple[Cents, int]]) -> int:
+        """
+        Заменяет агрегированные уровни стороны, применяя только изменения.
+
+        Заявки, добавленные через upsert_order, сохраняются.
+
+        Args:
+            side: Сторона книги
+            levels: Пары (цена, количество); одинаковые цены суммируются
+
+        Returns:
+            Количество изменившихся уровней
+        """
+        book_side = self._side(side)
+        target: Dict[Cents, int] = {}
+        for price, quantity in levels:
+            if price > 0 and quantity > 0:
+                target[price] = target.get(price, 0) + quantity
+
+        changes = 0
+        for price in [price for price in book_side.quantities if price not in target]:
+            changes += self.set_level(side, price, 0)
+        for price, quantity in target.items():
+            changes += self.set_level(side, price, quantity)
+        return changes
+
+    def best_bid(self) -> Cents:
+        """Лучшая цена покупки (0, если ордеров нет)."""
+        return self.bids.best()
+
+    def best_ask(self) -> Cents:
+        """Лучшая цена продажи (0, если предложений нет)."""
+        return self.asks.best()
+
+    def spread(self) -> Optional[Cents]:
+        """Разница лучших цен продажи и покупки (None, если одной из сторон нет)."""
+        if not self.bids.quantities or not self.asks.quantities:
+            return None
+        return self.asks.best() - self.bids.best()
+
+    def depth_at(self, side: str, price_cents: Cents) -> int:
+        """Количество на уровне цены."""
+        return self._side(side).quantities.get(price_cents, 0)
+
+    def buy_quantity(self, limit_price: Cents) -> int:
+        """Количество, которое можно купить по цене не выше limit_price."""
+        return self.asks.quantity_within(limit_price)
+
+    def sell_quantity(self, limit_price: Cents) -> int:
+        """Количество, которое можно продать по цене не ниже limit_price."""
+        return self.bids.quantity_within(limit_price)
+
+    def buy_cost(self, quantity: int) -> Tuple[int, int]:
+        """Стоимость покупки quantity по лучшим предложениям: (купленное количество, стоимость)."""
+        return self.asks.fill(quantity)
+
+    def sell_proceeds(self, quantity: int) -> Tuple[int, int]:
+        """Выручка от продажи quantity по лучшим ордерам: (проданное количество, выручка)."""
+        return self.bids.fill(quantity)
+
+
+class OrderBooks:
+    """
+    Книги заявок набора предметов (по названиям).
+
+    Предложения продажи учитываются как заявки с идентификатором itemId,
+    ордера на покупку - как агрегированные уровни, объединенные по всем
+    предложениям названия.
+    """
+
+    def __init__(self):
+        self._books: Dict[str, OrderBook] = {}
+        # itemId предложения -> название предмета
+        self._order_titles: Dict[str, str] = {}
+        # itemId предложения -> его ордера на покупку (цена, количество)
+        self._listing_bids: Dict[str, Sequence[Tuple[Cents, int]]] = {}
+        # Название -> цена -> количество уровня -> число предложений с таким уровнем
+        self._bid_sources: Dict[str, Dict[Cents, Dict[int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self._books
+
+    def items(self) -> Iterator[Tuple[str, OrderBook]]:
+        """Возвращает пары (название предмета, книга)."""
+        return iter(self._books.items())
+
+    def get(self, title: str) -> Optional[OrderBook]:
+        """Возвращает книгу предмета (None, если предмет не встречался)."""
+        return self._books.get(title)
+
+    def best_bid(self, title: str, default: Cents = 0) -> Cents:
+        """Возвращает лучшую цену покупки предмета (default, если предмет не встречался)."""
+        book = self._books.get(title)
+        return book.bids.best() if book is not None else default
+
+    def best_ask(self, title: str) -> Cents:
+        """Возвращает лучшую цену предложения предмета (0, если предложений нет)."""
+        book = self._books.get(title)
+        return book.asks.best() if book is not None else 0
+
+    def _book(self, title: str) -> OrderBook:
+        book = self._books.get(title)
+        if book is None:
+            book = self._books[title] = OrderBook()
+        return book
+
+    @staticmethod
+    def _bid_levels(bids: Sequence[Tuple[Cents, int]]) -> Dict[Cents, int]:
+        levels: Dict[Cents, int] = {}
+        for price, quantity in bids:
+            if price > 0 and quantity > 0:
+                levels[price] = levels.get(price, 0) + quantity
+        return levels
+
+    def _set_listing_bids(
+        self, title: str, book: OrderBook, order_id: str, bids: Sequence[Tuple[Cents, int]]
+    ) -> None:
+        """Заменяет ордера на покупку предложения и пересчитывает затронутые уровни книги."""
+        sources = self._bid_sources.setdefault(title, {})
+        previous = self._bid_levels(self._listing_bids.pop(order_id, ()))
+        levels = self._bid_levels(bids)
+        for price, quantity in previous.items():
+            counts = sources[price]
+            counts[quantity] -= 1
+            if not counts[quantity]:
+                del counts[quantity]
+        for price, quantity in levels.items():
+            counts = sources.setdefault(price, {})
+            counts[quantity] = counts.get(quantity, 0) + 1
+        if bids:
+            self._listing_bids[order_id] = bids
+
+        for price in previous.keys() | levels.keys():
+            counts = sources.get(price)
+            if counts:
+                book.set_level(BID, price, max(counts))
+            else:
+                sources.pop(price, None)
+                book.set_level(BID, price, 0)
+        if not sources:
+            del self._bid_sources[title]
+
+    def apply_listing(
+        self, listing: MarketItem, bids: Optional[Sequence[Tuple[Cents, int]]] = None
+    ) -> None:
+        """
+        Учитывает предложение продажи и, если указаны, ордера на покупку предмета.
+
+        Args:
+            listing: Предложение
+            bids: Ордера на покупку предмета (цена, количество) из того же объекта API;
+                без ордеров уровни покупки, ранее указанные предложением, сохраняются
+        """
+        title = self._order_titles.get(listing.item_id)
+        if title is not None and title != listing.title:
+            self.remove_orders([listing.item_id])
+        book = self._book(listing.title)
+        book.upsert_order(listing.item_id, ASK, listing.price_cents)
+        self._order_titles[listing.item_id] = listing.title
+        if bids and bids != self._listing_bids.get(listing.item_id):
+            self._set_listing_bids(listing.title, book, listing.item_id, bids)
+
+    def remove_orders(self, order_ids: Iterable[str]) -> int:
+        """
+        Удаляет исчезнувшие предложения; книги без предложений удаляются.
+
+        Returns:
+            Количество удаленных предложений
+        """
+        removed = 0
+        for order_id in order_ids:
+            title = self._order_titles.pop(order_id, None)
+            if title is None:
+                continue
+            book = self._books[title]
+            book.remove_order(order_id)
+            if order_id in self._listing_bids:
+                self._set_listing_bids(title, book, order_id, ())
+            removed += 1
+            # Ордера на покупку приходят вместе с предложениями, без них книга не обновляется
+            if not len(book):
+                del self._books[title]
+        return removed
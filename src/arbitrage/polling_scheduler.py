@@ -0,0 +1,387 @@
+"""
+Приоритетный опрос предметов в пределах бюджета запросов.
+
+Каждый проход по рынку требует запросов истории продаж для новых и
+изменившихся предметов. Планировщик ранжирует предметы по приоритету и
+тратит фиксированный бюджет запросов на проход в порядке приоритета:
+
+    приоритет = нагрев * (возраст / age_scale [+ 1 для изменившихся])
+
+Нагрев предмета растет с волатильностью цены (скользящее среднее
+относительного изменения цены предложений), частотой продаж (относительно
+MIN_ITEM_LIQUIDITY) и прибыльностью в прошлых оценках. Возраст - время с
+последней оценки предмета. Частота опроса предмета пропорциональна его
+нагреву: ликвидные и волатильные предметы опрашиваются чаще, а холодные
+все равно опрашиваются, когда их возраст становится достаточно большим.
+
+Оставшийся после изменившихся предметов бюджет тратится на досрочное
+обновление истории горячих предметов без изменений, поэтому общее
+количество запросов равно бюджету, а задержка обнаружения возможностей по
+ликвидным предметам уменьшается.
+
+План можно составлять постранично (PollRound): кандидаты на запрос
+хранятся в куче размером с бюджет, поэтому память прохода не зависит от
+размера рынка.
+
+Пример использования:
+    scheduler = PollingScheduler(budget=50)
+    scheduler.observe(listings)
+    plan = scheduler.plan(changed, unchanged, needs_request=lambda item: item.item_id not in cache)
+    opportunities = await score(plan.rescore)
+    scheduler.record_scored(plan.rescore, sale_counts, opportunities)
+"""
+
+import heapq
+import logging
+import math
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.arbitrage.records import MarketItem, Opportunity
+from src.utils.ttl_cache import CACHE_TTL
+
+logger = logging.getLogger("polling_scheduler")
+
+# Бюджет запросов истории продаж на один проход игры (0 - без ограничения, планировщик отключен)
+POLL_REQUEST_BUDGET = int(os.getenv("POLL_REQUEST_BUDGET", "0"))
+
+# Минимальное количество продаж за период, при котором предмет считается ликвидным
+MIN_ITEM_LIQUIDITY = int(os.getenv("MIN_ITEM_LIQUIDITY", "10"))
+
+# Минимальный интервал досрочного обновления истории предмета без изменений (секунды)
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "60"))
+
+# Вес новых наблюдений в скользящих оценках
+STATS_SMOOTHING = 0.2
+
+# Веса составляющих нагрева и значения, соответствующие единице нагрева
+VOLATILITY_WEIGHT = 2.0
+VOLATILITY_REFERENCE = 0.05  # 5% изменения цены за наблюдение
+LIQUIDITY_WEIGHT = 1.0
+PROFIT_WEIGHT = 1.0
+PROFIT_REFERENCE = 10.0  # 10% прибыли
+
+# Ограничение каждой составляющей нагрева, чтобы один признак не вытеснял остальные
+COMPONENT_CAP = 3.0
+
+
+class TitleStats:
+    """
+    Статистика предмета (по названию), общая для всех его предложений.
+
+    Attributes:
+        volatility: Скользящее среднее относительного изменения цены предложений
+        sales: Количество продаж в последней загруженной истории
+        profit: Скользящее среднее процента прибыли в оценках (0 - оценка без прибыли)
+    """
+
+    __slots__ = ("volatility", "sales", "profit")
+
+    def __init__(self):
+        self.volatility = 0.0
+        self.sales = 0
+        self.profit = 0.0
+
+    def heat(self, min_liquidity: int) -> float:
+        """Возвращает нагрев: 1 для холодного предмета, больше - для горячего."""
+        return (
+            1.0
+            + VOLATILITY_WEIGHT * min(self.volatility / VOLATILITY_REFERENCE, COMPONENT_CAP)
+            + LIQUIDITY_WEIGHT * min(self.sales / max(min_liquidity, 1), COMPONENT_CAP)
+            + PROFIT_WEIGHT * min(max(self.profit, 0.0) / PROFIT_REFERENCE, COMPONENT_CAP)
+        )
+
+
+class PollPlan:
+    """
+    План прохода.
+
+    Attributes:
+        rescore: Предметы, которые нужно оценить в этом проходе
+        refresh: Предметы без изменений из rescore, историю которых нужно загрузить заново
+        deferred: Изменившиеся предметы, отложенные до следующих проходов
+        requests: Количество запросов истории, потраченных планом
+    """
+
+    __slots__ = ("rescore", "refresh", "deferred", "requests")
+
+    def __init__(
+        self,
+        rescore: List[MarketItem],
+        refresh: List[MarketItem],
+        deferred: List[MarketItem],
+        requests: int,
+    ):
+        self.rescore = rescore
+        self.refresh = refresh
+        self.deferred = deferred
+        self.requests = requests
+
+
+class PollRound:
+    """
+    Постраничное составление плана прохода.
+
+    Кандидаты на запрос истории хранятся в куче не больше budget штук.
+    Изменившийся предмет, вытесненный из кучи, сразу откладывается, а
+    предметы, не требующие запроса, сразу возвращаются для оценки, поэтому
+    страницы не накапливаются. Итоговый набор запросов совпадает с планом
+    по всем страницам сразу.
+
+    Attributes:
+        requests: Количество запросов (при неограниченном бюджете)
+        deferred: Количество отложенных изменившихся предметов
+    """
+
+    def __init__(
+        self,
+        scheduler: "PollingScheduler",
+        needs_request: Callable[[MarketItem], bool],
+        budget: int,
+    ):
+        self.scheduler = scheduler
+        self.needs_request = needs_request
+        self.budget = budget
+        self.now = time.time()
+        self.repoll_before = self.now - scheduler.min_repoll_interval
+        self.requests = 0
+        self.deferred = 0
+        # Минимальная куча (приоритет, -порядковый номер, изменился ли, предмет):
+        # при равном приоритете сохраняется предмет, встреченный раньше
+        self._heap: List[Tuple[float, int, bool, MarketItem]] = []
+        self._offered = 0
+
+    def add(
+        self, changed: Iterable[MarketItem], unchanged: Iterable[MarketItem]
+    ) -> Tuple[List[MarketItem], List[MarketItem]]:
+        """
+        Учитывает предметы очередной страницы.
+
+        Args:
+            changed: Новые и изменившиеся предметы страницы
+            unchanged: Предметы страницы без изменений
+
+        Returns:
+            Предметы, которые нужно оценить сразу (история в кэше или бюджет
+            не ограничен), и изменившиеся предметы, отложенные до следующих проходов
+        """
+        if self.budget <= 0:
+            changed = list(changed)
+            self.requests += sum(1 for item in changed if self.needs_request(item))
+            return changed, []
+
+        scheduler = self.scheduler
+        rescore: List[MarketItem] = []
+        deferred: List[MarketItem] = []
+        for item in changed:
+            if self.needs_request(item):
+                self._offer(scheduler.priority(item, True, self.now), True, item, deferred)
+            else:
+                rescore.append(item)
+
+        for item in unchanged:
+            scored_at = scheduler._scored_at.get(item.item_id)
+            if scored_at is not None and scored_at <= self.repoll_before:
+                self._offer(scheduler.priority(item, False, self.now), False, item, deferred)
+
+        self.deferred += len(deferred)
+        scheduler.deferred_items += len(deferred)
+        return rescore, deferred
+
+    def _offer(
+        self, priority: float, changed: bool, item: MarketItem, deferred: List[MarketItem]
+    ) -> None:
+        """Добавляет кандидата в кучу; вытесненный изменившийся предмет откладывается."""
+        entry = (priority, -self._offered, changed, item)
+        self._offered += 1
+        if len(self._heap) < self.budget:
+            heapq.heappush(self._heap, entry)
+            return
+        if entry[:2] < self._heap[0][:2]:
+            dropped = entry
+        else:
+            dropped = heapq.heapreplace(self._heap, entry)
+        if dropped[2]:
+            deferred.append(dropped[3])
+
+    def finish(self) -> PollPlan:
+        """
+        Завершает план: предметы, оставшиеся в куче, оцениваются с запросом истории.
+
+        Returns:
+            План с выбранными предметами по убыванию приоритета; отложенные
+            предметы уже возвращены add()
+        """
+        if self.budget <= 0:
+            return PollPlan([], [], [], self.requests)
+
+        selected = sorted(self._heap, reverse=True)
+        self._heap = []
+        rescore = [item for _, _, _, item in selected]
+        refresh = [item for _, _, changed, item in selected if not changed]
+
+        scheduler = self.scheduler
+        scheduler.planned_requests += len(selected)
+        scheduler.refreshed_items += len(refresh)
+        logger.debug(
+            f"План опроса: запросов {len(selected)} из {self.budget}, "
+            f"досрочно {len(refresh)}, отложено {self.deferred}"
+        )
+        return PollPlan(rescore, refresh, [], len(selected))
+
+
+class PollingScheduler:
+    """Распределяет бюджет запросов истории продаж между предметами по приоритету."""
+
+    def __init__(
+        self,
+        budget: int = POLL_REQUEST_BUDGET,
+        min_liquidity: int = MIN_ITEM_LIQUIDITY,
+        age_scale: float = CACHE_TTL,
+        min_repoll_interval: float = POLL_MIN_INTERVAL,
+    ):
+        """
+        Args:
+            budget: Запросов истории на проход (0 - без ограничения)
+            min_liquidity: Количество продаж, соответствующее единице составляющей ликвидности
+            age_scale: Возраст оценки (секунды), при котором приоритет равен нагреву
+            min_repoll_interval: Минимальный возраст оценки для досрочного обновления истории
+        """
+        self.budget = budget
+        self.min_liquidity = min_liquidity
+        self.age_scale = max(age_scale, 1.0)
+        self.min_repoll_interval = min_repoll_interval
+
+        self._titles: Dict[str, TitleStats] = {}
+        # itemId -> последняя наблюдаемая цена и время последней оценки
+        self._last_price: Dict[str, int] = {}
+        self._scored_at: Dict[str, float] = {}
+
+        self.planned_requests = 0
+        self.deferred_items = 0
+        self.refreshed_items = 0
+
+    def _title_stats(self, title: str) -> TitleStats:
+        stats = self._titles.get(title)
+        if stats is None:
+            stats = self._titles[title] = TitleStats()
+        return stats
+
+    def observe(self, listings: Iterable[MarketItem]) -> None:
+        """
+        Учитывает цены предложений очередной страницы в волатильности предметов.
+
+        Предложение без изменения цены уменьшает волатильность, изменение
+        цены увеличивает ее на относительную величину изменения.
+        """
+        last_price = self._last_price
+        for item in listings:
+            previous = last_price.get(item.item_id)
+            last_price[item.item_id] = item.price_cents
+            if previous is None or previous <= 0:
+                continue
+            change = abs(item.price_cents - previous) / previous
+            stats = self._title_stats(item.title)
+            stats.volatility += STATS_SMOOTHING * (change - stats.volatility)
+
+    def heat(self, item: MarketItem) -> float:
+        """Возвращает нагрев предмета."""
+        stats = self._titles.get(item.title)
+        return stats.heat(self.min_liquidity) if stats is not None else 1.0
+
+    def priority(self, item: MarketItem, changed: bool, now: Optional[float] = None) -> float:
+        """
+        Возвращает приоритет опроса предмета.
+
+        Предметы, которые еще не оценивались, имеют бесконечный приоритет.
+        """
+        scored_at = self._scored_at.get(item.item_id)
+        if scored_at is None:
+            return math.inf
+        age = ((now if now is not None else time.time()) - scored_at) / self.age_scale
+        return self.heat(item) * (age + 1.0 if changed else age)
+
+    def plan(
+        self,
+        changed: Sequence[MarketItem],
+        unchanged: Sequence[MarketItem],
+        needs_request: Callable[[MarketItem], bool],
+        budget: Optional[int] = None,
+    ) -> PollPlan:
+        """
+        Составляет план прохода.
+
+        Изменившиеся предметы, не требующие запроса (история в кэше),
+        оцениваются всегда. Бюджет тратится по убыванию приоритета на
+        изменившиеся предметы, требующие запроса, и на досрочное обновление
+        предметов без изменений, оцененных не позже min_repoll_interval назад.
+
+        Args:
+            changed: Новые и изменившиеся предметы (ScanPass.filter_changed)
+            unchanged: Предметы без изменений
+            needs_request: Требуется ли запрос истории для оценки изменившегося предмета
+            budget: Бюджет запросов (по умолчанию self.budget; 0 - без ограничения)
+
+        Returns:
+            План прохода
+        """
+        poll_round = self.begin(needs_request, budget)
+        rescore, deferred = poll_round.add(changed, unchanged)
+        plan = poll_round.finish()
+        plan.rescore = rescore + plan.rescore
+        plan.deferred = deferred
+        return plan
+
+    def begin(
+        self, needs_request: Callable[[MarketItem], bool], budget: Optional[int] = None
+    ) -> PollRound:
+        """
+        Начинает постраничное составление плана прохода.
+
+        Args:
+            needs_request: Требуется ли запрос истории для оценки изменившегося предмета
+            budget: Бюджет запросов (по умолчанию self.budget; 0 - без ограничения)
+
+        Returns:
+            План, в который страницы добавляются по мере загрузки
+        """
+        return PollRound(self, needs_request, self.budget if budget is None else budget)
+
+    def record_scored(
+        self,
+        items: Sequence[MarketItem],
+        sale_counts: Sequence[int],
+        opportunities: Iterable[Opportunity],
+    ) -> None:
+        """
+        Учитывает результаты оценки предметов.
+
+        Args:
+            items: Оцененные предметы
+            sale_counts: Количество продаж в истории каждого предмета
+            opportunities: Прибыльные возможности среди оцененных предметов
+        """
+        now = time.time()
+        profits = {opportunity.item_id: opportunity.profit_percent for opportunity in opportunities}
+        for item, sales in zip(items, sale_counts):
+            stats = self._title_stats(item.title)
+            stats.sales = int(sales)
+            stats.profit += STATS_SMOOTHING * (profits.get(item.item_id, 0.0) - stats.profit)
+            self._scored_at[item.item_id] = now
+
+    def forget(self, item_ids: Iterable[str]) -> None:
+        """Удаляет состояние исчезнувших предложений."""
+        for item_id in item_ids:
+            self._last_price.pop(item_id, None)
+            self._scored_at.pop(item_id, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает количество отслеживаемых предметов и счетчики планов."""
+        return {
+            "titles": len(self._titles),
+            "items": len(self._scored_at),
+            "planned_requests": self.planned_requests,
+            "refreshed_items": self.refreshed_items,
+            "deferred_items": self.deferred_items,
+        }
@@ -0,0 +1,227 @@
+"""
+Компактные записи предметов рынка и арбитражных возможностей.
+
+JSON-объекты DMarket преобразуются в записи один раз при получении
+страницы. Записи используют __slots__ и хранят цены в целых центах, поэтому
+снимок рынка в памяти занимает в несколько раз меньше места, чем исходные
+словари с вложенными объектами цен, а доступ к полям в горячем цикле
+быстрее поиска по ключу.
+
+Пример использования:
+    listings = build_market_items(response["objects"])
+    for listing in listings:
+        print(listing.title, listing.price_cents)
+"""
+
+import logging
+import sys
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.utils.price import Cents, cents_to_usd, parse_price_cents
+
+if TYPE_CHECKING:
+    from src.arbitrage.order_book import OrderBooks
+
+logger = logging.getLogger("records")
+
+# Поля объекта предмета DMarket API, которые используются записями;
+# остальные поля страницы можно не декодировать
+MARKET_ITEM_FIELDS = ("itemId", "title", "price", "buyOrders")
+
+# Поля ранжирования возможностей и соответствующие атрибуты Opportunity
+RANK_ATTRS = {
+    "profit_percent": "profit_percent",
+    "potential_profit": "profit_cents",
+    "avg_sale_price": "avg_sale_price_cents",
+}
+
+
+class MarketItem:
+    """
+    Предмет, выставленный на продажу.
+
+    Attributes:
+        item_id: Идентификатор предложения DMarket (itemId)
+        title: Название предмета
+        price_cents: Цена продажи в центах
+        best_bid_cents: Лучшая цена ордера на покупку в центах (0, если ордеров нет)
+    """
+
+    __slots__ = ("item_id", "title", "price_cents", "best_bid_cents")
+
+    def __init__(self, item_id: str, title: str, price_cents: Cents, best_bid_cents: Cents = 0):
+        self.item_id = item_id
+        self.title = title
+        self.price_cents = price_cents
+        self.best_bid_cents = best_bid_cents
+
+    @classmethod
+    def from_api(
+        cls, obj: Dict[str, Any], bids: Optional[Sequence[Tuple[Cents, int]]] = None
+    ) -> "MarketItem":
+        """
+        Создает запись из объекта предмета DMarket API.
+
+        Названия интернируются: у множества предложений одного предмета
+        в памяти хранится одна строка.
+
+        Args:
+            obj: Объект предмета
+            bids: Уже разобранные ордера на покупку (parse_buy_orders), чтобы не разбирать
+                их повторно
+
+        Raises:
+            ValueError: Если цена предмета или ордера некорректна
+        """
+        if bids is None:
+            bids = parse_buy_orders(obj)
+        return cls(
+            item_id=obj.get("itemId", ""),
+            title=sys.intern(obj.get("title", "Неизвестный предмет")),
+            price_cents=parse_price_cents(obj.get("price")),
+            best_bid_cents=max((price for price, _ in bids), default=0),
+        )
+
+    @property
+    def fingerprint(self) -> int:
+        """Отпечаток данных, влияющих на оценку: цена и лучший ордер на покупку."""
+        return (self.price_cents << 32) | self.best_bid_cents
+
+    def __repr__(self) -> str:
+        return (
+            f"MarketItem({self.item_id!r}, {self.title!r}, "
+            f"price_cents={self.price_cents}, best_bid_cents={self.best_bid_cents})"
+        )
+
+
+def parse_buy_orders(obj: Dict[str, Any]) -> List[Tuple[Cents, int]]:
+    """
+    Разбирает ордера на покупку объекта предмета DMarket API.
+
+    Returns:
+        Пары (цена в центах, количество); без поля amount количество равно 1
+
+    Raises:
+        ValueError: Если цена или количество ордера некорректны
+    """
+    return [
+        (parse_price_cents(order.get("price")), int(order.get("amount") or 1))
+        for order in obj.get("buyOrders") or ()
+    ]
+
+
+def build_market_items(
+    objects: Iterable[Dict[str, Any]], order_books: Optional["OrderBooks"] = None
+) -> List[MarketItem]:
+    """
+    Преобразует страницу предметов DMarket API в записи.
+
+    Предметы без положительной цены пропускаются, предметы с некорректными
+    данными пропускаются с записью ошибки в лог.
+
+    Args:
+        objects: Предметы в формате DMarket API
+        order_books: Книги заявок, в которые добавляются предложения и ордера на покупку страницы
+
+    Returns:
+        Записи предметов в исходном порядке
+    """
+    listings = []
+    for obj in objects:
+        try:
+            bids = parse_buy_orders(obj)
+            listing = MarketItem.from_api(obj, bids)
+        except Exception as e:
+            logger.error(
+                f"Ошибка при анализе предмета {obj.get('title', 'Неизвестный предмет')}: {e}"
+            )
+            continue
+        if listing.price_cents > 0:
+            listings.append(listing)
+            if order_books is not None:
+                order_books.apply_listing(listing, bids)
+    return listings
+
+
+class Opportunity:
+    """
+    Найденная арбитражная возможность.
+
+    Цены хранятся в центах; свойства с прежними именами полей
+    (buy_price, avg_sale_price, potential_profit) возвращают доллары.
+    """
+
+    __slots__ = (
+        "item_id",
+        "name",
+        "game",
+        "current_price_cents",
+        "buy_price_cents",
+        "avg_sale_price_cents",
+        "profit_cents",
+        "profit_percent",
+        "sales_history_count",
+    )
+
+    def __init__(
+        self,
+        item_id: str,
+        name: str,
+        game: str,
+        current_price_cents: Cents,
+        buy_price_cents: Cents,
+        avg_sale_price_cents: Cents,
+        profit_cents: Cents,
+        profit_percent: float,
+        sales_history_count: int,
+    ):
+        self.item_id = item_id
+        self.name = name
+        self.game = game
+        self.current_price_cents = current_price_cents
+        self.buy_price_cents = buy_price_cents
+        self.avg_sale_price_cents = avg_sale_price_cents
+        self.profit_cents = profit_cents
+        self.profit_percent = profit_percent
+        self.sales_history_count = sales_history_count
+
+    @property
+    def current_price(self) -> float:
+        return cents_to_usd(self.current_price_cents)
+
+    @property
+    def buy_price(self) -> float:
+        return cents_to_usd(self.buy_price_cents)
+
+    @property
+    def avg_sale_price(self) -> float:
+        return cents_to_usd(self.avg_sale_price_cents)
+
+    @property
+    def potential_profit(self) -> float:
+        return cents_to_usd(self.profit_cents)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает возможность в формате файла результатов."""
+        return {
+            "name": self.name,
+            "id": self.item_id,
+            "current_price": self.current_price,
+            "buy_price": self.buy_price,
+            "avg_sale_price": self.avg_sale_price,
+            "potential_profit": self.potential_profit,
+            "profit_percent": self.profit_percent,
+            "sales_history_count": self.sales_history_count,
+            "game": self.game,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"Opportunity({self.item_id!r}, {self.name!r}, "
+            f"profit_cents={self.profit_cents}, profit_percent={self.profit_percent:.2f})"
+        )
+
+
+def opportunity_to_dict(opportunity: Any) -> Dict[str, Any]:
+    """Приводит возможность к словарю; словари от внешних поисковиков возвращаются как есть."""
+    return opportunity.to_dict() if isinstance(opportunity, Opportunity) else opportunity
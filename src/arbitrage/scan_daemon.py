@@ -0,0 +1,225 @@
+"""
+Периодическое сканирование рынка в долгоживущем процессе.
+
+ScanDaemon вызывает функцию сканирования по расписанию без накопления
+сдвига: моменты запуска отсчитываются от времени старта (start + n *
+interval), а не от окончания предыдущего цикла. Если цикл не уложился в
+интервал, пропущенные запуски не выполняются подряд: следующий цикл
+начинается в ближайший момент расписания. Время каждого цикла пишется в
+лог и, если задан SCAN_METRICS_PATH, добавляется строкой JSON в файл.
+
+Между циклами процесс сохраняет HTTP-сессию, кэши и снимки рынка, поэтому
+повторное сканирование обходится дешевле запуска скрипта заново.
+
+Пример использования:
+    daemon = ScanDaemon(lambda: analyzer.analyze_all_games(), interval=300)
+    await daemon.run()
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger("scan_daemon")
+
+# Интервал между циклами сканирования (секунды)
+CHECK_INTERVAL = float(os.getenv("CHECK_INTERVAL", "300"))
+
+# Файл JSON Lines для метрик циклов (пусто - только лог)
+SCAN_METRICS_PATH = os.getenv("SCAN_METRICS_PATH", "")
+
+
+def positive_interval(value: str) -> float:
+    """
+    Разбирает интервал сканирования из аргумента командной строки (type= для argparse).
+
+    Raises:
+        argparse.ArgumentTypeError: Если значение не число или не больше нуля
+    """
+    try:
+        interval = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"интервал должен быть числом: {value!r}")
+    if not interval > 0:
+        raise argparse.ArgumentTypeError(f"интервал должен быть больше нуля: {value!r}")
+    return interval
+
+
+class CycleStats:
+    """
+    Метрики одного цикла сканирования.
+
+    Attributes:
+        cycle: Номер цикла в расписании (с учетом пропущенных)
+        scheduled_at: Запланированный момент запуска (время Unix)
+        lag: Задержка фактического запуска относительно расписания (секунды)
+        duration: Длительность цикла (секунды)
+        skipped: Сколько запусков пропущено из-за того, что цикл не уложился в интервал
+        opportunities: Количество найденных возможностей (если функция вернула результаты по играм)
+        error: Текст ошибки, если цикл завершился исключением
+    """
+
+    __slots__ = ("cycle", "scheduled_at", "lag", "duration", "skipped", "opportunities", "error")
+
+    def __init__(self, cycle: int, scheduled_at: float, lag: float):
+        self.cycle = cycle
+        self.scheduled_at = scheduled_at
+        self.lag = lag
+        self.duration = 0.0
+        self.skipped = 0
+        self.opportunities: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cycle": self.cycle,
+            "scheduled_at": datetime.datetime.fromtimestamp(self.scheduled_at).isoformat(),
+            "lag": self.lag,
+            "duration": self.duration,
+            "skipped": self.skipped,
+            "opportunities": self.opportunities,
+            "error": self.error,
+        }
+
+
+class ScanDaemon:
+    """Запускает сканирование по расписанию до вызова stop()."""
+
+    def __init__(
+        self,
+        scan: Callable[[], Awaitable[Any]],
+        interval: float = CHECK_INTERVAL,
+        metrics_path: Optional[str] = SCAN_METRICS_PATH or None,
+        max_cycles: Optional[int] = None,
+        history_size: int = 100,
+    ):
+        """
+        Args:
+            scan: Асинхронная функция одного цикла сканирования
+            interval: Интервал между запусками в секундах
+            metrics_path: Файл JSON Lines для метрик циклов
+            max_cycles: Остановиться после указанного количества выполненных циклов
+            history_size: Количество последних циклов, хранимых в памяти
+
+        Raises:
+            ValueError: Если interval не больше нуля
+        """
+        if not interval > 0:
+            raise ValueError(f"Интервал сканирования должен быть больше нуля: {interval}")
+        self.scan = scan
+        self.interval = interval
+        self.metrics_path = metrics_path
+        self.max_cycles = max_cycles
+        self.history: Deque[CycleStats] = deque(maxlen=history_size)
+
+        self.cycles_run = 0
+        self.cycles_skipped = 0
+        self.cycles_failed = 0
+        self._stop_event: Optional[asyncio.Event] = None
+
+    def stop(self) -> None:
+        """Просит демон остановиться после текущего цикла."""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    async def _sleep_until(self, deadline: float) -> None:
+        """Ждет до момента deadline (time.monotonic) или до вызова stop()."""
+        delay = deadline - time.monotonic()
+        if delay <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self) -> None:
+        """Выполняет циклы сканирования по расписанию до остановки."""
+        self._stop_event = asyncio.Event()
+        start_monotonic = time.monotonic()
+        start_wall = time.time()
+        cycle = 0
+
+        logger.info(f"Демон сканирования запущен, интервал {self.interval:g} сек.")
+        while not self.stopping:
+            scheduled = start_monotonic + cycle * self.interval
+            await self._sleep_until(scheduled)
+            if self.stopping:
+                break
+
+            stats = CycleStats(
+                cycle, start_wall + cycle * self.interval, time.monotonic() - scheduled
+            )
+            started = time.monotonic()
+            try:
+                result = await self.scan()
+                if isinstance(result, dict):
+                    stats.opportunities = sum(
+                        len(value) for value in result.values() if isinstance(value, list)
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.error = str(e)
+                self.cycles_failed += 1
+                logger.error(f"Ошибка в цикле сканирования {cycle}: {e}")
+            finished = time.monotonic()
+            stats.duration = finished - started
+            self.cycles_run += 1
+
+            # Следующий запуск - ближайший момент расписания после окончания цикла
+            next_cycle = max(cycle + 1, math.ceil((finished - start_monotonic) / self.interval))
+            stats.skipped = next_cycle - cycle - 1
+            if stats.skipped:
+                self.cycles_skipped += stats.skipped
+                logger.warning(
+                    f"Цикл {cycle} длился {stats.duration:.1f} сек. "
+                    f"при интервале {self.interval:g} сек., "
+                    f"пропущено запусков: {stats.skipped}"
+                )
+            cycle = next_cycle
+
+            self._record(stats)
+            if self.max_cycles is not None and self.cycles_run >= self.max_cycles:
+                break
+
+        logger.info(
+            f"Демон сканирования остановлен: циклов {self.cycles_run}, "
+            f"пропущено {self.cycles_skipped}, с ошибками {self.cycles_failed}"
+        )
+
+    def _record(self, stats: CycleStats) -> None:
+        """Сохраняет метрики цикла в памяти, логе и файле метрик."""
+        self.history.append(stats)
+        logger.info(
+            f"Цикл {stats.cycle}: {stats.duration:.2f} сек., задержка запуска {stats.lag:.3f} сек."
+            + (f", возможностей {stats.opportunities}" if stats.opportunities is not None else "")
+        )
+        if not self.metrics_path:
+            return
+        try:
+            with open(self.metrics_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(stats.to_dict(), ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"Не удалось записать метрики цикла в {self.metrics_path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики циклов и среднюю длительность последних циклов."""
+        durations = [stats.duration for stats in self.history]
+        return {
+            "cycles_run": self.cycles_run,
+            "cycles_skipped": self.cycles_skipped,
+            "cycles_failed": self.cycles_failed,
+            "avg_duration": sum(durations) / len(durations) if durations else 0.0,
+            "max_duration": max(durations, default=0.0),
+        }
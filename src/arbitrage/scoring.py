@@ -0,0 +1,364 @@
+"""
+Векторизованная оценка прибыльности предметов.
+
+Записи предметов страницы вместе с историями продаж преобразуются в
+столбцы NumPy, после чего лучшая цена покупки, средняя цена продажи, прибыль
+и процент прибыли считаются одним проходом по массивам. Все цены - целые
+центы (int64); порог прибыли проверяется в целых числах, без ошибок
+округления float.
+
+Пример использования:
+    listings = build_market_items(response["objects"])
+    columns = build_listing_columns(listings)
+    histories = await fetch_histories(listings)
+    add_history_columns(columns, histories)
+    result = score_columns(columns, min_profit_percent=5.0)
+    for row in result.profitable_rows():
+        ...
+"""
+
+import logging
+from functools import partial
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.arbitrage.records import RANK_ATTRS, MarketItem
+from src.utils.parallel_processor import ParallelProcessor
+from src.utils.price import parse_price_cents
+
+logger = logging.getLogger("scoring")
+
+# Оценка цены покупки при отсутствии ордеров: доля от рыночной цены
+DEFAULT_BID_RATIO = 0.9
+
+# Поля возможностей, по которым можно ранжировать результат, и соответствующие массивы ScoreResult
+RANK_FIELDS = RANK_ATTRS
+
+
+def _round_div(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Целочисленное деление неотрицательных чисел с округлением половины вверх."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+class ListingColumns:
+    """
+    Столбцовое представление страницы предметов.
+
+    Строка i соответствует записи listings[i]; все цены в центах. Срез
+    столбцов (columns[start:stop]) - компактный набор массивов для
+    передачи в процесс-воркер.
+
+    Attributes:
+        price_cents: Текущая рыночная цена
+        best_bid_cents: Лучшая цена ордера на покупку (0, если ордеров нет)
+        sale_sum_cents: Сумма цен продаж из истории
+        sale_count: Количество записей в истории продаж
+        row_offset: Номер первой строки среза в исходных столбцах
+    """
+
+    __slots__ = ("price_cents", "best_bid_cents", "sale_sum_cents", "sale_count", "row_offset")
+
+    def __init__(self, price_cents: np.ndarray, best_bid_cents: np.ndarray, row_offset: int = 0):
+        self.price_cents = price_cents
+        self.best_bid_cents = best_bid_cents
+        self.sale_sum_cents = np.zeros(len(price_cents), dtype=np.int64)
+        self.sale_count = np.zeros(len(price_cents), dtype=np.int64)
+        self.row_offset = row_offset
+
+    def __len__(self) -> int:
+        return len(self.price_cents)
+
+    def __getitem__(self, rows: slice) -> "ListingColumns":
+        start, _, _ = rows.indices(len(self))
+        part = ListingColumns(
+            self.price_cents[rows], self.best_bid_cents[rows], self.row_offset + start
+        )
+        part.sale_sum_cents = self.sale_sum_cents[rows]
+        part.sale_count = self.sale_count[rows]
+        return part
+
+
+class ScoreResult:
+    """
+    Результат оценки: массивы той же длины, что и ListingColumns.
+
+    Attributes:
+        buy_price_cents: Цена покупки (лучший ордер или оценка от рыночной цены)
+        avg_sale_price_cents: Средняя цена продажи (рыночная цена без истории)
+        profit_cents: Потенциальная прибыль
+        profit_percent: Прибыль в процентах от цены покупки
+        mask: Признак прохождения порога min_profit_percent
+    """
+
+    __slots__ = (
+        "buy_price_cents",
+        "avg_sale_price_cents",
+        "profit_cents",
+        "profit_percent",
+        "mask",
+    )
+
+    def __init__(
+        self,
+        buy_price_cents: np.ndarray,
+        avg_sale_price_cents: np.ndarray,
+        profit_cents: np.ndarray,
+        profit_percent: np.ndarray,
+        mask: np.ndarray,
+    ):
+        self.buy_price_cents = buy_price_cents
+        self.avg_sale_price_cents = avg_sale_price_cents
+        self.profit_cents = profit_cents
+        self.profit_percent = profit_percent
+        self.mask = mask
+
+    def take(self, rows: np.ndarray) -> "ScoreResult":
+        """Возвращает результат только для строк rows (в их порядке)."""
+        return ScoreResult(
+            self.buy_price_cents[rows],
+            self.avg_sale_price_cents[rows],
+            self.profit_cents[rows],
+            self.profit_percent[rows],
+            self.mask[rows],
+        )
+
+    @staticmethod
+    def concatenate(parts: Sequence["ScoreResult"]) -> "ScoreResult":
+        """Склеивает результаты нескольких срезов."""
+        return ScoreResult(
+            *(
+                np.concatenate([getattr(part, field) for part in parts])
+                for field in ScoreResult.__slots__
+            )
+        )
+
+    def profitable_rows(self, rank_by: str = "profit_percent") -> np.ndarray:
+        """
+        Возвращает номера прибыльных строк по убыванию поля rank_by.
+
+        Args:
+            rank_by: Поле ранжирования (ключ RANK_FIELDS)
+        """
+        return self.top_rows(None, rank_by)
+
+    def top_rows(self, k: Optional[int], rank_by: str = "profit_percent") -> np.ndarray:
+        """
+        Возвращает номера не более k лучших прибыльных строк по убыванию rank_by.
+
+        Порог отбора находится через np.partition за O(n), сортируются
+        только k отобранных строк.
+
+        Args:
+            k: Количество строк (None - все прибыльные строки)
+            rank_by: Поле ранжирования (ключ RANK_FIELDS)
+        """
+        values = getattr(self, RANK_FIELDS[rank_by])
+        rows = np.flatnonzero(self.mask)
+
+        if k is not None and k < len(rows):
+            if k <= 0:
+                return rows[:0]
+            # Порог k-го значения; строки с равным порогом добираются по порядку
+            kth = np.partition(-values[rows], k - 1)[k - 1]
+            rows = rows[-values[rows] <= kth]
+
+        # Устойчивая сортировка сохраняет исходный порядок при равных значениях
+        order = np.argsort(-values[rows], kind="stable")
+        return rows[order][:k] if k is not None else rows[order]
+
+
+def build_listing_columns(listings: Sequence[MarketItem]) -> ListingColumns:
+    """
+    Собирает столбцы цен и лучших ордеров на покупку из записей предметов.
+
+    Каждое предложение оценивается по лучшему ордеру из собственного объекта
+    API: он входит в отпечаток записи, поэтому оценка предложения с прежним
+    отпечатком не зависит от других предложений страницы и порядка их обхода.
+
+    Args:
+        listings: Записи предметов (build_market_items)
+
+    Returns:
+        Столбцы предметов
+    """
+    count = len(listings)
+    return ListingColumns(
+        price_cents=np.fromiter(
+            (listing.price_cents for listing in listings), dtype=np.int64, count=count
+        ),
+        best_bid_cents=np.fromiter(
+            (listing.best_bid_cents for listing in listings), dtype=np.int64, count=count
+        ),
+    )
+
+
+def add_history_columns(columns: ListingColumns, histories: Sequence[List[Dict[str, Any]]]) -> None:
+    """
+    Добавляет к столбцам суммы и количества цен из историй продаж.
+
+    Args:
+        columns: Столбцы предметов
+        histories: Истории продаж, по одной на строку columns
+    """
+    sums = np.zeros(len(columns), dtype=np.int64)
+    counts = np.zeros(len(columns), dtype=np.int64)
+
+    for row, history in enumerate(histories):
+        if not history:
+            continue
+        try:
+            prices = [parse_price_cents(sale.get("price")) for sale in history]
+        except Exception as e:
+            logger.debug(f"Некорректная история продаж в строке {row}: {e}")
+            continue
+        sums[row] = sum(prices)
+        counts[row] = len(prices)
+
+    columns.sale_sum_cents = sums
+    columns.sale_count = counts
+
+
+def score_columns(
+    columns: ListingColumns, min_profit_percent: float, bid_ratio: float = DEFAULT_BID_RATIO
+) -> ScoreResult:
+    """
+    Рассчитывает прибыльность всех строк одним векторным проходом.
+
+    Без ордеров на покупку цена покупки оценивается как bid_ratio от
+    рыночной, без истории продаж средней ценой продажи считается рыночная
+    цена. Оценка цены покупки и средняя цена округляются до цента, порог
+    min_profit_percent сравнивается в сотых долях процента.
+
+    Args:
+        columns: Столбцы предметов с историями продаж
+        min_profit_percent: Минимальный процент прибыли
+        bid_ratio: Доля рыночной цены для оценки цены покупки
+
+    Returns:
+        Массивы цен, прибыли и маска прибыльных строк
+    """
+    price = columns.price_cents
+    ratio_bp = round(bid_ratio * 10000)
+    buy_price = np.where(
+        columns.best_bid_cents > 0, columns.best_bid_cents, (price * ratio_bp + 5000) // 10000
+    )
+
+    count = columns.sale_count
+    avg_sale_price = np.where(
+        count > 0, _round_div(columns.sale_sum_cents, np.maximum(count, 1)), price
+    )
+
+    profit = avg_sale_price - buy_price
+    positive_buy = buy_price > 0
+    safe_buy = np.where(positive_buy, buy_price, 1)
+    profit_percent = np.where(positive_buy, profit * 100 / safe_buy, 0.0)
+
+    # Сравнение profit / buy >= min% в целых: profit * 10000 >= min_bp * buy
+    min_bp = round(min_profit_percent * 100)
+    mask = np.where(positive_buy, profit * 10000 >= min_bp * safe_buy, min_bp <= 0)
+
+    return ScoreResult(buy_price, avg_sale_price, profit, profit_percent, mask)
+
+
+def score_top_rows(
+    columns: ListingColumns,
+    min_profit_percent: float,
+    k: Optional[int],
+    rank_by: str = "profit_percent",
+    bid_ratio: float = DEFAULT_BID_RATIO,
+) -> Tuple[np.ndarray, ScoreResult]:
+    """
+    Оценивает столбцы (или их срез) и отбирает не более k лучших прибыльных строк.
+
+    Функция объявлена на уровне модуля, чтобы ее можно было выполнять в
+    процессе-воркере.
+
+    Returns:
+        Номера строк в исходных столбцах (с учетом row_offset) по убыванию
+        rank_by и результат оценки этих строк в том же порядке
+    """
+    scores = score_columns(columns, min_profit_percent, bid_ratio)
+    rows = scores.top_rows(k, rank_by)
+    return rows + columns.row_offset, scores.take(rows)
+
+
+def select_top_rows(
+    columns: ListingColumns,
+    min_profit_percent: float,
+    k: Optional[int],
+    rank_by: str = "profit_percent",
+    bid_ratio: float = DEFAULT_BID_RATIO,
+    processor: Optional[ParallelProcessor] = None,
+) -> Tuple[np.ndarray, ScoreResult]:
+    """
+    Отбирает не более k лучших прибыльных строк, при необходимости параллельно.
+
+    С processor столбцы делятся на срезы, каждый срез оценивается в пуле
+    (score_top_rows отбирает k лучших строк среза), затем лучшие строки
+    срезов сливаются в общий top-k. Пул используется, только если по
+    измеренной стоимости строки это окупается; иначе оценка выполняется
+    в текущем потоке. Порядок результата совпадает с последовательной
+    оценкой.
+
+    Args:
+        columns: Столбцы предметов с историями продаж
+        min_profit_percent: Минимальный процент прибыли
+        k: Количество строк (None - все прибыльные строки)
+        rank_by: Поле ранжирования (ключ RANK_FIELDS)
+        bid_ratio: Доля рыночной цены для оценки цены покупки
+        processor: Пул для параллельной оценки
+
+    Returns:
+        Номера строк по убыванию rank_by и результат оценки этих строк
+    """
+    score_shard = partial(
+        score_top_rows,
+        min_profit_percent=min_profit_percent,
+        k=k,
+        rank_by=rank_by,
+        bid_ratio=bid_ratio,
+    )
+    if processor is None:
+        return score_shard(columns)
+
+    parts = processor.batch_process(score_shard, columns, key="score_top_rows")
+    return _merge_top_rows(parts, k, rank_by)
+
+
+async def select_top_rows_async(
+    columns: ListingColumns,
+    min_profit_percent: float,
+    k: Optional[int],
+    rank_by: str = "profit_percent",
+    bid_ratio: float = DEFAULT_BID_RATIO,
+    processor: Optional[ParallelProcessor] = None,
+) -> Tuple[np.ndarray, ScoreResult]:
+    """Асинхронная версия select_top_rows: цикл событий не ждет воркеров."""
+    score_shard = partial(
+        score_top_rows,
+        min_profit_percent=min_profit_percent,
+        k=k,
+        rank_by=rank_by,
+        bid_ratio=bid_ratio,
+    )
+    if processor is None:
+        return score_shard(columns)
+
+    parts = await processor.batch_process_async(score_shard, columns, key="score_top_rows")
+    return _merge_top_rows(parts, k, rank_by)
+
+
+def _merge_top_rows(
+    parts: List[Tuple[np.ndarray, ScoreResult]], k: Optional[int], rank_by: str
+) -> Tuple[np.ndarray, ScoreResult]:
+    """Сливает лучшие строки срезов в общий top-k."""
+    if len(parts) == 1:
+        return parts[0]
+
+    # Срезы идут по порядку строк, поэтому устойчивая сортировка слияния
+    # сохраняет порядок равных значений
+    rows = np.concatenate([part_rows for part_rows, _ in parts])
+    scores = ScoreResult.concatenate([part_scores for _, part_scores in parts])
+    order = scores.top_rows(k, rank_by)
+    return rows[order], scores.take(order)
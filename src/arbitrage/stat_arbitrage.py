@@ -0,0 +1,389 @@
+"""
+Скользящая статистика цен для статистического арбитража.
+
+RollingPriceStats хранит для каждого предмета окно последних цен и
+обновляет среднее, дисперсию, EWMA и z-оценку за O(1) на каждое новое
+наблюдение цены, без пересчета по всему окну. Состояние всех предметов
+хранится в компактных массивах NumPy (строка массива на предмет), окно -
+кольцевой буфер. Суммы окна ведутся в целых центах, поэтому вычитание
+вытесняемых цен не накапливает ошибку округления.
+
+Предметы, цена которых отклонилась от скользящего среднего больше чем на
+z_threshold стандартных отклонений, помечаются как возможности возврата к
+среднему. Множество помеченных предметов обновляется на каждом
+наблюдении, поэтому актуально для всего отслеживаемого набора в любой
+момент.
+
+Пример использования:
+    stats = RollingPriceStats(window=20)
+    z_score = stats.update("AK-47 | Redline (Field-Tested)", 1250)
+    for signal in stats.signals():
+        print(signal.key, signal.side, signal.z_score)
+"""
+
+import logging
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+from src.utils.price import Cents, cents_to_usd
+
+logger = logging.getLogger("stat_arbitrage")
+
+# Размер окна скользящей статистики (количество наблюдений цены)
+STAT_WINDOW = int(os.getenv("STAT_WINDOW", "20"))
+
+# Коэффициент сглаживания EWMA
+STAT_EWMA_ALPHA = float(os.getenv("STAT_EWMA_ALPHA", "0.1"))
+
+# Порог |z| для возможности возврата к среднему
+STAT_Z_THRESHOLD = float(os.getenv("STAT_Z_THRESHOLD", "2.0"))
+
+# Минимальное количество наблюдений для расчета z-оценки
+STAT_MIN_SAMPLES = int(os.getenv("STAT_MIN_SAMPLES", "10"))
+
+# Начальное количество строк массивов состояния
+INITIAL_CAPACITY = 1024
+
+
+class MeanReversionSignal:
+    """
+    Возможность возврата цены к среднему.
+
+    Attributes:
+        key: Предмет
+        price_cents: Последняя цена
+        mean_cents: Скользящее среднее окна
+        std_cents: Скользящее стандартное отклонение окна
+        ewma_cents: Экспоненциальное скользящее среднее
+        z_score: Отклонение последней цены от среднего в стандартных отклонениях
+        side: "buy" - цена ниже среднего, "sell" - выше
+    """
+
+    __slots__ = ("key", "price_cents", "mean_cents", "std_cents", "ewma_cents", "z_score", "side")
+
+    def __init__(
+        self,
+        key: str,
+        price_cents: Cents,
+        mean_cents: float,
+        std_cents: float,
+        ewma_cents: float,
+        z_score: float,
+    ):
+        self.key = key
+        self.price_cents = price_cents
+        self.mean_cents = mean_cents
+        self.std_cents = std_cents
+        self.ewma_cents = ewma_cents
+        self.z_score = z_score
+        self.side = "buy" if z_score < 0 else "sell"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает сигнал в формате файла результатов."""
+        return {
+            "item": self.key,
+            "side": self.side,
+            "price": cents_to_usd(self.price_cents),
+            "mean": round(self.mean_cents / 100, 4),
+            "std": round(self.std_cents / 100, 4),
+            "ewma": round(self.ewma_cents / 100, 4),
+            "z_score": self.z_score,
+        }
+
+    def __repr__(self) -> str:
+        return f"MeanReversionSignal({self.key!r}, side={self.side!r}, z_score={self.z_score:.2f})"
+
+
+class RollingPriceStats:
+    """
+    Скользящие среднее, дисперсия, EWMA и z-оценка цен для набора предметов.
+
+    Дисперсия - выборочная дисперсия окна. z-оценка - отклонение последней
+    цены от среднего окна (включая ее саму); при нулевой дисперсии или
+    меньше min_samples наблюдениях она не определена (nan).
+    """
+
+    def __init__(
+        self,
+        window: int = STAT_WINDOW,
+        alpha: float = STAT_EWMA_ALPHA,
+        z_threshold: float = STAT_Z_THRESHOLD,
+        min_samples: int = STAT_MIN_SAMPLES,
+        capacity: int = INITIAL_CAPACITY,
+    ):
+        """
+        Args:
+            window: Размер окна
+            alpha: Коэффициент сглаживания EWMA
+            z_threshold: Порог |z| для пометки возможности возврата к среднему
+            min_samples: Минимальное количество наблюдений для z-оценки (не больше window)
+            capacity: Начальное количество предметов, под которое выделяются массивы
+        """
+        if window < 2:
+            raise ValueError("Размер окна должен быть не меньше 2")
+        self.window = window
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_samples = max(2, min(min_samples, window))
+
+        self.keys: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._allocate(max(capacity, 1))
+
+        # Строки предметов, у которых |z| последней цены не меньше порога
+        self.flagged: Set[int] = set()
+        self.updates = 0
+
+    def _allocate(self, capacity: int) -> None:
+        self._prices = np.zeros((capacity, self.window), dtype=np.int64)
+        self._head = np.zeros(capacity, dtype=np.int32)
+        self._count = np.zeros(capacity, dtype=np.int32)
+        self._sum = np.zeros(capacity, dtype=np.int64)
+        self._sumsq = np.zeros(capacity, dtype=np.int64)
+        self._last = np.zeros(capacity, dtype=np.int64)
+        self._ewma = np.zeros(capacity, dtype=np.float64)
+
+    def _arrays(self) -> tuple:
+        return (
+            self._prices,
+            self._head,
+            self._count,
+            self._sum,
+            self._sumsq,
+            self._last,
+            self._ewma,
+        )
+
+    def _grow(self, needed: int) -> None:
+        """Увеличивает массивы состояния вдвое, пока в них не поместится needed строк."""
+        capacity = len(self._head)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        old = self._arrays()
+        self._allocate(capacity)
+        for target, source in zip(self._arrays(), old):
+            target[: len(source)] = source
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def slot(self, key: str) -> int:
+        """Возвращает строку массивов для предмета, добавляя предмет при необходимости."""
+        row = self._index.get(key)
+        if row is None:
+            row = self._index[key] = len(self.keys)
+            self.keys.append(key)
+            self._grow(row + 1)
+        return row
+
+    def update(self, key: str, price_cents: Cents) -> float:
+        """
+        Добавляет наблюдение цены предмета за O(1).
+
+        Args:
+            key: Предмет
+            price_cents: Цена в центах
+
+        Returns:
+            z-оценка новой цены (nan, если она не определена)
+        """
+        row = self.slot(key)
+        price = int(price_cents)
+        count = int(self._count[row])
+        head = int(self._head[row])
+        total = int(self._sum[row])
+        total_sq = int(self._sumsq[row])
+
+        if count == self.window:
+            evicted = int(self._prices[row, head])
+            total -= evicted
+            total_sq -= evicted * evicted
+        else:
+            count += 1
+
+        self._prices[row, head] = price
+        self._head[row] = (head + 1) % self.window
+        self._count[row] = count
+        self._sum[row] = total = total + price
+        self._sumsq[row] = total_sq = total_sq + price * price
+        self._last[row] = price
+
+        if count == 1:
+            self._ewma[row] = price
+        else:
+            self._ewma[row] += self.alpha * (price - self._ewma[row])
+
+        self.updates += 1
+        z_score = self._z_score(price, count, total, total_sq)
+        if abs(z_score) >= self.z_threshold:
+            self.flagged.add(row)
+        else:
+            self.flagged.discard(row)
+        return z_score
+
+    def _z_score(self, price: int, count: int, total: int, total_sq: int) -> float:
+        if count < self.min_samples:
+            return math.nan
+        # count * sumsq - sum^2 в целых числах: дисперсия без ошибки округления
+        spread = count * total_sq - total * total
+        if spread <= 0:
+            return math.nan
+        std = math.sqrt(spread / (count * (count - 1)))
+        return (price - total / count) / std
+
+    def update_many(self, keys: Sequence[str], prices_cents: Sequence[Cents]) -> np.ndarray:
+        """
+        Добавляет наблюдения цен нескольких предметов векторно.
+
+        Наблюдения одного предмета применяются в порядке следования.
+
+        Args:
+            keys: Предметы
+            prices_cents: Цены в центах
+
+        Returns:
+            z-оценки новых цен в порядке наблюдений
+        """
+        rows = np.fromiter((self.slot(key) for key in keys), dtype=np.int64, count=len(keys))
+        prices = np.asarray(prices_cents, dtype=np.int64)
+        z_scores = np.full(len(rows), np.nan)
+
+        remaining = np.arange(len(rows))
+        while len(remaining):
+            # За раунд применяется первое из оставшихся наблюдений каждого предмета
+            _, first = np.unique(rows[remaining], return_index=True)
+            batch = remaining[first]
+            z_scores[batch] = self._apply(rows[batch], prices[batch])
+            keep = np.ones(len(remaining), dtype=bool)
+            keep[first] = False
+            remaining = remaining[keep]
+
+        self.updates += len(rows)
+        return z_scores
+
+    def _apply(self, rows: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """Применяет по одному наблюдению к различным строкам rows."""
+        heads = self._head[rows].astype(np.int64)
+        full = self._count[rows] == self.window
+        evicted = np.where(full, self._prices[rows, heads], 0)
+
+        counts = self._count[rows] + (~full).astype(np.int32)
+        self._prices[rows, heads] = prices
+        self._head[rows] = (heads + 1) % self.window
+        self._count[rows] = counts
+        self._sum[rows] += prices - evicted
+        self._sumsq[rows] += prices * prices - evicted * evicted
+        self._last[rows] = prices
+
+        ewma = self._ewma[rows]
+        self._ewma[rows] = np.where(counts == 1, prices, ewma + self.alpha * (prices - ewma))
+
+        z_scores = self._z_scores(rows)
+        for row, flagged in zip(rows.tolist(), (np.abs(z_scores) >= self.z_threshold).tolist()):
+            if flagged:
+                self.flagged.add(row)
+            else:
+                self.flagged.discard(row)
+        return z_scores
+
+    def _z_scores(self, rows: np.ndarray) -> np.ndarray:
+        """Возвращает z-оценки последних цен строк rows."""
+        counts = self._count[rows].astype(np.int64)
+        totals = self._sum[rows]
+        spread = counts * self._sumsq[rows] - totals * totals
+        valid = (counts >= self.min_samples) & (spread > 0)
+        safe_counts = np.maximum(counts, 2)
+        std = np.sqrt(np.where(valid, spread, 1) / (safe_counts * (safe_counts - 1)))
+        z_scores = (self._last[rows] - totals / np.maximum(counts, 1)) / std
+        return np.where(valid, z_scores, np.nan)
+
+    def mean(self, key: str) -> float:
+        """Возвращает скользящее среднее цены предмета в центах (nan для неизвестного предмета)."""
+        row = self._index.get(key)
+        if row is None:
+            return math.nan
+        return int(self._sum[row]) / int(self._count[row])
+
+    def variance(self, key: str) -> float:
+        """Возвращает выборочную дисперсию цены предмета в центах^2 (nan при одном наблюдении)."""
+        row = self._index.get(key)
+        if row is None or self._count[row] < 2:
+            return math.nan
+        count = int(self._count[row])
+        total = int(self._sum[row])
+        return (count * int(self._sumsq[row]) - total * total) / (count * (count - 1))
+
+    def ewma(self, key: str) -> float:
+        """Возвращает EWMA цены предмета в центах (nan для неизвестного предмета)."""
+        row = self._index.get(key)
+        return float(self._ewma[row]) if row is not None else math.nan
+
+    def z_score(self, key: str) -> float:
+        """Возвращает z-оценку последней цены предмета (nan, если она не определена)."""
+        row = self._index.get(key)
+        if row is None:
+            return math.nan
+        return self._z_score(
+            int(self._last[row]), int(self._count[row]), int(self._sum[row]), int(self._sumsq[row])
+        )
+
+    def signals(self, keys: Optional[Iterable[str]] = None) -> List[MeanReversionSignal]:
+        """
+        Возвращает возможности возврата к среднему по убыванию |z|.
+
+        Args:
+            keys: Ограничить проверку предметами keys (по умолчанию - все помеченные)
+
+        Returns:
+            Сигналы для предметов с |z| не меньше z_threshold
+        """
+        if keys is None:
+            rows = np.fromiter(self.flagged, dtype=np.int64, count=len(self.flagged))
+        else:
+            rows = np.fromiter(
+                (self._index[key] for key in keys if key in self._index), dtype=np.int64
+            )
+        if not len(rows):
+            return []
+
+        z_scores = self._z_scores(rows)
+        selected = np.abs(z_scores) >= self.z_threshold
+        rows = rows[selected]
+        z_scores = z_scores[selected]
+        order = np.argsort(-np.abs(z_scores), kind="stable")
+
+        counts = self._count[rows].astype(np.float64)
+        means = self._sum[rows] / counts
+        stds = np.abs(self._last[rows] - means) / np.maximum(np.abs(z_scores), 1e-12)
+
+        signals = []
+        for position in order.tolist():
+            row = int(rows[position])
+            signals.append(
+                MeanReversionSignal(
+                    key=self.keys[row],
+                    price_cents=int(self._last[row]),
+                    mean_cents=float(means[position]),
+                    std_cents=float(stds[position]),
+                    ewma_cents=float(self._ewma[row]),
+                    z_score=float(z_scores[position]),
+                )
+            )
+        return signals
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает количество отслеживаемых и помеченных предметов."""
+        return {
+            "items": len(self.keys),
+            "flagged": len(self.flagged),
+            "updates": self.updates,
+            "memory_bytes": sum(array.nbytes for array in self._arrays()),
+        }
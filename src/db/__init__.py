@@ -0,0 +1,3 @@
+"""
+Слой доступа к данным: хранение цен предметов и состояний.
+"""
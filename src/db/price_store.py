@@ -0,0 +1,235 @@
+"""
+Хранение наблюдаемых цен предметов в таблице item_prices.
+
+Строка items - предмет игры (market_hash_name), а не отдельное
+предложение: за проход сканирования записывается одна цена на предмет и
+только если она изменилась с прошлой записи.
+
+Цены записываются в целых центах в столбец price_cents; столбец price
+(FLOAT) по-прежнему заполняется значением в долларах для совместимости со
+старыми читателями. Если база создана до появления price_cents, столбец
+добавляется при первом подключении.
+
+Пример использования:
+    store = PriceStore()
+    await store.record_prices_async({"AK-47 | Redline (Field-Tested)": 1250}, game="CS2")
+    history = store.get_price_history("AK-47 | Redline (Field-Tested)", game="CS2")
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from src.utils.price import Cents, cents_to_usd
+
+logger = logging.getLogger("price_store")
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER NOT NULL,
+    item_id VARCHAR(255) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    market_hash_name VARCHAR(255) NOT NULL,
+    game VARCHAR(50) NOT NULL,
+    category VARCHAR(100),
+    created_at DATETIME,
+    updated_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_items_item_id ON items (item_id);
+CREATE INDEX IF NOT EXISTS ix_items_market_hash_name ON items (market_hash_name);
+CREATE TABLE IF NOT EXISTS item_prices (
+    id INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    price FLOAT NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    source VARCHAR(50) NOT NULL,
+    timestamp DATETIME,
+    price_cents INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(item_id) REFERENCES items (id)
+);
+CREATE INDEX IF NOT EXISTS ix_item_prices_item_id ON item_prices (item_id);
+CREATE INDEX IF NOT EXISTS ix_item_prices_timestamp ON item_prices (timestamp);
+"""
+
+
+def sqlite_path_from_url(url: str) -> str:
+    """
+    Возвращает путь к файлу SQLite из URL вида sqlite:///database.db.
+
+    Raises:
+        ValueError: Если URL указывает не на SQLite
+    """
+    prefix = "sqlite:///"
+    if not url.startswith(prefix):
+        raise ValueError(f"PriceStore поддерживает только SQLite, получен URL: {url}")
+    return url[len(prefix) :]
+
+
+def item_key(game: str, title: str) -> str:
+    """Возвращает значение items.item_id предмета: игра и market_hash_name."""
+    return f"{game}:{title}"
+
+
+class PriceStore:
+    """
+    Запись и чтение цен предметов в SQLite.
+
+    Одно соединение используется из разных потоков (запись выполняется в
+    пуле потоков из асинхронного кода), поэтому обращения к нему
+    сериализуются блокировкой.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or sqlite_path_from_url(DATABASE_URL)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # (игра, название) -> id строки items
+        self._item_rows: Dict[Tuple[str, str], int] = {}
+        # (id строки items, источник) -> последняя записанная цена
+        self._last_prices: Dict[Tuple[int, str], Optional[Cents]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(item_prices)")}
+            if "price_cents" not in columns:
+                conn.execute("ALTER TABLE item_prices ADD COLUMN price_cents INTEGER")
+                logger.info("В таблицу item_prices добавлен столбец price_cents")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _item_row(self, conn: sqlite3.Connection, game: str, title: str, now: str) -> int:
+        """Возвращает id строки items предмета, добавляя ее при необходимости."""
+        key = (game, title)
+        row_id = self._item_rows.get(key)
+        if row_id is not None:
+            return row_id
+        row = conn.execute(
+            "SELECT id FROM items WHERE game = ? AND market_hash_name = ? ORDER BY id LIMIT 1",
+            (game, title),
+        ).fetchone()
+        if row is not None:
+            row_id = row[0]
+        else:
+            row_id = conn.execute(
+                "INSERT INTO items (item_id, name, market_hash_name, game, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (item_key(game, title), title, title, game, now, now),
+            ).lastrowid
+        self._item_rows[key] = row_id
+        return row_id
+
+    def _last_price(self, conn: sqlite3.Connection, row_id: int, source: str) -> Optional[Cents]:
+        """Возвращает последнюю записанную цену предмета из источника (None - цен нет)."""
+        key = (row_id, source)
+        if key not in self._last_prices:
+            row = conn.execute(
+                "SELECT COALESCE(price_cents, CAST(ROUND(price * 100) AS INTEGER)) "
+                "FROM item_prices WHERE item_id = ? AND source = ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT 1",
+                (row_id, source),
+            ).fetchone()
+            self._last_prices[key] = int(row[0]) if row is not None else None
+        return self._last_prices[key]
+
+    def record_prices(
+        self, prices: Mapping[str, Cents], game: str, source: str = "dmarket", currency: str = "USD"
+    ) -> int:
+        """
+        Записывает цены предметов за проход сканирования.
+
+        Предмет - название (market_hash_name) в игре, а не предложение:
+        для новых предметов добавляется строка items. Цена записывается,
+        только если она отличается от последней записанной цены предмета,
+        поэтому item_prices растет с изменениями цен, а не с количеством
+        проходов и предложений.
+
+        Args:
+            prices: Название предмета -> цена в центах (например, лучшая цена предложения)
+            game: Название игры
+            source: Источник цены
+            currency: Валюта
+
+        Returns:
+            Количество записанных цен
+        """
+        if not prices:
+            return 0
+
+        now = datetime.datetime.now().isoformat(sep=" ")
+        with self._lock:
+            conn = self._connect()
+            changed: Dict[Tuple[int, str], Cents] = {}
+            with conn:
+                for title, cents in prices.items():
+                    row_id = self._item_row(conn, game, title, now)
+                    if self._last_price(conn, row_id, source) != cents:
+                        changed[(row_id, source)] = cents
+                conn.executemany(
+                    "INSERT INTO item_prices "
+                    "(item_id, price, price_cents, currency, source, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (row_id, cents_to_usd(cents), cents, currency, source, now)
+                        for (row_id, _), cents in changed.items()
+                    ),
+                )
+            # Кэш обновляется после фиксации транзакции
+            self._last_prices.update(changed)
+        return len(changed)
+
+    async def record_prices_async(
+        self, prices: Mapping[str, Cents], game: str, source: str = "dmarket", currency: str = "USD"
+    ) -> int:
+        """Асинхронная версия record_prices: запись выполняется в пуле потоков."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.record_prices, prices, game, source, currency)
+
+    def get_price_history(self, title: str, game: str, limit: int = 100) -> List[Tuple[Cents, str]]:
+        """
+        Возвращает последние цены предмета, начиная с самой новой.
+
+        Для строк, записанных до появления price_cents, цена переводится
+        в центы из столбца price.
+
+        Args:
+            title: Название предмета (market_hash_name)
+            game: Название игры
+            limit: Максимальное количество записей
+
+        Returns:
+            Список пар (цена в центах, время записи)
+        """
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT COALESCE(p.price_cents, CAST(ROUND(p.price * 100) AS INTEGER)), "
+                    "p.timestamp "
+                    "FROM item_prices p JOIN items i ON i.id = p.item_id "
+                    "WHERE i.game = ? AND i.market_hash_name = ? "
+                    "ORDER BY p.timestamp DESC, p.id DESC LIMIT ?",
+                    (game, title, limit),
+                )
+                .fetchall()
+            )
+        return [(int(cents), timestamp) for cents, timestamp in rows]
+
+    def close(self) -> None:
+        """Закрывает соединение с базой данных."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._item_rows.clear()
+            self._last_prices.clear()
@@ -0,0 +1,3 @@
+"""
+Вспомогательные утилиты: кэши, структуры данных и инструменты измерения.
+"""
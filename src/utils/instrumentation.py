@@ -0,0 +1,388 @@
+"""
+Инструментирование горячего пути сканирования.
+
+Собирает время этапов сканирования (загрузка рынка, загрузка историй,
+разбор, оценка, сохранение, уведомления), гистограммы задержек запросов
+по эндпоинтам, доли попаданий кэшей и скорость обработки предметов.
+Метрики выгружаются в JSON или в текстовом формате Prometheus.
+
+Отключенное инструментирование почти ничего не стоит: stage() возвращает
+общий пустой контекстный менеджер, а остальные методы завершаются после
+проверки одного флага.
+
+Пример использования:
+    metrics = get_instrumentation()
+    with metrics.stage("score", items=len(listings)):
+        score(listings)
+    metrics.observe_request("/exchange/v1/market/items", 0.12, status=200)
+    print(metrics.to_prometheus())
+"""
+
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from src.api.rate_limiter import default_endpoint_key
+
+logger = logging.getLogger("instrumentation")
+
+# Включить сбор метрик
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Файл для выгрузки метрик после сканирования (.prom - формат Prometheus, иначе JSON)
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH", "")
+
+# Этапы сканирования
+STAGE_MARKET_FETCH = "market_fetch"
+STAGE_HISTORY_FETCH = "history_fetch"
+STAGE_PARSE = "parse"
+STAGE_SCORE = "score"
+STAGE_PERSIST = "persist"
+STAGE_NOTIFY = "notify"
+
+# Границы корзин гистограмм задержек (секунды), как у клиентов Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Префикс имен метрик Prometheus
+METRIC_PREFIX = "dmarket_scan"
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        Оценивает квантиль по корзинам (верхняя граница корзины, содержащей квантиль).
+
+        У корзины +Inf верхней границы нет, поэтому для нее возвращается
+        наибольшее наблюдавшееся значение (например, запрос, завершившийся по
+        API_TIMEOUT, больше последней границы).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Возвращает накопленные количества по границам корзин (формат Prometheus)."""
+        result = []
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            result.append((f"{bound:g}", seen))
+        result.append(("+Inf", self.count))
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(self.cumulative()),
+        }
+
+
+class StageStats:
+    """Накопленное время и количество предметов одного этапа."""
+
+    __slots__ = ("calls", "seconds", "items", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.items = 0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float, items: int) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.items += items
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "max_seconds": self.max_seconds,
+            "items": self.items,
+            "items_per_second": self.items / self.seconds if self.seconds > 0 else 0.0,
+        }
+
+
+class _NullTimer:
+    """Пустой контекстный менеджер для отключенного инструментирования."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        return None
+
+    def add_items(self, items: int) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    """Замер одного выполнения этапа."""
+
+    __slots__ = ("stats", "items", "started")
+
+    def __init__(self, stats: StageStats, items: int):
+        self.stats = stats
+        self.items = items
+        self.started = 0.0
+
+    def __enter__(self) -> "_StageTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stats.add(time.perf_counter() - self.started, self.items)
+
+    def add_items(self, items: int) -> None:
+        """Добавляет обработанные предметы, если их количество известно только внутри этапа."""
+        self.items += items
+
+
+class Instrumentation:
+    """
+    Метрики сканирования.
+
+    Этапы измеряются по времени выполнения (для асинхронных этапов - с
+    учетом ожидания), поэтому при одновременном сканировании нескольких игр
+    сумма времени этапов может превышать общее время сканирования.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = INSTRUMENTATION_ENABLED,
+        endpoint_key: Callable[[str], str] = default_endpoint_key,
+    ):
+        """
+        Args:
+            enabled: Собирать метрики
+            endpoint_key: Функция группировки эндпоинтов для гистограмм
+        """
+        self.enabled = enabled
+        self.endpoint_key = endpoint_key
+        self.started_at = time.time()
+
+        self.stages: Dict[str, StageStats] = {}
+        self.latencies: Dict[str, Histogram] = {}
+        self.statuses: Dict[Tuple[str, int], int] = {}
+        self._caches: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def stage(self, name: str, items: int = 0) -> Union[_StageTimer, _NullTimer]:
+        """
+        Возвращает контекстный менеджер, измеряющий время этапа.
+
+        Args:
+            name: Этап (константы STAGE_*)
+            items: Количество обрабатываемых предметов
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return _StageTimer(stats, items)
+
+    def record_stage(self, name: str, seconds: float, items: int = 0) -> None:
+        """Добавляет уже измеренное время этапа."""
+        if not self.enabled:
+            return
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        stats.add(seconds, items)
+
+    def observe_request(self, endpoint: str, seconds: float, status: int = 200) -> None:
+        """
+        Учитывает задержку запроса к API.
+
+        Args:
+            endpoint: Путь запроса (группируется функцией endpoint_key)
+            seconds: Время от отправки запроса до получения ответа
+            status: HTTP-статус ответа (0 - ошибка соединения)
+        """
+        if not self.enabled:
+            return
+        key = self.endpoint_key(endpoint)
+        histogram = self.latencies.get(key)
+        if histogram is None:
+            histogram = self.latencies[key] = Histogram()
+        histogram.observe(seconds)
+        status_key = (key, status)
+        self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+
+    def register_cache(self, name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Регистрирует кэш, статистика которого читается при выгрузке.
+
+        Args:
+            name: Название кэша
+            stats: Функция, возвращающая словарь со счетчиками hits и misses и, при
+                наличии, stale (например, TTLCache.get_stats)
+        """
+        self._caches[name] = stats
+
+    def cache_ratios(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает попадания, промахи и долю попаданий зарегистрированных кэшей.
+
+        Обращения к устаревшим записям (stale) учитываются в доле попаданий как непопадания.
+        """
+        ratios = {}
+        for name, stats in self._caches.items():
+            values = stats()
+            hits = values.get("hits", 0)
+            misses = values.get("misses", 0)
+            lookups = hits + misses
+            ratios[name] = {"hits": hits, "misses": misses}
+            if "stale" in values:
+                ratios[name]["stale"] = values["stale"]
+                lookups += values["stale"]
+            ratios[name]["hit_ratio"] = hits / lookups if lookups else 0.0
+        return ratios
+
+    def reset(self) -> None:
+        """Обнуляет этапы и гистограммы (зарегистрированные кэши сохраняются)."""
+        self.started_at = time.time()
+        self.stages.clear()
+        self.latencies.clear()
+        self.statuses.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает метрики в виде словаря для JSON."""
+        statuses: Dict[str, Dict[str, int]] = {}
+        for (endpoint, status), count in self.statuses.items():
+            statuses.setdefault(endpoint, {})[str(status)] = count
+        return {
+            "enabled": self.enabled,
+            "window_seconds": time.time() - self.started_at,
+            "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+            "requests": {
+                endpoint: dict(histogram.to_dict(), statuses=statuses.get(endpoint, {}))
+                for endpoint, histogram in self.latencies.items()
+            },
+            "caches": self.cache_ratios(),
+        }
+
+    def to_json(self) -> str:
+        # NaN и Infinity - некорректный JSON; ошибка лучше файла, который не прочитать
+        return json.dumps(self.to_dict(), indent=2, ensure_ascii=False, allow_nan=False)
+
+    def to_prometheus(self) -> str:
+        """Возвращает метрики в текстовом формате Prometheus."""
+        lines = []
+
+        def family(name: str, kind: str, help_text: str) -> str:
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            return full_name
+
+        name = family("stage_seconds_total", "counter", "Time spent in scan stage")
+        for stage, stats in self.stages.items():
+            lines.append(f'{name}{{stage="{stage}"}} {stats.seconds:.6f}')
+        name = family("stage_calls_total", "counter", "Executions of scan stage")
+        for stage, stats in self.stages.items():
+            lines.append(f'{name}{{stage="{stage}"}} {stats.calls}')
+        name = family("stage_items_total", "counter", "Items processed by scan stage")
+        for stage, stats in self.stages.items():
+            lines.append(f'{name}{{stage="{stage}"}} {stats.items}')
+
+        name = family("request_latency_seconds", "histogram", "API request latency by endpoint")
+        for endpoint, histogram in self.latencies.items():
+            for bound, count in histogram.cumulative():
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.total:.6f}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+        name = family("requests_total", "counter", "API requests by endpoint and status")
+        for (endpoint, status), count in self.statuses.items():
+            lines.append(f'{name}{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+        caches = self.cache_ratios()
+        name = family("cache_hit_ratio", "gauge", "Cache hit ratio")
+        for cache, values in caches.items():
+            lines.append(f'{name}{{cache="{cache}"}} {values["hit_ratio"]:.6f}')
+        name = family("cache_lookups_total", "counter", "Cache lookups by result")
+        for cache, values in caches.items():
+            for result in ("hits", "stale", "misses"):
+                if result in values:
+                    lines.append(f'{name}{{cache="{cache}",result="{result}"}} {values[result]}')
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Union[str, Path]) -> None:
+        """Сохраняет метрики в файл: .prom - формат Prometheus, иначе JSON."""
+        path = Path(path)
+        content = self.to_prometheus() if path.suffix == ".prom" else self.to_json()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content, encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить метрики в {path}: {e}")
+
+    def summary(self) -> str:
+        """Возвращает краткую строку для лога: время этапов и задержки запросов."""
+        parts = [
+            f"{stage} {stats.seconds:.2f}с/{stats.items}"
+            for stage, stats in sorted(self.stages.items(), key=lambda entry: -entry[1].seconds)
+        ]
+        parts += [
+            f"{endpoint} p50 {histogram.quantile(0.5) * 1000:.0f}мс "
+            f"p99 {histogram.quantile(0.99) * 1000:.0f}мс"
+            for endpoint, histogram in self.latencies.items()
+        ]
+        return ", ".join(parts)
+
+
+_instrumentation: Optional[Instrumentation] = None
+
+
+def get_instrumentation() -> Instrumentation:
+    """Возвращает общий для процесса экземпляр метрик (включается INSTRUMENTATION_ENABLED)."""
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation()
+    return _instrumentation
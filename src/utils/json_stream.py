@@ -0,0 +1,243 @@
+"""
+Быстрое и потоковое декодирование JSON-ответов API.
+
+Небольшие ответы декодируются целиком функцией loads (ujson, если он
+установлен, иначе стандартный json). Страница рынка с тысячами предметов
+разбирается потоково: ArrayItemParser принимает тело ответа частями по мере
+получения и возвращает элементы массива "objects" сразу, как только элемент
+получен целиком. Каждый элемент декодируется C-сканером стандартного json
+(JSONDecoder.raw_decode), и от него сразу остаются только нужные поля,
+поэтому в памяти не собирается ни полное тело ответа, ни дерево словарей с
+неиспользуемыми полями (изображения, описания, атрибуты предметов).
+
+Пример использования:
+    parser = ArrayItemParser("objects", fields=("itemId", "title", "price"))
+    async for chunk in response.content.iter_chunked(65536):
+        for item in parser.feed(chunk):
+            handle(item)
+    parser.close()
+    page = parser.document  # {"cursor": ..., "total": ...} без массива
+"""
+
+import codecs
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import ujson
+
+    UJSON_AVAILABLE = True
+except ImportError:
+    UJSON_AVAILABLE = False
+
+loads: Callable[[str], Any] = ujson.loads if UJSON_AVAILABLE else json.loads
+
+_WHITESPACE = " \t\n\r"
+
+# Символы, которыми может продолжаться число ("1." и "1e+" - начала чисел 1.5 и 1e+5)
+_NUMBER_CHARS = "0123456789.eE+-"
+
+# Состояния разбора: до открывающей скобки документа, ключ, значение, разделитель членов,
+# элементы массива, конец
+_START, _KEY, _VALUE, _MEMBER_END, _ARRAY, _DONE = range(6)
+
+
+class ArrayItemParser:
+    """
+    Потоковый разбор JSON-объекта с массивом элементов.
+
+    Остальные члены объекта верхнего уровня (курсор, количество, ошибка)
+    могут идти до или после массива; после close() они доступны в document.
+    """
+
+    def __init__(self, array_key: str = "objects", fields: Optional[Iterable[str]] = None):
+        """
+        Args:
+            array_key: Ключ массива, элементы которого возвращаются по мере получения
+            fields: Поля, которые остаются у элементов (None - все поля)
+        """
+        self.array_key = array_key
+        self.fields = tuple(fields) if fields is not None else None
+        self.document: Dict[str, Any] = {}
+        self.items_parsed = 0
+
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = _START
+        self._key: Optional[str] = None
+        self._closed = False
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """
+        Принимает очередную часть тела ответа.
+
+        Returns:
+            Элементы массива, полученные целиком (с оставленными полями)
+
+        Raises:
+            ValueError: Если ответ не является JSON-объектом
+        """
+        self._buffer += self._text_decoder.decode(chunk)
+        return self._parse()
+
+    def close(self) -> List[Any]:
+        """
+        Завершает разбор после получения всего тела ответа.
+
+        Члены объекта верхнего уровня, кроме массива, после этого доступны в document.
+
+        Returns:
+            Последние элементы массива, если они завершились только с концом данных
+
+        Raises:
+            ValueError: Если ответ оборван или некорректен
+        """
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        self._closed = True
+        items = self._parse()
+        if self._state != _DONE or self._buffer.strip():
+            raise ValueError("Ответ API оборван или не является JSON-объектом")
+        return items
+
+    def _decode(self, position: int) -> Optional[Tuple[Any, int]]:
+        """
+        Декодирует значение, начинающееся с position.
+
+        Returns:
+            (значение, позиция после него) или None, если значение еще не получено целиком
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, position)
+        except json.JSONDecodeError:
+            if self._closed:
+                raise ValueError(f"Некорректный JSON в ответе API (позиция {position})") from None
+            return None
+        # Число в конце буфера может продолжиться в следующей части
+        if not self._closed and isinstance(value, (int, float)) and self._number_may_continue(end):
+            return None
+        return value, end
+
+    def _number_may_continue(self, end: int) -> bool:
+        """
+        Проверяет, может ли число, декодированное до end, продолжиться в следующей части.
+
+        raw_decode декодирует "1." и "1e+" как 1, поэтому после числа должен
+        быть получен символ, которым число продолжиться не может.
+        """
+        return end >= len(self._buffer) or self._buffer[end] in _NUMBER_CHARS
+
+    def _parse_array(self, position: int, items: List[Any]) -> int:
+        """
+        Разбирает элементы массива, начиная с position (горячий цикл разбора страницы).
+
+        Returns:
+            Позиция после закрывающей скобки массива или начало первого
+            элемента, который еще не получен целиком
+        """
+        buffer = self._buffer
+        size = len(buffer)
+        raw_decode = self._decoder.raw_decode
+        fields = self.fields
+        append = items.append
+        while position < size:
+            char = buffer[position]
+            if char == "," or char in _WHITESPACE:
+                position += 1
+                continue
+            if char == "]":
+                self._state = _MEMBER_END
+                return position + 1
+            try:
+                value, end = raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if self._closed:
+                    raise ValueError(
+                        f"Некорректный JSON в ответе API (позиция {position})"
+                    ) from None
+                return position
+            if (
+                not self._closed
+                and isinstance(value, (int, float))
+                and self._number_may_continue(end)
+            ):
+                # Число в конце буфера может продолжиться в следующей части
+                return position
+            if fields is not None and isinstance(value, dict):
+                value = {field: value[field] for field in fields if field in value}
+            append(value)
+            position = end
+        return position
+
+    def _parse(self) -> List[Any]:
+        buffer = self._buffer
+        size = len(buffer)
+        position = 0
+        items: List[Any] = []
+
+        while True:
+            while position < size and buffer[position] in _WHITESPACE:
+                position += 1
+            if position >= size:
+                break
+            char = buffer[position]
+            state = self._state
+
+            if state == _ARRAY:
+                position = self._parse_array(position, items)
+                if self._state == _ARRAY:
+                    break
+                continue
+
+            if state == _START:
+                if char != "{":
+                    raise ValueError("Ответ API не является JSON-объектом")
+                self._state = _KEY
+                position += 1
+            elif state == _KEY:
+                if char == "}":
+                    self._state = _DONE
+                    position += 1
+                    continue
+                if char == ",":
+                    position += 1
+                    continue
+                decoded = self._decode(position)
+                if decoded is None:
+                    break
+                key, end = decoded
+                # Двоеточие после ключа
+                colon = end
+                while colon < size and buffer[colon] in _WHITESPACE:
+                    colon += 1
+                if colon >= size:
+                    break
+                if buffer[colon] != ":" or not isinstance(key, str):
+                    raise ValueError("Некорректный JSON-объект в ответе API")
+                self._key = key
+                self._state = _VALUE
+                position = colon + 1
+            elif state == _VALUE:
+                if self._key == self.array_key and char == "[":
+                    self._state = _ARRAY
+                    position += 1
+                    continue
+                decoded = self._decode(position)
+                if decoded is None:
+                    break
+                self.document[self._key], position = decoded
+                self._state = _MEMBER_END
+            elif state == _MEMBER_END:
+                if char == ",":
+                    self._state = _KEY
+                elif char == "}":
+                    self._state = _DONE
+                else:
+                    raise ValueError("Некорректный JSON-объект в ответе API")
+                position += 1
+            else:
+                raise ValueError("Лишние данные после JSON-объекта в ответе API")
+
+        self._buffer = buffer[position:]
+        self.items_parsed += len(items)
+        return items
@@ -0,0 +1,283 @@
+"""
+Параллельная обработка данных в пуле потоков или процессов.
+
+ParallelProcessor делит данные на пакеты и обрабатывает их в пуле. Размер
+пакета подбирается по измеренной стоимости обработки одного элемента: пакет
+должен занимать около target_chunk_seconds, но пакетов должно хватить на все
+воркеры. Если по измерениям вся работа занимает меньше
+min_parallel_seconds, данные обрабатываются в текущем потоке - накладные
+расходы пула (передача данных в процесс) были бы больше выигрыша.
+
+Для пула процессов функция и данные должны сериализоваться pickle: функция
+должна быть объявлена на уровне модуля (или быть functools.partial от
+такой функции), а данные лучше передавать компактными массивами NumPy.
+
+Пример использования:
+    with ParallelProcessor(use_processes=True) as processor:
+        results = processor.batch_process(score_batch, columns, key="score")
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("parallel_processor")
+
+# Оценивать пакеты предметов анализатора в пуле процессов. По умолчанию выключено:
+# страница рынка (MARKET_PAGE_SIZE=100) оценивается намного быстрее PARALLEL_MIN_SECONDS,
+# и пул не используется; включать для крупных страниц
+PARALLEL_SCORING = os.getenv("PARALLEL_SCORING", "false").lower() in ("1", "true", "yes")
+
+# Количество воркеров (0 - по количеству ядер)
+PARALLEL_MAX_WORKERS = int(os.getenv("PARALLEL_MAX_WORKERS", "0"))
+
+# Минимальная оценка времени работы, при которой имеет смысл использовать пул (секунды)
+PARALLEL_MIN_SECONDS = float(os.getenv("PARALLEL_MIN_SECONDS", "0.05"))
+
+# Желаемая длительность обработки одного пакета (секунды)
+PARALLEL_TARGET_CHUNK_SECONDS = 0.05
+
+# Вес нового измерения в скользящей оценке стоимости элемента
+COST_SMOOTHING = 0.3
+
+
+def _timed_call(func: Callable[[Any], Any], batch: Any) -> Tuple[Any, float]:
+    """Выполняет func(batch) и возвращает результат вместе со временем выполнения."""
+    started = time.perf_counter()
+    result = func(batch)
+    return result, time.perf_counter() - started
+
+
+class ParallelProcessor:
+    """
+    Обработка данных пакетами в пуле потоков или процессов.
+
+    Потоки подходят для задач, отпускающих GIL (ввод-вывод, крупные
+    операции NumPy), процессы - для вычислений на чистом Python.
+    Стоимость обработки элемента запоминается отдельно для каждого ключа
+    задачи (по умолчанию - имени функции).
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        use_processes: bool = False,
+        target_chunk_seconds: float = PARALLEL_TARGET_CHUNK_SECONDS,
+        min_parallel_seconds: float = PARALLEL_MIN_SECONDS,
+    ):
+        """
+        Args:
+            max_workers: Количество воркеров (по умолчанию PARALLEL_MAX_WORKERS или количество ядер)
+            use_processes: Использовать процессы вместо потоков
+            target_chunk_seconds: Желаемая длительность обработки одного пакета
+            min_parallel_seconds: Минимальная оценка времени работы для использования пула
+        """
+        self.max_workers = max_workers or PARALLEL_MAX_WORKERS or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.target_chunk_seconds = target_chunk_seconds
+        self.min_parallel_seconds = min_parallel_seconds
+        self._executor: Optional[Executor] = None
+        self._item_costs: Dict[str, float] = {}
+
+    def __enter__(self) -> "ParallelProcessor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self) -> None:
+        """Останавливает пул воркеров."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def close_async(self) -> None:
+        """Асинхронная версия close: ожидание воркеров не блокирует цикл событий."""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown, True)
+
+    @staticmethod
+    def _task_key(func: Callable, key: Optional[str]) -> str:
+        if key is not None:
+            return key
+        func = getattr(func, "func", func)  # functools.partial
+        return getattr(func, "__qualname__", repr(func))
+
+    def record_cost(self, key: str, items: int, seconds: float) -> None:
+        """Обновляет скользящую оценку стоимости обработки одного элемента."""
+        if items <= 0:
+            return
+        cost = seconds / items
+        previous = self._item_costs.get(key)
+        self._item_costs[key] = (
+            cost if previous is None else previous + COST_SMOOTHING * (cost - previous)
+        )
+
+    def item_cost(self, key: str) -> Optional[float]:
+        """Возвращает оценку стоимости обработки одного элемента, секунды (None - нет измерений)."""
+        return self._item_costs.get(key)
+
+    def should_parallelize(self, key: str, items: int) -> bool:
+        """
+        Решает, использовать ли пул для items элементов.
+
+        Без измерений первый вызов выполняется в текущем потоке: он же и
+        дает оценку стоимости элемента.
+        """
+        cost = self._item_costs.get(key)
+        return (
+            self.max_workers > 1 and cost is not None and cost * items >= self.min_parallel_seconds
+        )
+
+    def chunk_size(self, key: str, items: int) -> int:
+        """
+        Возвращает размер пакета для items элементов.
+
+        Пакет рассчитан на target_chunk_seconds работы, но не больше доли
+        одного воркера, чтобы были заняты все воркеры.
+        """
+        per_worker = max(1, math.ceil(items / self.max_workers))
+        cost = self._item_costs.get(key)
+        if not cost:
+            return per_worker
+        return max(1, min(per_worker, int(self.target_chunk_seconds / cost)))
+
+    def _split(self, items: Sequence[Any], size: int) -> List[Any]:
+        return [items[start : start + size] for start in range(0, len(items), size)]
+
+    def batch_process(
+        self,
+        func: Callable[[Any], Any],
+        items: Sequence[Any],
+        batch_size: Optional[int] = None,
+        key: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Обрабатывает данные пакетами: func получает срез items и возвращает результат пакета.
+
+        Args:
+            func: Функция обработки пакета
+            items: Данные, поддерживающие len() и срезы (список, массив NumPy)
+            batch_size: Размер пакета (по умолчанию - по измеренной стоимости элемента)
+            key: Ключ задачи для учета стоимости элемента
+
+        Returns:
+            Результаты пакетов в порядке пакетов
+        """
+        key = self._task_key(func, key)
+        total = len(items)
+        if not total:
+            return []
+
+        if not self.should_parallelize(key, total):
+            result, seconds = _timed_call(func, items)
+            self.record_cost(key, total, seconds)
+            return [result]
+
+        size = batch_size or self.chunk_size(key, total)
+        batches = self._split(items, size)
+        executor = self._get_executor()
+        futures = [executor.submit(_timed_call, func, batch) for batch in batches]
+
+        results = []
+        busy_seconds = 0.0
+        for future in futures:
+            result, seconds = future.result()
+            results.append(result)
+            busy_seconds += seconds
+        self.record_cost(key, total, busy_seconds)
+        logger.debug(f"{key}: {total} элементов обработано {len(batches)} пакетами по {size}")
+        return results
+
+    def map(
+        self,
+        func: Callable[[Any], Any],
+        items: Sequence[Any],
+        chunk_size: Optional[int] = None,
+        key: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Применяет func к каждому элементу items.
+
+        Returns:
+            Результаты в порядке элементов
+        """
+        batches = self.batch_process(
+            _MapBatch(func), items, chunk_size, key or self._task_key(func, None)
+        )
+        return [result for batch in batches for result in batch]
+
+    async def batch_process_async(
+        self,
+        func: Callable[[Any], Any],
+        items: Sequence[Any],
+        batch_size: Optional[int] = None,
+        key: Optional[str] = None,
+    ) -> List[Any]:
+        """Асинхронная версия batch_process: цикл событий не блокируется на время обработки."""
+        key = self._task_key(func, key)
+        total = len(items)
+        if not total:
+            return []
+
+        loop = asyncio.get_running_loop()
+        if not self.should_parallelize(key, total):
+            # Единственный пакет выполняется в пуле потоков цикла событий
+            result, seconds = await loop.run_in_executor(None, _timed_call, func, items)
+            self.record_cost(key, total, seconds)
+            return [result]
+
+        size = batch_size or self.chunk_size(key, total)
+        executor = self._get_executor()
+        timed_results = await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, _timed_call, func, batch)
+                for batch in self._split(items, size)
+            )
+        )
+        self.record_cost(key, total, sum(seconds for _, seconds in timed_results))
+        return [result for result, _ in timed_results]
+
+    async def map_async(
+        self,
+        func: Callable[[Any], Any],
+        items: Sequence[Any],
+        chunk_size: Optional[int] = None,
+        key: Optional[str] = None,
+    ) -> List[Any]:
+        """Асинхронная версия map."""
+        batches = await self.batch_process_async(
+            _MapBatch(func), items, chunk_size, key or self._task_key(func, None)
+        )
+        return [result for batch in batches for result in batch]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает настройки пула и оценки стоимости элементов по задачам."""
+        return {
+            "max_workers": self.max_workers,
+            "use_processes": self.use_processes,
+            "item_costs": dict(self._item_costs),
+        }
+
+
+class _MapBatch:
+    """Применяет функцию к каждому элементу пакета; сериализуется pickle вместе с функцией."""
+
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[Any], Any]):
+        self.func = func
+
+    def __call__(self, batch: Sequence[Any]) -> List[Any]:
+        return [self.func(item) for item in batch]
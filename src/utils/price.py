@@ -0,0 +1,97 @@
+"""
+Цены в целых центах.
+
+Все цены в конвейере анализа хранятся как int - количество центов.
+Строковые цены DMarket ("12.34") разбираются в центы без промежуточного
+float, поэтому сравнения с порогами прибыли не зависят от ошибок округления
+двоичной арифметики. В доллары цены переводятся только при выводе.
+
+Пример использования:
+    cents = parse_price_cents({"USD": "12.34"})  # 1234
+    print(f"${format_usd(cents)}")               # $12.34
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Optional, Union
+
+# Тип цены в центах (для аннотаций)
+Cents = int
+
+CENTS_PER_USD = 100
+
+
+def usd_to_cents(value: Union[str, int, float, None]) -> Cents:
+    """
+    Переводит цену в долларах в центы с округлением до ближайшего цента.
+
+    Строки вида "12", "12.3", "12.34" разбираются целочисленно; остальные
+    строки (больше двух знаков после точки, экспонента) - через Decimal.
+
+    Args:
+        value: Цена в долларах (строка из API, число или None)
+
+    Returns:
+        Цена в центах (0 для None и пустой строки)
+
+    Raises:
+        ValueError: Если строка не является числом
+    """
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value * CENTS_PER_USD
+    if isinstance(value, float):
+        return round(value * CENTS_PER_USD)
+
+    text = value.strip()
+    if not text:
+        return 0
+
+    sign = 1
+    digits = text
+    if digits[0] in "+-":
+        sign = -1 if digits[0] == "-" else 1
+        digits = digits[1:]
+
+    whole, _, fraction = digits.partition(".")
+    if (
+        (whole or fraction)
+        and (not whole or whole.isdigit())
+        and (not fraction or fraction.isdigit())
+        and len(fraction) <= 2
+    ):
+        return sign * (int(whole or 0) * CENTS_PER_USD + int(fraction.ljust(2, "0")))
+
+    try:
+        cents = Decimal(text).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except ArithmeticError:
+        raise ValueError(f"Некорректная цена: {value!r}") from None
+    return int(cents)
+
+
+def parse_price_cents(price: Optional[Dict[str, Any]], currency: str = "USD") -> Cents:
+    """
+    Извлекает цену в центах из объекта цены DMarket ({"USD": "12.34"}).
+
+    Args:
+        price: Объект цены или None
+        currency: Валюта
+
+    Returns:
+        Цена в центах (0, если цена отсутствует)
+    """
+    if not price:
+        return 0
+    return usd_to_cents(price.get(currency))
+
+
+def cents_to_usd(cents: Cents) -> float:
+    """Переводит центы в доллары для вывода и сериализации."""
+    return cents / CENTS_PER_USD
+
+
+def format_usd(cents: Cents) -> str:
+    """Форматирует цену в центах как сумму в долларах ("12.34")."""
+    sign = "-" if cents < 0 else ""
+    dollars, rest = divmod(abs(cents), CENTS_PER_USD)
+    return f"{sign}{dollars}.{rest:02d}"
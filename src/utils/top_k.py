@@ -0,0 +1,77 @@
+"""
+Потоковый отбор K лучших элементов.
+
+Вместо накопления и полной сортировки всех найденных возможностей
+поддерживается min-куча размера K: память ограничена K элементами, а
+каждая вставка стоит O(log K).
+
+Пример использования:
+    selector = TopKSelector(k=50, key=lambda item: item["profit_percent"])
+    for page in pages:
+        selector.extend(page_opportunities)
+    best = selector.result()
+"""
+
+import heapq
+from typing import Any, Callable, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class TopKSelector(Generic[T]):
+    """
+    Отбирает K элементов с наибольшим значением ключа.
+
+    При равных ключах предпочтение отдается элементам, добавленным раньше,
+    поэтому результат совпадает с устойчивой сортировкой по убыванию.
+    При k=None хранятся все элементы (полный список по явному запросу).
+
+    Attributes:
+        seen: Количество элементов, переданных в селектор
+    """
+
+    def __init__(self, k: Optional[int], key: Callable[[T], Any]):
+        if k is not None and k < 0:
+            raise ValueError("k должно быть неотрицательным или None")
+        self.k = k
+        self.key = key
+        self.seen = 0
+        self._heap: List[Tuple[Any, int, T]] = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: T) -> None:
+        """Добавляет элемент, вытесняя худший, если селектор заполнен."""
+        # -seen: среди равных ключей первым вытесняется добавленный позже
+        entry = (self.key(item), -self.seen, item)
+        self.seen += 1
+
+        if self.k is None or len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif self.k and entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def extend(self, items: Iterable[T]) -> None:
+        """Добавляет несколько элементов."""
+        for item in items:
+            self.push(item)
+
+    def threshold(self) -> Optional[Any]:
+        """
+        Возвращает минимальный ключ, необходимый для попадания в результат.
+
+        None, если селектор еще не заполнен.
+        """
+        if self.k is None or len(self._heap) < self.k or not self._heap:
+            return None
+        return self._heap[0][0]
+
+    def result(self) -> List[T]:
+        """Возвращает отобранные элементы по убыванию ключа."""
+        return [
+            item
+            for _, _, item in sorted(
+                self._heap, key=lambda entry: (entry[0], entry[1]), reverse=True
+            )
+        ]
@@ -0,0 +1,210 @@
+"""
+Кэш с ограниченным временем жизни записей и вытеснением по LRU.
+
+Используется для данных, которые медленно меняются между сканированиями
+рынка (например, истории продаж предметов). Содержимое можно сохранить на
+диск в JSON и загрузить после перезапуска.
+
+Пример использования:
+    cache = TTLCache(ttl=300, maxsize=10000, persist_path="cache/history.json")
+    history = cache.get(item_id)
+    if history is None:
+        history = await api.get_item_history(item_id)
+        cache.set(item_id, history)
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+logger = logging.getLogger("ttl_cache")
+
+# Время жизни записей по умолчанию (секунды)
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+
+class TTLCache:
+    """
+    Кэш "ключ-значение" с TTL и ограниченным размером.
+
+    При превышении maxsize вытесняется запись, к которой дольше всего не
+    обращались. Время истечения хранится как wall-clock время, чтобы
+    сохраненный на диск кэш оставался корректным после перезапуска.
+
+    Attributes:
+        hits: Количество попаданий
+        misses: Количество промахов (включая устаревшие записи)
+        evictions: Количество записей, вытесненных по размеру
+        expirations: Количество записей, удаленных по истечении TTL
+    """
+
+    def __init__(
+        self,
+        ttl: float = CACHE_TTL,
+        maxsize: int = 10000,
+        persist_path: Optional[Union[str, Path]] = None,
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.persist_path is not None and self.persist_path.exists():
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.time()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Возвращает значение по ключу, если оно есть и не устарело.
+
+        Args:
+            key: Ключ
+            default: Значение при промахе
+
+        Returns:
+            Сохраненное значение или default
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Сохраняет значение.
+
+        Args:
+            key: Ключ
+            value: Значение (для сохранения на диск должно сериализоваться в JSON)
+            ttl: Время жизни записи; по умолчанию используется ttl кэша
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Удаляет запись, если она есть."""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Удаляет все записи (счетчики сохраняются)."""
+        self._data.clear()
+
+    def purge_expired(self) -> int:
+        """
+        Удаляет все устаревшие записи.
+
+        Returns:
+            Количество удаленных записей
+        """
+        now = time.time()
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает размер кэша и счетчики попаданий, промахов и вытеснений."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def save(self, path: Optional[Union[str, Path]] = None) -> None:
+        """
+        Сохраняет неустаревшие записи в JSON-файл.
+
+        Запись выполняется через временный файл, чтобы прерванное сохранение
+        не повредило предыдущую версию.
+
+        Args:
+            path: Путь к файлу; по умолчанию persist_path
+        """
+        target = Path(path) if path else self.persist_path
+        if target is None:
+            return
+
+        self.purge_expired()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + ".tmp")
+        entries = [[key, expires_at, value] for key, (expires_at, value) in self._data.items()]
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": 1, "entries": entries}, f, ensure_ascii=False, separators=(",", ":")
+            )
+        os.replace(tmp_path, target)
+
+        logger.debug(f"Кэш сохранен в {target}: {len(entries)} записей")
+
+    def load(self, path: Optional[Union[str, Path]] = None) -> int:
+        """
+        Загружает записи из JSON-файла, пропуская устаревшие.
+
+        Args:
+            path: Путь к файлу; по умолчанию persist_path
+
+        Returns:
+            Количество загруженных записей
+        """
+        source = Path(path) if path else self.persist_path
+        if source is None or not source.exists():
+            return 0
+
+        try:
+            with open(source, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось загрузить кэш из {source}: {e}")
+            return 0
+
+        now = time.time()
+        loaded = 0
+        # Записи сохранены в порядке LRU, поэтому порядок вытеснения восстанавливается
+        for key, expires_at, value in payload.get("entries", []):
+            if expires_at > now:
+                self._data[key] = (expires_at, value)
+                loaded += 1
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+        logger.debug(f"Загружено {loaded} записей кэша из {source}")
+        return loaded
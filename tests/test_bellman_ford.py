@@ -0,0 +1,134 @@
+"""Тесты поиска арбитражных циклов."""
+
+import asyncio
+import math
+
+import numpy as np
+import pytest
+
+from src.arbitrage.bellman_ford import (
+    CASH,
+    ArbitrageGraph,
+    PriceQuote,
+    find_all_arbitrage_opportunities,
+    find_all_arbitrage_opportunities_async,
+    find_negative_cycles,
+    quotes_from_listings,
+    quotes_from_order_books,
+)
+from src.arbitrage.order_book import OrderBooks
+from src.arbitrage.records import MarketItem
+
+
+def has_negative_cycle(src, dst, weight, num_nodes):
+    """Флойд-Уоршелл: отрицательный цикл есть, если dist[i][i] < 0."""
+    dist = np.full((num_nodes, num_nodes), np.inf)
+    np.fill_diagonal(dist, 0.0)
+    for s, d, w in zip(src, dst, weight):
+        dist[s, d] = min(dist[s, d], w)
+    for k in range(num_nodes):
+        dist = np.minimum(dist, dist[:, [k]] + dist[[k], :])
+    return bool((np.diag(dist) < -1e-9).any())
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_negative_cycles_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    num_nodes = int(rng.integers(2, 9))
+    num_edges = int(rng.integers(1, 25))
+    src = rng.integers(0, num_nodes, size=num_edges)
+    dst = rng.integers(0, num_nodes, size=num_edges)
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    weight = rng.uniform(-0.3, 1.0, size=len(src))
+
+    cycles = find_negative_cycles(src, dst, weight, num_nodes)
+    assert bool(cycles) == has_negative_cycle(src, dst, weight, num_nodes)
+    for cycle in cycles:
+        # Ребра образуют замкнутый путь отрицательного веса
+        for current, following in zip(cycle, cycle[1:] + cycle[:1]):
+            assert dst[current] == src[following]
+        assert weight[cycle].sum() < 0
+
+
+def test_no_cycles_without_spread():
+    quotes = [PriceQuote("AK", "dmarket", ask_cents=1000, bid_cents=1000)]
+    assert find_all_arbitrage_opportunities(quotes, fees={"dmarket": 0.05}) == []
+
+
+def test_single_market_buy_sell_cycle():
+    quotes = [PriceQuote("AK", "dmarket", ask_cents=1000, bid_cents=1200)]
+    cycles = find_all_arbitrage_opportunities(quotes, fees={"dmarket": 0.05})
+    assert len(cycles) == 1
+    assert cycles[0].actions == ["buy", "sell"] or cycles[0].actions == ["sell", "buy"]
+    assert cycles[0].profit_percent == pytest.approx(1200 * 0.95 / 1000 * 100 - 100)
+
+
+def test_cross_market_cycle_with_transfer():
+    quotes = [
+        PriceQuote("AK", "dmarket", ask_cents=1000),
+        PriceQuote("AK", "bitskins", bid_cents=1300),
+    ]
+    cycles = find_all_arbitrage_opportunities(quotes, fees={"bitskins": 0.1})
+    assert len(cycles) == 1
+    cycle = cycles[0]
+    assert sorted(cycle.actions) == ["buy", "sell", "transfer", "transfer"]
+    assert (CASH, "dmarket") in cycle.nodes and ("AK", "bitskins") in cycle.nodes
+    assert cycle.rate == pytest.approx(1300 * 0.9 / 1000)
+
+
+def test_min_profit_filters_cycles():
+    quotes = [
+        PriceQuote("AK", "dmarket", ask_cents=1000, bid_cents=1100),
+        PriceQuote("M4", "dmarket", ask_cents=1000, bid_cents=1500),
+    ]
+    all_cycles = find_all_arbitrage_opportunities(quotes, fees={"dmarket": 0.0})
+    assert [round(cycle.profit_percent) for cycle in all_cycles] == [50, 10]
+
+    strict = find_all_arbitrage_opportunities(quotes, min_profit_percent=20, fees={"dmarket": 0.0})
+    assert [round(cycle.profit_percent) for cycle in strict] == [50]
+
+
+def test_quotes_from_listings_take_best_prices():
+    listings = [
+        MarketItem("1", "AK", 1200, 900),
+        MarketItem("2", "AK", 1100, 950),
+        MarketItem("3", "M4", 500),
+    ]
+    quotes = {quote.item: quote for quote in quotes_from_listings(listings)}
+    assert (quotes["AK"].ask_cents, quotes["AK"].bid_cents) == (1100, 950)
+    assert (quotes["M4"].ask_cents, quotes["M4"].bid_cents) == (500, 0)
+
+
+def test_quotes_from_order_books():
+    books = OrderBooks()
+    books.apply_listing(MarketItem("1", "AK", 1000), [(1200, 2)])
+    books.apply_listing(MarketItem("2", "AK", 990))
+    (quote,) = quotes_from_order_books(books, marketplace="dmarket")
+    assert (quote.item, quote.marketplace, quote.ask_cents, quote.bid_cents) == (
+        "AK",
+        "dmarket",
+        990,
+        1200,
+    )
+
+
+def test_graph_skips_non_positive_rates():
+    graph = ArbitrageGraph.from_quotes([PriceQuote("AK", "dmarket", ask_cents=0, bid_cents=100)])
+    assert graph.actions == ["sell"]
+
+
+def test_cycle_to_dict():
+    (cycle,) = find_all_arbitrage_opportunities(
+        [PriceQuote("AK", "dmarket", ask_cents=1000, bid_cents=1200)], fees={"dmarket": 0.0}
+    )
+    data = cycle.to_dict()
+    assert len(data["steps"]) == 2
+    assert data["steps"][0]["to"] == data["steps"][1]["from"]
+    assert math.isclose(data["rate"], 1.2)
+
+
+def test_async_search_accepts_dicts():
+    quotes = [{"item": "AK", "marketplace": "dmarket", "ask": "10.00", "bid": "12.00"}]
+    cycles = asyncio.run(find_all_arbitrage_opportunities_async(quotes, fees={"dmarket": 0.0}))
+    assert len(cycles) == 1
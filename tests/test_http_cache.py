@@ -0,0 +1,226 @@
+"""Тесты HTTP-кэша: свежие попадания, ревалидация 304 и хранение на диске."""
+
+import contextlib
+
+import pytest
+
+from benchmarks.stub_server import DMarketStubServer
+from benchmarks.synthetic_market import SyntheticMarket
+from simple_arbitrage_test import SimpleDMarketAPI
+from src.api.http_cache import (
+    CacheEntry,
+    CachingTransport,
+    HTTPCacheStore,
+    cache_key,
+    parse_endpoint_ttls,
+)
+from src.api.rate_limiter import RateLimiter
+from src.api.request_coalescer import RequestCoalescer
+from src.api.transport import HTTPTransport, RecordedResponse, iter_body_chunks
+from src.utils.instrumentation import Instrumentation
+
+HISTORY_URL = "https://api.dmarket.com/exchange/v1/item-history/1"
+MARKET_URL = "https://api.dmarket.com/exchange/v1/market/items"
+
+
+class FakeServer:
+    """Транспорт-сервер: отвечает телом body с ETag и 304 на совпадающий If-None-Match."""
+
+    rate_limited = True
+
+    def __init__(self, body=b'{"history": []}', etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.status = 200
+        self.requests = []
+
+    @contextlib.asynccontextmanager
+    async def request(self, method, url, headers=None, params=None, json_body=None, on_send=None):
+        sent = dict(await on_send()) if on_send else {}
+        self.requests.append(sent)
+        headers = {"Content-Type": "application/json"}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.etag and sent.get("If-None-Match") == self.etag:
+            yield RecordedResponse(304, headers, b"")
+        else:
+            yield RecordedResponse(self.status, headers, self.body)
+
+    async def close(self):
+        pass
+
+
+async def get(transport, url=HISTORY_URL, params=None, on_send=None):
+    async with transport.request("GET", url, params=params, on_send=on_send) as response:
+        return response.status, await response.read()
+
+
+def make_cache(tmp_path, server, ttl=60.0):
+    store = HTTPCacheStore(tmp_path / "cache.db")
+    ttls = {"/exchange/v1/item-history": ttl, "/exchange/v1/market": 0.0}
+    return CachingTransport(server, store, ttls=ttls)
+
+
+def test_cache_key_includes_host_and_ttls_parse():
+    assert cache_key("GET", "https://api.dmarket.com/a", {"x": 1}) != cache_key(
+        "GET", "http://127.0.0.1:8800/a", {"x": 1}
+    )
+    assert parse_endpoint_ttls("/exchange/v1/item-history/1=600, bad, /a=x") == {
+        "/exchange/v1/item-history": 600.0
+    }
+
+
+@pytest.mark.asyncio
+async def test_fresh_hit_skips_on_send(tmp_path):
+    server = FakeServer()
+    cache = make_cache(tmp_path, server)
+    sent = []
+
+    async def on_send():
+        sent.append(True)
+        return {"X-Request-Sign": "sig"}
+
+    assert await get(cache, on_send=on_send) == (200, server.body)
+    assert await get(cache, on_send=on_send) == (200, server.body)
+    assert len(server.requests) == 1 and len(sent) == 1
+    assert server.requests[0] == {"X-Request-Sign": "sig"}
+    assert cache.get_stats() == {"hits": 1, "stale": 0, "revalidated": 0, "misses": 1}
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_revalidates_with_304(tmp_path):
+    server = FakeServer()
+    cache = make_cache(tmp_path, server, ttl=0.0)
+
+    assert await get(cache) == (200, server.body)
+    # TTL 0: каждый запрос условный, 304 отдает сохраненное тело
+    assert await get(cache) == (200, server.body)
+    assert server.requests[1] == {"If-None-Match": '"v1"'}
+    assert cache.revalidated == 1 and cache.stale == 1
+
+    # Данные изменились: новый ETag, тело загружается и заменяет запись
+    server.body, server.etag = b'{"history": [1]}', '"v2"'
+    assert await get(cache) == (200, b'{"history": [1]}')
+    assert await get(cache) == (200, b'{"history": [1]}')
+    assert cache.revalidated == 2
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_conditional_request(tmp_path):
+    server = FakeServer()
+    cache = make_cache(tmp_path, server)
+    await get(cache)
+    await cache.invalidate("GET", HISTORY_URL)
+    assert await get(cache) == (200, server.body)
+    assert server.requests[-1] == {"If-None-Match": '"v1"'}
+    assert cache.get_stats()["revalidated"] == 1
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_responses_without_validators_or_ttl_are_not_stored(tmp_path):
+    server = FakeServer(etag=None)
+    cache = make_cache(tmp_path, server)
+    await get(cache, MARKET_URL)
+    await get(cache, MARKET_URL)
+    assert len(server.requests) == 2 and len(cache.store) == 0
+
+    # Ошибки не сохраняются
+    server.status = 500
+    assert (await get(cache))[0] == 500
+    assert len(cache.store) == 0
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_changed_response_without_validators_deletes_entry(tmp_path):
+    server = FakeServer()
+    cache = make_cache(tmp_path, server, ttl=0.0)
+    await get(cache)
+    assert len(cache.store) == 1
+
+    # Ответ без валидаторов на эндпоинте с TTL 0 хранить нельзя: старая запись удаляется
+    server.etag = None
+    await get(cache)
+    assert len(cache.store) == 0
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_partially_read_body_is_not_stored(tmp_path):
+    server = FakeServer(body=b"x" * 100)
+    cache = make_cache(tmp_path, server)
+    async with cache.request("GET", HISTORY_URL) as response:
+        async for _ in iter_body_chunks(response, chunk_size=10):
+            break
+    assert len(cache.store) == 0
+
+    # Тело, прочитанное частями, сохраняется целиком
+    async with cache.request("GET", HISTORY_URL) as response:
+        chunks = [chunk async for chunk in iter_body_chunks(response, chunk_size=30)]
+    assert b"".join(chunks) == server.body
+    assert await get(cache) == (200, server.body)
+    assert cache.hits == 1
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_entries_survive_restart(tmp_path):
+    server = FakeServer()
+    cache = make_cache(tmp_path, server)
+    await get(cache)
+    await cache.close()
+
+    reopened = make_cache(tmp_path, server)
+    assert await get(reopened) == (200, server.body)
+    assert reopened.hits == 1 and len(server.requests) == 1
+    await reopened.close()
+
+
+def test_store_trims_oldest_entries(tmp_path):
+    store = HTTPCacheStore(tmp_path / "cache.db", max_entries=2)
+    for index in range(4):
+        store.put(f"k{index}", "/a", CacheEntry('"e"', None, None, float(index), b"body"))
+    store.flush()
+    assert len(store) == 2
+    assert store.get("k0") is None and store.get("k3").body == b"body"
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_client_revalidates_history_against_stub_server(tmp_path):
+    market = SyntheticMarket(items_per_game=5, seed=9, max_history=10)
+    item_id = next(key for key, sales in market.histories.items() if sales)
+    limiter = RateLimiter(rate=1000, max_rate=1000)
+    metrics = Instrumentation(enabled=True)
+
+    async with DMarketStubServer(market) as server:
+        api = SimpleDMarketAPI(
+            "key",
+            "secret",
+            base_url=server.base_url,
+            rate_limiter=limiter,
+            coalescer=RequestCoalescer(),
+            metrics=metrics,
+        )
+        api.transport = CachingTransport(
+            HTTPTransport(api._get_session),
+            HTTPCacheStore(tmp_path / "cache.db"),
+            ttls={"/exchange/v1/item-history": 60.0},
+        )
+        try:
+            first = await api.get_item_history(item_id)
+            cached = await api.get_item_history(item_id)
+            await api.invalidate_item_history(item_id)
+            revalidated = await api.get_item_history(item_id)
+            stats = api.transport.get_stats()
+        finally:
+            await api.close()
+
+    assert first == cached == revalidated == market.item_history(item_id)
+    # Попадание не отправляет запрос; после invalidate сервер ответил 304
+    assert server.requests["history"] == 2 and server.not_modified["history"] == 1
+    assert sum(histogram.count for histogram in metrics.latencies.values()) == 2
+    assert stats == {"hits": 1, "stale": 1, "revalidated": 1, "misses": 1}
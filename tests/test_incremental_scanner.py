@@ -0,0 +1,125 @@
+"""Тесты инкрементального сканирования: учет предметов прохода в ScanPass."""
+
+from src.arbitrage.incremental_scanner import IncrementalScanner
+from src.arbitrage.records import MarketItem, Opportunity
+
+
+def item(item_id, price, bid=0):
+    return MarketItem(item_id, f"title-{item_id}", price, bid)
+
+
+def opportunity(listing, profit=100):
+    return Opportunity(
+        listing.item_id, listing.title, "CS2", listing.price_cents, 900, 1000, profit, 10.0, 5
+    )
+
+
+def run_pass(scanner, listings, score=lambda changed: [], failed=()):
+    scan = scanner.begin_pass("CS2")
+    changed = scan.filter_changed(listings)
+    failed_items = [listing for listing in changed if listing.item_id in failed]
+    scan.update(changed, score(changed), failed_items)
+    return scan, changed, scan.commit()
+
+
+def test_first_pass_counts_everything_as_new():
+    scanner = IncrementalScanner(rescore_after=None)
+    _, changed, stats = run_pass(scanner, [item("a", 100), item("b", 200)], score=lambda c: [])
+    assert [listing.item_id for listing in changed] == ["a", "b"]
+    assert (stats["new"], stats["changed"], stats["unchanged"], stats["removed"]) == (2, 0, 0, 0)
+
+
+def test_new_changed_unchanged_and_removed_accounting():
+    scanner = IncrementalScanner(rescore_after=None)
+    run_pass(
+        scanner,
+        [item("a", 100), item("b", 200), item("c", 300)],
+        score=lambda c: [opportunity(c[2])],
+    )
+
+    scan, changed, stats = run_pass(
+        scanner, [item("a", 100), item("b", 250), item("d", 400)], score=lambda c: []
+    )
+    assert [listing.item_id for listing in changed] == ["b", "d"]
+    assert stats == {
+        "new": 1,
+        "changed": 1,
+        "unchanged": 1,
+        "removed": 1,
+        "retired": 1,
+        "opportunities": 0,
+    }
+    assert scan.removed == {"c"}
+
+
+def test_bid_change_counts_as_change():
+    scanner = IncrementalScanner(rescore_after=None)
+    run_pass(scanner, [item("a", 100, bid=50)])
+    _, changed, stats = run_pass(scanner, [item("a", 100, bid=60)])
+    assert len(changed) == 1 and stats["changed"] == 1
+
+
+def test_opportunities_are_replaced_only_for_rescored_items():
+    scanner = IncrementalScanner(rescore_after=None)
+    first = [item("a", 100), item("b", 200)]
+    run_pass(scanner, first, score=lambda changed: [opportunity(listing) for listing in changed])
+    assert {o.item_id for o in scanner.opportunities("CS2")} == {"a", "b"}
+
+    # "b" изменился и больше не прибылен; "a" без изменений сохраняет возможность
+    run_pass(scanner, [item("a", 100), item("b", 210)], score=lambda changed: [])
+    assert {o.item_id for o in scanner.opportunities("CS2")} == {"a"}
+
+
+def test_failed_item_keeps_opportunity_and_is_retried():
+    scanner = IncrementalScanner(rescore_after=None)
+    run_pass(scanner, [item("a", 100)], score=lambda changed: [opportunity(changed[0])])
+
+    # Цена изменилась, но история не загрузилась: прежняя возможность сохраняется
+    _, changed, stats = run_pass(scanner, [item("a", 120)], failed={"a"})
+    assert len(changed) == 1
+    assert [o.item_id for o in scanner.opportunities("CS2")] == ["a"]
+    assert stats["removed"] == 0
+
+    # При следующем проходе неудачный предмет оценивается снова, хотя цена та же
+    _, changed, stats = run_pass(scanner, [item("a", 120)])
+    assert [listing.item_id for listing in changed] == ["a"]
+    assert stats["changed"] == 1
+    assert scanner.opportunities("CS2") == []
+
+
+def test_failed_new_item_is_retried():
+    scanner = IncrementalScanner(rescore_after=None)
+    run_pass(scanner, [item("a", 100)], failed={"a"})
+    _, changed, _ = run_pass(scanner, [item("a", 100)])
+    assert len(changed) == 1
+
+
+def test_deferred_item_is_rescored_next_pass():
+    scanner = IncrementalScanner(rescore_after=None)
+    run_pass(scanner, [item("a", 100)])
+
+    scan = scanner.begin_pass("CS2")
+    changed = scan.filter_changed([item("a", 150)])
+    scan.defer(changed)
+    scan.commit()
+
+    scan = scanner.begin_pass("CS2")
+    assert len(scan.filter_changed([item("a", 150)])) == 1
+
+
+def test_stale_items_are_rescored_after_timeout():
+    scanner = IncrementalScanner(rescore_after=60)
+    run_pass(scanner, [item("a", 100)])
+
+    scan = scanner.begin_pass("CS2")
+    scan.started_at += 61
+    assert len(scan.filter_changed([item("a", 100)])) == 1
+    assert scan.changed == 1
+
+
+def test_snapshots_are_separate_per_key():
+    scanner = IncrementalScanner(rescore_after=None)
+    run_pass(scanner, [item("a", 100)])
+    other = scanner.begin_pass("DOTA2")
+    assert len(other.filter_changed([item("a", 100)])) == 1
+    assert scanner.get_stats()["CS2"] == {"items": 1, "opportunities": 0, "passes": 1}
@@ -0,0 +1,91 @@
+"""Тесты метрик сканирования: гистограммы, этапы, кэши и выгрузка."""
+
+import json
+import math
+import random
+
+import pytest
+
+from src.utils.instrumentation import Histogram, Instrumentation
+
+
+def identity(endpoint):
+    return endpoint
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_quantile_is_upper_bound_of_bucket(seed):
+    rng = random.Random(seed)
+    bounds = (0.1, 0.5, 1.0)
+    histogram = Histogram(bounds)
+    values = [rng.uniform(0, 2) for _ in range(rng.randint(1, 50))]
+    for value in values:
+        histogram.observe(value)
+
+    ordered = sorted(values)
+    for q in (0.1, 0.5, 0.9, 0.99, 1.0):
+        # Значение ранга ceil(q * n) лежит в корзине, верхнюю границу которой возвращает квантиль
+        exact = ordered[max(math.ceil(q * len(ordered)), 1) - 1]
+        expected = next((bound for bound in bounds if exact <= bound), max(values))
+        assert histogram.quantile(q) == expected
+
+
+def test_overflow_bucket_reports_observed_max():
+    histogram = Histogram((0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(30.0)
+    assert histogram.quantile(0.99) == 30.0
+    assert math.isfinite(histogram.to_dict()["p99"])
+    assert histogram.cumulative() == [("0.1", 1), ("1", 1), ("+Inf", 2)]
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_disabled_instrumentation_records_nothing():
+    metrics = Instrumentation(enabled=False)
+    with metrics.stage("score", items=10) as timer:
+        timer.add_items(5)
+    metrics.record_stage("parse", 1.0)
+    metrics.observe_request("/items", 0.1)
+    assert metrics.stages == {} and metrics.latencies == {}
+
+
+def test_stages_requests_and_caches():
+    metrics = Instrumentation(enabled=True, endpoint_key=identity)
+    with metrics.stage("score", items=10) as timer:
+        timer.add_items(5)
+    metrics.record_stage("score", 0.5, items=5)
+    metrics.observe_request("/items", 0.02)
+    metrics.observe_request("/items", 60.0, status=0)
+    metrics.register_cache("history", lambda: {"hits": 3, "misses": 1, "stale": 1})
+    metrics.register_cache("empty", lambda: {"hits": 0, "misses": 0})
+
+    data = metrics.to_dict()
+    assert data["stages"]["score"]["calls"] == 2
+    assert data["stages"]["score"]["items"] == 20
+    assert data["requests"]["/items"]["count"] == 2
+    assert data["requests"]["/items"]["statuses"] == {"200": 1, "0": 1}
+    assert data["caches"]["history"]["hit_ratio"] == pytest.approx(0.6)
+    assert data["caches"]["empty"]["hit_ratio"] == 0.0
+
+    # Запрос дольше последней границы не дает Infinity в JSON
+    assert json.loads(metrics.to_json())["requests"]["/items"]["p99"] == 60.0
+
+    text = metrics.to_prometheus()
+    assert 'dmarket_scan_request_latency_seconds_bucket{endpoint="/items",le="+Inf"} 2' in text
+    assert 'dmarket_scan_requests_total{endpoint="/items",status="0"} 1' in text
+    assert 'dmarket_scan_cache_lookups_total{cache="history",result="stale"} 1' in text
+
+    metrics.reset()
+    assert metrics.stages == {} and "history" in metrics.cache_ratios()
+
+
+def test_export_format_follows_suffix(tmp_path):
+    metrics = Instrumentation(enabled=True, endpoint_key=identity)
+    metrics.record_stage("parse", 0.1, items=3)
+    metrics.export(tmp_path / "metrics.json")
+    metrics.export(tmp_path / "nested" / "metrics.prom")
+
+    data = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert data["stages"]["parse"]["items_per_second"] == pytest.approx(30)
+    prom = (tmp_path / "nested" / "metrics.prom").read_text(encoding="utf-8")
+    assert 'dmarket_scan_stage_items_total{stage="parse"} 3' in prom
@@ -0,0 +1,133 @@
+"""Тесты потокового разбора страниц: произвольное деление тела на части."""
+
+import json
+import random
+
+import pytest
+
+from src.utils.json_stream import ArrayItemParser
+
+FIELDS = ("itemId", "price")
+
+
+def random_value(rng, depth=0):
+    kind = rng.choice(
+        ["int", "float", "str", "bool", "null", "list", "dict"][: 7 if depth < 2 else 5]
+    )
+    if kind == "int":
+        return rng.randint(-(10**6), 10**6)
+    if kind == "float":
+        return rng.choice([1.5, -0.25, 1e21, 3.0e-5, rng.uniform(-1000, 1000)])
+    if kind == "str":
+        return rng.choice(["", "AK-47 | Redline", "Нож «Бабочка» ★", 'кавычки "и" \\слеш', "★\n"])
+    if kind == "bool":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    if kind == "list":
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+    return {f"k{index}": random_value(rng, depth + 1) for index in range(rng.randint(0, 3))}
+
+
+def random_page(rng):
+    objects = [
+        {
+            "itemId": f"id-{index}",
+            "price": {"USD": str(rng.randint(1, 10**5))},
+            "extra": random_value(rng),
+        }
+        for index in range(rng.randint(0, 5))
+    ]
+    # Скаляры в массиве: число в конце части может продолжиться в следующей
+    objects += [random_value(rng, depth=2) for _ in range(rng.randint(0, 3))]
+    rng.shuffle(objects)
+    page = {"objects": objects}
+    for key in rng.sample(["cursor", "total", "error", "meta"], rng.randint(0, 4)):
+        page[key] = random_value(rng)
+    # Члены до и после массива
+    items = list(page.items())
+    rng.shuffle(items)
+    return dict(items)
+
+
+def dumps(rng, page):
+    return json.dumps(
+        page,
+        ensure_ascii=rng.random() < 0.5,
+        indent=rng.choice([None, 1, "\t"]),
+        separators=rng.choice([None, (",", ":"), (" , ", " : ")]),
+    ).encode("utf-8")
+
+
+def parse(body, cuts, fields=None):
+    parser = ArrayItemParser("objects", fields)
+    items = []
+    start = 0
+    for cut in sorted(cuts) + [len(body)]:
+        items += parser.feed(body[start:cut])
+        start = cut
+    items += parser.close()
+    return items, parser
+
+
+def expected_items(page, fields):
+    if fields is None:
+        return page["objects"]
+    return [
+        (
+            {field: item[field] for field in fields if field in item}
+            if isinstance(item, dict)
+            else item
+        )
+        for item in page["objects"]
+    ]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_splits_match_json_loads(seed):
+    rng = random.Random(seed)
+    page = random_page(rng)
+    body = dumps(rng, page)
+    fields = rng.choice([None, FIELDS])
+    document = {key: value for key, value in json.loads(body).items() if key != "objects"}
+
+    for _ in range(20):
+        cuts = [rng.randint(0, len(body)) for _ in range(rng.randint(1, 8))]
+        items, parser = parse(body, cuts, fields)
+        assert items == expected_items(page, fields)
+        assert parser.document == document
+        assert parser.items_parsed == len(page["objects"])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_every_single_split_point(seed):
+    rng = random.Random(100 + seed)
+    page = random_page(rng)
+    page["objects"] += [1.5, -12, 2e-3]
+    body = dumps(rng, page)
+    for cut in range(len(body) + 1):
+        items, parser = parse(body, [cut])
+        assert items == page["objects"], body[:cut]
+
+
+def test_byte_by_byte_multibyte_text():
+    page = {"objects": [{"title": "Нож ★ «Керамбит»"}], "cursor": "дальше"}
+    body = json.dumps(page, ensure_ascii=False).encode("utf-8")
+    items, parser = parse(body, list(range(len(body))))
+    assert items == page["objects"] and parser.document == {"cursor": "дальше"}
+
+
+def test_items_are_returned_before_body_ends():
+    parser = ArrayItemParser("objects")
+    assert parser.feed(b'{"total": 2, "objects": [{"a": 1}, {"a"') == [{"a": 1}]
+    assert parser.feed(b": 2}]}") == [{"a": 2}]
+    assert parser.close() == [] and parser.document == {"total": 2}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b"[1, 2]", b'{"objects": [1, 2', b'{"objects": [1] "x": 1}', b'{"a": 1} {}', b'{"a": tru}'],
+)
+def test_invalid_or_truncated_body_raises(body):
+    with pytest.raises(ValueError):
+        parse(body, [])
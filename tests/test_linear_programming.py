@@ -0,0 +1,125 @@
+"""Тесты выбора портфеля в пределах бюджета."""
+
+import itertools
+import random
+
+import pytest
+
+from src.arbitrage import linear_programming
+from src.arbitrage.linear_programming import PortfolioOptimizer
+from src.arbitrage.records import Opportunity
+
+
+def opportunity(index, game, cost, profit):
+    return Opportunity(str(index), f"item-{index}", game, cost, cost, cost + profit, profit, 0.0, 5)
+
+
+def random_opportunities(rng, count):
+    return [
+        opportunity(index, rng.choice(["CS2", "DOTA2"]), rng.randint(1, 60), rng.randint(-5, 30))
+        for index in range(count)
+    ]
+
+
+def brute_force_profit(optimizer, opportunities):
+    """Перебор всех подмножеств с проверкой бюджета и лимитов игр."""
+    best = 0
+    for mask in itertools.product([False, True], repeat=len(opportunities)):
+        chosen = [item for item, keep in zip(opportunities, mask) if keep]
+        if sum(item.buy_price_cents for item in chosen) > optimizer.budget_cents:
+            continue
+        games = {item.game for item in chosen}
+        if any(
+            sum(item.buy_price_cents for item in chosen if item.game == game)
+            > optimizer.game_limit(game)
+            for game in games
+        ):
+            continue
+        best = max(best, sum(item.profit_cents for item in chosen))
+    return best
+
+
+def assert_feasible(optimizer, selection):
+    assert selection.total_cost_cents <= optimizer.budget_cents
+    for game, cost in selection.cost_by_game().items():
+        assert cost <= optimizer.game_limit(game)
+    assert all(item.profit_cents > 0 for item in selection.selected)
+
+
+def test_greedy_method_skips_exact_solver():
+    assert PortfolioOptimizer(method="greedy")._exact_method() is None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_greedy_is_feasible_and_near_optimal(seed):
+    rng = random.Random(seed)
+    opportunities = random_opportunities(rng, 10)
+    optimizer = PortfolioOptimizer(budget_cents=100, max_game_exposure=0.6, method="greedy")
+    selection = optimizer.optimize(opportunities)
+
+    assert_feasible(optimizer, selection)
+    assert selection.method == "greedy" and not selection.optimal
+    assert selection.expected_profit_cents <= brute_force_profit(optimizer, opportunities)
+    # Жадный выбор не хуже лучшей одиночной покупки
+    assert selection.expected_profit_cents >= max(
+        (
+            item.profit_cents
+            for item in opportunities
+            if item.buy_price_cents <= optimizer.game_limit(item.game)
+        ),
+        default=0,
+    )
+
+
+@pytest.mark.parametrize("method", ["scipy", "pulp"])
+@pytest.mark.parametrize("seed", range(10))
+def test_exact_method_matches_brute_force(method, seed):
+    available = {
+        "scipy": linear_programming.SCIPY_AVAILABLE,
+        "pulp": linear_programming.PULP_AVAILABLE,
+    }
+    if not available[method]:
+        pytest.skip(f"{method} не установлен")
+
+    rng = random.Random(seed)
+    opportunities = random_opportunities(rng, 10)
+    optimizer = PortfolioOptimizer(budget_cents=100, max_game_exposure=0.6, method=method)
+    selection = optimizer.optimize(opportunities)
+
+    assert_feasible(optimizer, selection)
+    assert selection.expected_profit_cents == brute_force_profit(optimizer, opportunities)
+
+
+def test_unaffordable_and_unprofitable_items_are_ignored():
+    optimizer = PortfolioOptimizer(budget_cents=100, max_game_exposure=0.5, method="greedy")
+    selection = optimizer.optimize(
+        [
+            opportunity(1, "CS2", 60, 100),  # дороже лимита игры
+            opportunity(2, "CS2", 10, 0),
+            opportunity(3, "CS2", 10, -5),
+            opportunity(4, "CS2", 20, 4),
+        ]
+    )
+    assert [item.item_id for item in selection.selected] == ["4"]
+
+
+def test_explicit_game_limits():
+    optimizer = PortfolioOptimizer(budget_cents=100, game_limits={"CS2": 10}, method="greedy")
+    assert optimizer.game_limit("CS2") == 10
+    assert optimizer.game_limit("DOTA2") == 50
+
+
+def test_best_single_item_beats_ratio_order():
+    # По отношению прибыль/стоимость первой идет дешевая покупка, но одна дорогая выгоднее
+    optimizer = PortfolioOptimizer(budget_cents=100, max_game_exposure=1.0, method="greedy")
+    selection = optimizer.optimize([opportunity(1, "CS2", 2, 2), opportunity(2, "CS2", 100, 90)])
+    assert [item.item_id for item in selection.selected] == ["2"]
+
+
+def test_optimize_results_flattens_games():
+    optimizer = PortfolioOptimizer(budget_cents=1000, max_game_exposure=1.0, method="greedy")
+    selection = optimizer.optimize_results(
+        {"CS2": [opportunity(1, "CS2", 10, 5)], "DOTA2": [opportunity(2, "DOTA2", 10, 7)]}
+    )
+    assert [item.item_id for item in selection.selected] == ["2", "1"]
+    assert selection.to_dict()["expected_profit"] == 0.12
@@ -0,0 +1,214 @@
+"""Тесты книги заявок против модели на словарях."""
+
+import random
+
+import pytest
+
+from src.arbitrage import order_book
+from src.arbitrage.order_book import ASK, BID, BookSide, OrderBook, OrderBooks
+from src.arbitrage.records import MarketItem
+
+
+def model_best(levels, descending):
+    if not levels:
+        return 0
+    return max(levels) if descending else min(levels)
+
+
+def model_within(levels, descending, limit_price):
+    if descending:
+        return [price for price in levels if price >= limit_price]
+    return [price for price in levels if price <= limit_price]
+
+
+def model_fill(levels, descending, quantity):
+    filled = cost = 0
+    for price in sorted(levels, reverse=descending):
+        take = min(levels[price], quantity - filled)
+        if take <= 0:
+            break
+        filled += take
+        cost += take * price
+    return filled, cost
+
+
+def assert_side_matches(side, levels):
+    assert side.quantities == levels
+    assert side.best() == model_best(levels, side.descending)
+    assert side.total_quantity() == sum(levels.values())
+    limits = {1, 2, 5000} | set(levels) | {price + 1 for price in levels}
+    limits |= {price - 1 for price in levels if price > 1}
+    for limit_price in limits:
+        within = model_within(levels, side.descending, limit_price)
+        assert side.levels_within(limit_price) == len(within)
+        assert side.quantity_within(limit_price) == sum(levels[price] for price in within)
+    for quantity in range(0, sum(levels.values()) + 3):
+        assert side.fill(quantity) == model_fill(levels, side.descending, quantity)
+
+
+@pytest.fixture(params=[2, 32], ids=["tree", "small"])
+def tree_min_levels(request, monkeypatch):
+    """Порог дерева Фенвика: 2 - запросы почти всегда идут по дереву."""
+    monkeypatch.setattr(order_book, "TREE_MIN_LEVELS", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("seed", range(15))
+def test_book_side_matches_model(descending, seed, tree_min_levels):
+    rng = random.Random(seed)
+    side = BookSide(descending=descending)
+    levels = {}
+    # Цены растут скачками, чтобы граница дерева удваивалась посреди обновлений
+    max_price = 4
+    for step in range(120):
+        if step % 20 == 19:
+            max_price *= 8
+        price = rng.randint(1, max_price)
+        if rng.random() < 0.3:
+            quantity = rng.randint(0, 4)
+            side.set(price, quantity)
+            if quantity:
+                levels[price] = quantity
+            else:
+                levels.pop(price, None)
+        else:
+            delta = rng.randint(-3, 3)
+            side.add(price, delta)
+            quantity = levels.get(price, 0) + delta
+            if quantity > 0:
+                levels[price] = quantity
+            else:
+                levels.pop(price, None)
+        if step % 10 == 0:
+            assert_side_matches(side, levels)
+    assert_side_matches(side, levels)
+
+
+def test_non_positive_price_rejected():
+    with pytest.raises(ValueError):
+        BookSide(descending=False).add(0, 1)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_orders_and_replaced_levels_match_model(seed, tree_min_levels):
+    rng = random.Random(seed)
+    book = OrderBook()
+    orders = {}
+    aggregated = {}
+
+    for _ in range(80):
+        action = rng.random()
+        if action < 0.5:
+            order_id = str(rng.randint(0, 15))
+            orders[order_id] = (rng.choice([BID, ASK]), rng.randint(1, 300), rng.randint(1, 3))
+            book.upsert_order(order_id, *orders[order_id])
+        elif action < 0.75:
+            order_id = str(rng.randint(0, 15))
+            assert book.remove_order(order_id) == (orders.pop(order_id, None) is not None)
+        else:
+            levels = [(rng.randint(0, 300), rng.randint(0, 3)) for _ in range(rng.randint(0, 6))]
+            book.replace_levels(BID, levels)
+            aggregated = {}
+            for price, quantity in levels:
+                if price > 0 and quantity > 0:
+                    aggregated[price] = aggregated.get(price, 0) + quantity
+
+        expected = {BID: dict(aggregated), ASK: {}}
+        for side, price, quantity in orders.values():
+            expected[side][price] = expected[side].get(price, 0) + quantity
+        assert_side_matches(book.bids, expected[BID])
+        assert_side_matches(book.asks, expected[ASK])
+        assert len(book) == len(orders)
+
+
+def test_replace_levels_counts_only_changes():
+    book = OrderBook()
+    assert book.replace_levels(BID, [(100, 2), (90, 1)]) == 2
+    assert book.replace_levels(BID, [(100, 2), (90, 1)]) == 0
+    assert book.replace_levels(BID, [(100, 3), (80, 1)]) == 3
+    assert book.depth_at(BID, 90) == 0 and book.depth_at(BID, 100) == 3
+
+
+def test_book_queries():
+    book = OrderBook()
+    assert book.spread() is None
+    book.upsert_order("1", ASK, 120)
+    book.upsert_order("2", ASK, 110, 2)
+    book.set_level(BID, 100, 5)
+    assert (book.best_bid(), book.best_ask(), book.spread()) == (100, 110, 10)
+    assert book.buy_quantity(115) == 2 and book.sell_quantity(100) == 5
+    assert book.buy_cost(3) == (3, 340)
+    assert book.sell_proceeds(10) == (5, 500)
+    with pytest.raises(ValueError):
+        book.set_level("middle", 100, 1)
+
+
+def test_order_books_follow_listings():
+    books = OrderBooks()
+    books.apply_listing(MarketItem("1", "AK", 1000), [(900, 1)])
+    books.apply_listing(MarketItem("2", "AK", 950))
+    books.apply_listing(MarketItem("3", "M4", 500))
+    assert (books.best_ask("AK"), books.best_bid("AK")) == (950, 900)
+
+    # Изменение цены предложения обновляет только его уровень
+    books.apply_listing(MarketItem("2", "AK", 1100))
+    assert books.best_ask("AK") == 1000
+
+    assert books.remove_orders(["1", "unknown"]) == 1
+    assert books.best_ask("AK") == 1100
+    assert books.remove_orders(["2"]) == 1
+    assert "AK" not in books and books.best_bid("AK", default=-1) == -1
+    assert [title for title, _ in books.items()] == ["M4"]
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_listing_without_bids_keeps_title_bids(reverse):
+    books = OrderBooks()
+    listings = [(MarketItem("1", "AK", 100), [(130, 1)]), (MarketItem("2", "AK", 150), [])]
+    for listing, bids in listings[::-1] if reverse else listings:
+        books.apply_listing(listing, bids)
+    assert books.best_bid("AK") == 130
+
+    # Повтор предложения без ордеров не стирает его уровни, удаление - стирает
+    books.apply_listing(MarketItem("1", "AK", 110), [])
+    assert books.best_bid("AK") == 130
+    books.remove_orders(["1"])
+    assert books.best_bid("AK") == 0 and books.best_ask("AK") == 150
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_title_bids_merge_listings_like_model(seed):
+    rng = random.Random(seed)
+    books = OrderBooks()
+    titles = {}
+    listing_bids = {}
+
+    for _ in range(150):
+        item_id = str(rng.randint(0, 12))
+        if rng.random() < 0.2:
+            books.remove_orders([item_id])
+            titles.pop(item_id, None)
+            listing_bids.pop(item_id, None)
+        else:
+            title = rng.choice(["AK", "M4"])
+            bids = [(rng.randint(1, 20), rng.randint(1, 3)) for _ in range(rng.randint(0, 3))]
+            books.apply_listing(MarketItem(item_id, title, rng.randint(21, 40)), bids)
+            if titles.get(item_id, title) != title:
+                listing_bids.pop(item_id, None)
+            titles[item_id] = title
+            if bids:
+                levels = {}
+                for price, quantity in bids:
+                    levels[price] = levels.get(price, 0) + quantity
+                listing_bids[item_id] = levels
+
+        # Уровень названия - наибольшее количество среди его предложений
+        for title in ("AK", "M4"):
+            expected = {}
+            for item_id, levels in listing_bids.items():
+                if titles[item_id] == title:
+                    for price, quantity in levels.items():
+                        expected[price] = max(expected.get(price, 0), quantity)
+            book = books.get(title)
+            assert (book.bids.quantities if book is not None else {}) == expected
@@ -0,0 +1,94 @@
+"""Тесты параллельной обработки и параллельной оценки срезов столбцов."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.arbitrage.scoring import ListingColumns, select_top_rows, select_top_rows_async
+from src.utils.parallel_processor import ParallelProcessor
+
+
+def square(value):
+    return value * value
+
+
+def total(batch):
+    return sum(batch)
+
+
+def random_columns(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = ListingColumns(rng.integers(100, 200, size=rows), rng.integers(0, 180, size=rows))
+    columns.sale_count = rng.integers(0, 4, size=rows)
+    columns.sale_sum_cents = columns.sale_count * rng.integers(100, 260, size=rows)
+    return columns
+
+
+def test_first_call_runs_inline_and_measures_cost():
+    processor = ParallelProcessor(max_workers=4, min_parallel_seconds=0.0)
+    assert processor.batch_process(total, list(range(10))) == [45]
+    assert processor.item_cost("total") is not None
+    assert processor._executor is None
+
+    # После измерения работа делится на пакеты, результаты - в порядке пакетов
+    results = processor.batch_process(total, list(range(100)), batch_size=10)
+    assert results == [sum(range(start, start + 10)) for start in range(0, 100, 10)]
+    processor.close()
+
+
+def test_cheap_work_stays_inline():
+    processor = ParallelProcessor(max_workers=4, min_parallel_seconds=60.0)
+    processor.record_cost("total", 10, 0.001)
+    assert not processor.should_parallelize("total", 1000)
+    assert processor.batch_process(total, list(range(1000))) == [sum(range(1000))]
+    assert processor._executor is None
+
+
+def test_chunk_size_uses_cost_and_worker_count():
+    processor = ParallelProcessor(max_workers=4, target_chunk_seconds=0.01)
+    assert processor.chunk_size("job", 100) == 25
+    processor.record_cost("job", 100, 0.01)  # 0.1 мс на элемент
+    assert processor.chunk_size("job", 100) == 25
+    assert processor.chunk_size("job", 10000) == 100
+
+
+def test_map_preserves_order():
+    processor = ParallelProcessor(max_workers=3, min_parallel_seconds=0.0)
+    processor.record_cost("square", 1, 1.0)
+    assert processor.map(square, list(range(20)), chunk_size=3) == [
+        value * value for value in range(20)
+    ]
+    processor.close()
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+@pytest.mark.parametrize("k", [5, None])
+def test_parallel_top_rows_match_serial(use_processes, k):
+    columns = random_columns(2000)
+    expected_rows, expected_scores = select_top_rows(columns, 5.0, k)
+
+    with ParallelProcessor(
+        max_workers=3, use_processes=use_processes, min_parallel_seconds=0.0
+    ) as processor:
+        processor.record_cost("score_top_rows", 1000, 0.001)
+        rows, scores = select_top_rows(columns, 5.0, k, processor=processor)
+
+    assert rows.tolist() == expected_rows.tolist()
+    assert scores.profit_cents.tolist() == expected_scores.profit_cents.tolist()
+
+
+def test_async_top_rows_and_close():
+    columns = random_columns(500, seed=1)
+    expected_rows, _ = select_top_rows(columns, 5.0, 10)
+
+    async def run():
+        processor = ParallelProcessor(max_workers=2, min_parallel_seconds=0.0)
+        processor.record_cost("score_top_rows", 1000, 0.001)
+        rows, _ = await select_top_rows_async(columns, 5.0, 10, processor=processor)
+        await processor.close_async()
+        return rows, processor
+
+    rows, processor = asyncio.run(run())
+    assert rows.tolist() == expected_rows.tolist()
+    assert processor._executor is None
@@ -0,0 +1,150 @@
+"""Тесты приоритетного опроса: планирование в пределах бюджета запросов."""
+
+import heapq
+import random
+import time
+
+import pytest
+
+from src.arbitrage.polling_scheduler import PollingScheduler
+from src.arbitrage.records import MarketItem, Opportunity
+
+
+def item(item_id, title="AK", price=100):
+    return MarketItem(str(item_id), title, price)
+
+
+def scored(scheduler, items, seconds_ago):
+    """Отмечает предметы как оцененные seconds_ago секунд назад."""
+    for listing in items:
+        scheduler._scored_at[listing.item_id] = time.time() - seconds_ago
+
+
+def always(_):
+    return True
+
+
+def test_unlimited_budget_scores_all_changed():
+    scheduler = PollingScheduler(budget=0)
+    changed = [item(index) for index in range(5)]
+    plan = scheduler.plan(changed, [item(9)], needs_request=lambda listing: listing.item_id != "0")
+    assert plan.rescore == changed
+    assert (plan.refresh, plan.deferred, plan.requests) == ([], [], 4)
+
+
+def test_budget_limits_requests_and_defers_rest():
+    scheduler = PollingScheduler(budget=3, min_repoll_interval=0)
+    changed = [item(index) for index in range(6)]
+    plan = scheduler.plan(changed, [], needs_request=always)
+    assert plan.requests == 3
+    assert len(plan.rescore) == 3
+    assert {listing.item_id for listing in plan.rescore + plan.deferred} == {
+        str(index) for index in range(6)
+    }
+    assert scheduler.get_stats()["deferred_items"] == 3
+
+
+def test_cached_changed_items_do_not_use_budget():
+    scheduler = PollingScheduler(budget=1)
+    changed = [item(index) for index in range(4)]
+    plan = scheduler.plan(changed, [], needs_request=lambda listing: listing.item_id == "3")
+    assert [listing.item_id for listing in plan.rescore] == ["0", "1", "2", "3"]
+    assert plan.requests == 1 and plan.deferred == []
+
+
+def test_new_items_come_first_then_hot_and_old():
+    scheduler = PollingScheduler(budget=2, age_scale=100, min_repoll_interval=0)
+    hot, cold, new = item(1, "hot"), item(2, "cold"), item(3, "new")
+    scored(scheduler, [hot, cold], seconds_ago=50)
+    scheduler._title_stats("hot").volatility = 0.1
+
+    plan = scheduler.plan([hot, cold, new], [], needs_request=always)
+    assert [listing.item_id for listing in plan.rescore] == ["3", "1"]
+    assert [listing.item_id for listing in plan.deferred] == ["2"]
+
+
+def test_leftover_budget_refreshes_stale_unchanged_items():
+    scheduler = PollingScheduler(budget=3, min_repoll_interval=60)
+    stale, recent = item(1), item(2)
+    scored(scheduler, [stale], seconds_ago=120)
+    scored(scheduler, [recent], seconds_ago=10)
+
+    plan = scheduler.plan([item(3)], [stale, recent, item(4)], needs_request=always)
+    assert [listing.item_id for listing in plan.refresh] == ["1"]
+    assert {listing.item_id for listing in plan.rescore} == {"1", "3"}
+    assert plan.requests == 2
+
+
+def test_heat_grows_with_volatility_sales_and_profit():
+    scheduler = PollingScheduler(budget=1, min_liquidity=10)
+    listing = item(1)
+    base = scheduler.heat(listing)
+
+    scheduler.observe([listing])
+    scheduler.observe([item(1, price=120)])
+    after_volatility = scheduler.heat(listing)
+    assert after_volatility > base
+
+    opportunity = Opportunity("1", "AK", "CS2", 120, 100, 130, 30, 30.0, 20)
+    scheduler.record_scored([listing], [20], [opportunity])
+    assert scheduler.heat(listing) > after_volatility
+
+
+def test_forget_drops_item_state():
+    scheduler = PollingScheduler(budget=1)
+    scheduler.observe([item(1)])
+    scheduler.record_scored([item(1)], [3], [])
+    scheduler.forget(["1"])
+    assert scheduler.get_stats()["items"] == 0
+    assert scheduler.priority(item(1), changed=True) == float("inf")
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_page_by_page_round_matches_single_plan(seed):
+    rng = random.Random(seed)
+    scheduler = PollingScheduler(budget=rng.randint(1, 8), age_scale=100, min_repoll_interval=30)
+    items = [item(index, f"title-{rng.randint(0, 4)}") for index in range(60)]
+    for listing in items:
+        if rng.random() < 0.8:
+            scored(scheduler, [listing], seconds_ago=rng.choice([5, 40, 200, 900]))
+    for title in {listing.title for listing in items}:
+        scheduler._title_stats(title).volatility = rng.random() * 0.2
+    changed_ids = {listing.item_id for listing in rng.sample(items, 30)}
+    cached_ids = {listing.item_id for listing in rng.sample(items, 10)}
+
+    def needs_request(listing):
+        return listing.item_id not in cached_ids
+
+    poll_round = scheduler.begin(needs_request)
+    now = poll_round.now
+    rescored, deferred = [], []
+    for start in range(0, len(items), 7):
+        page = items[start : start + 7]
+        page_rescore, page_deferred = poll_round.add(
+            [listing for listing in page if listing.item_id in changed_ids],
+            [listing for listing in page if listing.item_id not in changed_ids],
+        )
+        rescored += page_rescore
+        deferred += page_deferred
+        # В куче кандидатов не больше бюджета
+        assert len(poll_round._heap) <= scheduler.budget
+    plan = poll_round.finish()
+
+    # Эталон: nlargest по всем кандидатам прохода
+    candidates = []
+    for listing in items:
+        changed = listing.item_id in changed_ids
+        if changed and needs_request(listing):
+            candidates.append((scheduler.priority(listing, True, now), listing))
+        elif not changed and scheduler._scored_at.get(listing.item_id, now) <= now - 30:
+            candidates.append((scheduler.priority(listing, False, now), listing))
+    expected = heapq.nlargest(scheduler.budget, candidates, key=lambda candidate: candidate[0])
+    expected_ids = [listing.item_id for _, listing in expected]
+
+    assert [listing.item_id for listing in plan.rescore] == expected_ids
+    assert {listing.item_id for listing in rescored} == changed_ids & cached_ids
+    assert {listing.item_id for listing in deferred} == {
+        listing.item_id
+        for _, listing in candidates
+        if listing.item_id in changed_ids and listing.item_id not in expected_ids
+    }
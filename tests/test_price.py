@@ -0,0 +1,120 @@
+"""Тесты цен в целых центах и хранилища цен."""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from src.db.price_store import PriceStore, item_key, sqlite_path_from_url
+from src.utils.price import cents_to_usd, format_usd, parse_price_cents, usd_to_cents
+
+
+@pytest.mark.parametrize(
+    "value, cents",
+    [
+        ("12.34", 1234),
+        ("12.3", 1230),
+        ("12", 1200),
+        (".5", 50),
+        ("-1.05", -105),
+        ("0.005", 1),
+        ("1.234", 123),
+        ("1e2", 10000),
+        ("", 0),
+        (None, 0),
+        (3, 300),
+        (0.1 + 0.2, 30),
+    ],
+)
+def test_usd_to_cents(value, cents):
+    assert usd_to_cents(value) == cents
+
+
+def test_usd_to_cents_rejects_garbage():
+    with pytest.raises(ValueError):
+        usd_to_cents("abc")
+
+
+def test_parse_and_format():
+    assert parse_price_cents({"USD": "0.07"}) == 7
+    assert parse_price_cents(None) == 0
+    assert parse_price_cents({"EUR": "1.00"}, currency="EUR") == 100
+    assert format_usd(1234) == "12.34"
+    assert format_usd(-5) == "-0.05"
+    assert cents_to_usd(1250) == 12.5
+
+
+def test_sqlite_path_from_url():
+    assert sqlite_path_from_url("sqlite:///data/db.sqlite") == "data/db.sqlite"
+    with pytest.raises(ValueError):
+        sqlite_path_from_url("postgres://localhost/db")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"))
+    yield store
+    store.close()
+
+
+def test_one_row_per_title_and_price_only_on_change(store):
+    assert store.record_prices({"AK": 1000, "M4": 2000}, game="CS2") == 2
+    assert store.record_prices({"AK": 1000, "M4": 2100}, game="CS2") == 1
+    assert store.record_prices({"AK": 1000}, game="CS2") == 0
+
+    assert [cents for cents, _ in store.get_price_history("M4", game="CS2")] == [2100, 2000]
+    assert [cents for cents, _ in store.get_price_history("AK", game="CS2")] == [1000]
+
+    conn = sqlite3.connect(store.db_path)
+    items = conn.execute("SELECT item_id, market_hash_name, game FROM items ORDER BY id").fetchall()
+    assert items == [(item_key("CS2", "AK"), "AK", "CS2"), (item_key("CS2", "M4"), "M4", "CS2")]
+    conn.close()
+
+
+def test_games_are_separate(store):
+    store.record_prices({"Key": 250}, game="CS2")
+    store.record_prices({"Key": 180}, game="TF2")
+    assert store.get_price_history("Key", game="TF2")[0][0] == 180
+    assert len(store.get_price_history("Key", game="CS2")) == 1
+
+
+def test_last_price_is_reloaded_after_restart(store):
+    store.record_prices({"AK": 1000}, game="CS2")
+    store.close()
+
+    reopened = PriceStore(store.db_path)
+    assert reopened.record_prices({"AK": 1000}, game="CS2") == 0
+    assert reopened.record_prices({"AK": 1001}, game="CS2") == 1
+    reopened.close()
+
+
+def test_legacy_database_gets_price_cents_column(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE items (
+            id INTEGER PRIMARY KEY, item_id VARCHAR(255) NOT NULL, name VARCHAR(255) NOT NULL,
+            market_hash_name VARCHAR(255) NOT NULL, game VARCHAR(50) NOT NULL,
+            category VARCHAR(100), created_at DATETIME, updated_at DATETIME
+        );
+        CREATE TABLE item_prices (
+            id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, price FLOAT NOT NULL,
+            currency VARCHAR(10) NOT NULL, source VARCHAR(50) NOT NULL, timestamp DATETIME
+        );
+        INSERT INTO items (item_id, name, market_hash_name, game) VALUES ('x', 'AK', 'AK', 'CS2');
+        INSERT INTO item_prices (item_id, price, currency, source, timestamp)
+        VALUES (1, 12.34, 'USD', 'dmarket', '2024-01-01 00:00:00');
+        """
+    )
+    conn.close()
+
+    store = PriceStore(path)
+    # Старая цена в долларах читается как центы, поэтому та же цена не записывается повторно
+    assert store.get_price_history("AK", game="CS2")[0][0] == 1234
+    assert store.record_prices({"AK": 1234}, game="CS2") == 0
+    store.close()
+
+
+def test_record_prices_async(store):
+    assert asyncio.run(store.record_prices_async({"AK": 500}, game="CS2")) == 1
@@ -0,0 +1,143 @@
+"""Тесты ограничителя частоты запросов: ведро токенов, AIMD и Retry-After."""
+
+import asyncio
+import email.utils
+import time
+
+import pytest
+
+from src.api import rate_limiter
+from src.api.rate_limiter import RateLimiter, default_endpoint_key, parse_retry_after
+
+HISTORY = "/exchange/v1/item-history/abc"
+
+
+class FakeClock:
+    """Управляемая замена time.monotonic."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake)
+    return fake
+
+
+def test_parse_retry_after_seconds_and_invalid():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
+
+
+def test_parse_retry_after_http_date():
+    retry_at = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= parse_retry_after(retry_at) <= 30
+
+    past = email.utils.formatdate(time.time() - 30, usegmt=True)
+    assert parse_retry_after(past) == 0.0
+
+
+def test_endpoint_key_groups_item_paths():
+    assert (
+        default_endpoint_key("/exchange/v1/item-history/abc?limit=10")
+        == "/exchange/v1/item-history"
+    )
+    assert default_endpoint_key(HISTORY) == default_endpoint_key("/exchange/v1/item-history/xyz")
+    assert default_endpoint_key("/exchange/v1/market/items") != default_endpoint_key(HISTORY)
+
+
+def test_additive_increase_is_capped(clock):
+    limiter = RateLimiter(rate=1.0, min_rate=0.5, max_rate=1.25, increase_step=0.1)
+    limiter.record_success(HISTORY)
+    assert limiter.current_rate(HISTORY) == pytest.approx(1.1)
+    for _ in range(10):
+        limiter.record_success(HISTORY)
+    assert limiter.current_rate(HISTORY) == pytest.approx(1.25)
+
+
+def test_multiplicative_decrease_once_per_block(clock):
+    limiter = RateLimiter(rate=8.0, min_rate=0.5, max_rate=20.0, decrease_factor=0.5)
+    limiter.record_rate_limited(HISTORY, retry_after=2.0)
+    assert limiter.current_rate(HISTORY) == 4.0
+
+    # Ответы на запросы, отправленные до первого 429, скорость повторно не снижают
+    clock.now += 1.0
+    limiter.record_rate_limited(HISTORY, retry_after=2.0)
+    assert limiter.current_rate(HISTORY) == 4.0
+
+    # После окончания паузы новый 429 снова снижает скорость, но не ниже min_rate
+    clock.now += 5.0
+    for _ in range(10):
+        limiter.record_rate_limited(HISTORY, retry_after=0.0)
+        clock.now += 0.001
+    assert limiter.current_rate(HISTORY) == 0.5
+
+
+def test_retry_after_blocks_bucket(clock):
+    limiter = RateLimiter(rate=10.0)
+    bucket = limiter._get_bucket(HISTORY)
+    assert bucket.try_take() == 0.0
+
+    limiter.record_rate_limited(HISTORY, retry_after=3.0)
+    assert bucket.try_take() == pytest.approx(3.0)
+    clock.now += 2.0
+    assert bucket.try_take() == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert bucket.try_take() == 0.0
+
+
+def test_missing_retry_after_uses_default_pause(clock):
+    limiter = RateLimiter(rate=10.0)
+    limiter.record_rate_limited(HISTORY)
+    stats = limiter.get_stats()["/exchange/v1/item-history"]
+    assert stats["blocked_for"] == pytest.approx(rate_limiter.DEFAULT_RETRY_AFTER)
+    assert stats["rate_limited"] == 1
+
+
+def test_buckets_are_independent(clock):
+    limiter = RateLimiter(rate=10.0)
+    limiter.record_rate_limited(HISTORY, retry_after=5.0)
+    assert limiter._get_bucket("/exchange/v1/market/items").try_take() == 0.0
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_retry_after():
+    limiter = RateLimiter(rate=100.0, max_rate=100.0)
+    await limiter.acquire(HISTORY)
+    limiter.record_rate_limited(HISTORY, retry_after=0.2)
+
+    started = time.monotonic()
+    await limiter.acquire(HISTORY)
+    assert time.monotonic() - started >= 0.19
+    assert limiter.queue_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_respects_rate():
+    limiter = RateLimiter(rate=20.0, max_rate=20.0)
+    started = time.monotonic()
+    for _ in range(25):
+        await limiter.acquire(HISTORY)
+    # 20 токенов в запасе, еще 5 появляются со скоростью 20 в секунду
+    assert time.monotonic() - started >= 0.2
+
+
+def test_limiter_survives_several_event_loops():
+    limiter = RateLimiter(rate=50.0, max_rate=50.0)
+
+    async def burst():
+        # Запросов больше запаса токенов: часть ждет в очереди ведра
+        await asyncio.gather(*(limiter.acquire(HISTORY) for _ in range(55)))
+
+    asyncio.run(burst())
+    asyncio.run(burst())
+    assert limiter.queue_depth() == 0
@@ -0,0 +1,93 @@
+"""Тесты компактных записей предметов и возможностей."""
+
+from src.arbitrage.order_book import BID, OrderBooks
+from src.arbitrage.records import (
+    MarketItem,
+    Opportunity,
+    build_market_items,
+    opportunity_to_dict,
+    parse_buy_orders,
+)
+
+
+def api_item(item_id, title, price, orders=()):
+    return {
+        "itemId": item_id,
+        "title": title,
+        "price": {"USD": price},
+        "buyOrders": [
+            {"price": {"USD": order_price}, "amount": amount} for order_price, amount in orders
+        ],
+        "extra": {"ignored": True},
+    }
+
+
+def test_from_api_parses_cents_and_best_bid():
+    listing = MarketItem.from_api(api_item("1", "AK-47", "12.34", [("10.00", 2), ("11.50", 1)]))
+    assert (listing.item_id, listing.title, listing.price_cents, listing.best_bid_cents) == (
+        "1",
+        "AK-47",
+        1234,
+        1150,
+    )
+
+
+def test_records_have_no_instance_dict():
+    listing = MarketItem("1", "AK", 100)
+    assert not hasattr(listing, "__dict__")
+    assert not hasattr(Opportunity("1", "AK", "CS2", 100, 90, 110, 20, 22.2, 3), "__dict__")
+
+
+def test_titles_are_interned():
+    first = MarketItem.from_api(api_item("1", "".join(["A", "K"]), "1"))
+    second = MarketItem.from_api(api_item("2", "".join(["A", "K"]), "1"))
+    assert first.title is second.title
+
+
+def test_fingerprint_tracks_price_and_bid():
+    base = MarketItem("1", "AK", 100, 50)
+    assert base.fingerprint == MarketItem("2", "AK", 100, 50).fingerprint
+    assert base.fingerprint != MarketItem("1", "AK", 101, 50).fingerprint
+    assert base.fingerprint != MarketItem("1", "AK", 100, 51).fingerprint
+
+
+def test_parse_buy_orders_defaults_amount():
+    assert parse_buy_orders({"buyOrders": [{"price": {"USD": "1.5"}}]}) == [(150, 1)]
+    assert parse_buy_orders({}) == []
+
+
+def test_build_market_items_skips_bad_and_free_items():
+    books = OrderBooks()
+    listings = build_market_items(
+        [
+            api_item("1", "AK", "1.00", [("0.90", 3)]),
+            api_item("2", "M4", "0"),
+            api_item("3", "AWP", "not a price"),
+            api_item("4", "AK", "1.10"),
+        ],
+        books,
+    )
+    assert [listing.item_id for listing in listings] == ["1", "4"]
+    assert books.best_ask("AK") == 100
+    assert books.best_bid("AK") == 90
+    assert "M4" not in books
+
+
+def test_listing_without_bids_after_one_with_bids_keeps_them():
+    books = OrderBooks()
+    listings = build_market_items(
+        [api_item("1", "AK", "1.00", [("1.30", 1)]), api_item("2", "AK", "1.50")], books
+    )
+    # Предложение без ордеров не стирает ордера предмета и оценивается по своим
+    assert [listing.best_bid_cents for listing in listings] == [130, 0]
+    assert books.best_bid("AK") == 130
+    assert books.get("AK").depth_at(BID, 130) == 1
+
+
+def test_opportunity_dict_uses_dollars():
+    opportunity = Opportunity("1", "AK", "CS2", 1234, 1000, 1200, 200, 20.0, 4)
+    data = opportunity_to_dict(opportunity)
+    assert data["current_price"] == 12.34
+    assert data["buy_price"] == 10.0
+    assert data["potential_profit"] == 2.0
+    assert opportunity_to_dict(data) is data
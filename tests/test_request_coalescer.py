@@ -0,0 +1,89 @@
+"""Тесты объединения одинаковых одновременных запросов."""
+
+import asyncio
+
+import pytest
+
+from src.api.request_coalescer import RequestCoalescer
+
+
+def test_make_key_ignores_param_order_and_types():
+    first = RequestCoalescer.make_key("get", "https://api/x", {"a": 1, "b": "2"})
+    second = RequestCoalescer.make_key("GET", "https://api/x", {"b": 2, "a": "1"})
+    assert first == second
+    assert first != RequestCoalescer.make_key("GET", "https://api/y", {"a": 1, "b": 2})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_request():
+    coalescer = RequestCoalescer()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"items": [1, 2]}
+
+    waiters = [asyncio.ensure_future(coalescer.run("key", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert coalescer.in_flight == 1
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert coalescer.get_stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_are_not_cached():
+    coalescer = RequestCoalescer()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await coalescer.run("key", fetch) == 1
+    assert await coalescer.run("key", fetch) == 2
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared():
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        raise RuntimeError("boom")
+
+    waiters = [asyncio.ensure_future(coalescer.run("key", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert coalescer.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_shared_request():
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    cancelled = asyncio.ensure_future(coalescer.run("key", fetch))
+    other = asyncio.ensure_future(coalescer.run("key", fetch))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await other == "done"
+    assert cancelled.cancelled()
@@ -0,0 +1,88 @@
+"""Тесты демона сканирования: расписание без сдвига, пропуски, ошибки и остановка."""
+
+import argparse
+import asyncio
+import json
+import time
+
+import pytest
+
+from src.arbitrage.scan_daemon import ScanDaemon, positive_interval
+
+
+def test_positive_interval():
+    assert positive_interval("2.5") == 2.5
+    for value in ("0", "-1", "abc", "nan"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            positive_interval(value)
+
+
+def test_daemon_rejects_non_positive_interval():
+    with pytest.raises(ValueError):
+        ScanDaemon(lambda: asyncio.sleep(0), interval=0)
+
+
+@pytest.mark.asyncio
+async def test_schedule_does_not_drift():
+    starts = []
+
+    async def scan():
+        starts.append(time.monotonic())
+        await asyncio.sleep(0.08)
+        return {"CS2": [1, 2], "DOTA2": [3]}
+
+    daemon = ScanDaemon(scan, interval=0.2, metrics_path=None, max_cycles=4)
+    await daemon.run()
+
+    # Запуски отсчитываются от старта, а не от окончания цикла
+    offsets = [start - starts[0] for start in starts]
+    for cycle, offset in enumerate(offsets):
+        assert offset == pytest.approx(cycle * 0.2, abs=0.04)
+    assert [stats.opportunities for stats in daemon.history] == [3, 3, 3, 3]
+    assert daemon.get_stats()["cycles_skipped"] == 0
+
+
+@pytest.mark.asyncio
+async def test_overrunning_cycle_skips_missed_slots():
+    durations = iter([0.25, 0.0, 0.0])
+
+    async def scan():
+        await asyncio.sleep(next(durations))
+
+    daemon = ScanDaemon(scan, interval=0.1, metrics_path=None, max_cycles=2)
+    await daemon.run()
+
+    first, second = daemon.history
+    assert first.skipped == 2
+    assert second.cycle == 3
+    assert daemon.cycles_skipped == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_cycle_does_not_stop_daemon(tmp_path):
+    calls = 0
+
+    async def scan():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("API недоступен")
+        return {}
+
+    metrics = tmp_path / "metrics.jsonl"
+    daemon = ScanDaemon(scan, interval=0.01, metrics_path=str(metrics), max_cycles=2)
+    await daemon.run()
+
+    assert daemon.cycles_failed == 1 and daemon.cycles_run == 2
+    lines = [json.loads(line) for line in metrics.read_text(encoding="utf-8").splitlines()]
+    assert [line["error"] for line in lines] == ["API недоступен", None]
+
+
+@pytest.mark.asyncio
+async def test_stop_interrupts_wait():
+    daemon = ScanDaemon(lambda: asyncio.sleep(0), interval=60, metrics_path=None)
+    task = asyncio.ensure_future(daemon.run())
+    await asyncio.sleep(0.05)
+    daemon.stop()
+    await asyncio.wait_for(task, timeout=1)
+    assert daemon.cycles_run == 1
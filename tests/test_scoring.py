@@ -0,0 +1,115 @@
+"""Тесты векторной оценки прибыльности против построчного расчета."""
+
+import random
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from src.arbitrage.order_book import OrderBooks
+from src.arbitrage.records import build_market_items
+from src.arbitrage.scoring import (
+    ListingColumns,
+    add_history_columns,
+    build_listing_columns,
+    score_columns,
+)
+
+
+def round_half_up(value: Fraction) -> int:
+    return int(value + Fraction(1, 2)) if value >= 0 else -int(-value + Fraction(1, 2))
+
+
+def reference_row(price, bid, sales, min_profit_percent, bid_ratio=0.9):
+    """Построчный расчет в точных дробях."""
+    buy = (
+        bid if bid > 0 else round_half_up(Fraction(price) * Fraction(bid_ratio).limit_denominator())
+    )
+    avg = round_half_up(Fraction(sum(sales), len(sales))) if sales else price
+    profit = avg - buy
+    passes = (
+        Fraction(profit, buy) * 100 >= Fraction(min_profit_percent).limit_denominator()
+        if buy > 0
+        else False
+    )
+    return buy, avg, profit, passes
+
+
+def random_columns(rng, rows):
+    prices = [rng.randint(1, 50000) for _ in range(rows)]
+    bids = [rng.choice([0, rng.randint(1, 50000)]) for _ in range(rows)]
+    histories = [
+        [{"price": {"USD": f"{rng.randint(1, 60000) / 100:.2f}"}} for _ in range(rng.randint(0, 5))]
+        for _ in range(rows)
+    ]
+    columns = ListingColumns(np.array(prices, dtype=np.int64), np.array(bids, dtype=np.int64))
+    add_history_columns(columns, histories)
+    sales = [
+        [round(float(sale["price"]["USD"]) * 100) for sale in history] for history in histories
+    ]
+    return columns, prices, bids, sales
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_score_columns_matches_reference(seed):
+    rng = random.Random(seed)
+    min_profit_percent = rng.choice([0.0, 5.0, 12.5])
+    columns, prices, bids, sales = random_columns(rng, 300)
+    result = score_columns(columns, min_profit_percent)
+
+    for row in range(len(prices)):
+        buy, avg, profit, passes = reference_row(
+            prices[row], bids[row], sales[row], min_profit_percent
+        )
+        assert result.buy_price_cents[row] == buy
+        assert result.avg_sale_price_cents[row] == avg
+        assert result.profit_cents[row] == profit
+        assert bool(result.mask[row]) == passes
+        assert result.profit_percent[row] == pytest.approx(profit * 100 / buy)
+
+
+def test_threshold_is_exact_in_cents():
+    # 105 / 100 - ровно 5%: граница не должна теряться из-за округления float
+    columns = ListingColumns(np.array([105], dtype=np.int64), np.array([100], dtype=np.int64))
+    assert score_columns(columns, 5.0).mask[0]
+    assert not score_columns(columns, 5.01).mask[0]
+
+
+def test_invalid_history_is_ignored():
+    columns = ListingColumns(
+        np.array([1000, 1000], dtype=np.int64), np.array([900, 900], dtype=np.int64)
+    )
+    add_history_columns(columns, [[{"price": {"USD": "abc"}}], [{"price": {"USD": "12.00"}}]])
+    assert columns.sale_count.tolist() == [0, 1]
+    assert columns.sale_sum_cents.tolist() == [0, 1200]
+
+
+def api_item(item_id, price, orders=()):
+    return {
+        "itemId": item_id,
+        "title": "AK",
+        "price": {"USD": price},
+        "buyOrders": [{"price": {"USD": order_price}, "amount": 1} for order_price in orders],
+    }
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_listings_are_scored_against_their_own_bids(reverse):
+    page = [api_item("1", "1.00", ["1.30"]), api_item("2", "1.50")]
+    books = OrderBooks()
+    listings = build_market_items(page[::-1] if reverse else page, books)
+    columns = build_listing_columns(sorted(listings, key=lambda listing: listing.item_id))
+
+    # Книга объединяет ордера названия, но оценка не зависит от порядка предложений
+    assert books.best_bid("AK") == 130
+    assert columns.best_bid_cents.tolist() == [130, 0]
+    add_history_columns(columns, [[{"price": {"USD": "1.40"}}], [{"price": {"USD": "1.40"}}]])
+    assert score_columns(columns, min_profit_percent=5.0).profitable_rows().tolist() == [0]
+
+
+def test_columns_slice_keeps_row_offset():
+    columns, *_ = random_columns(random.Random(1), 10)
+    part = columns[4:8]
+    assert len(part) == 4
+    assert part.row_offset == 4
+    assert part.price_cents.tolist() == columns.price_cents[4:8].tolist()
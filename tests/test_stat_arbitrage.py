@@ -0,0 +1,109 @@
+"""Тесты скользящей статистики цен против пересчета по окну."""
+
+import math
+
+import numpy as np
+import pytest
+
+from src.arbitrage.stat_arbitrage import RollingPriceStats
+
+
+def reference(prices, window, alpha):
+    """Среднее, выборочная дисперсия окна и EWMA по всей истории."""
+    recent = np.array(prices[-window:], dtype=np.float64)
+    ewma = prices[0]
+    for price in prices[1:]:
+        ewma += alpha * (price - ewma)
+    variance = recent.var(ddof=1) if len(recent) > 1 else math.nan
+    return recent.mean(), variance, ewma
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_rolling_stats_match_window_recomputation(seed):
+    rng = np.random.default_rng(seed)
+    stats = RollingPriceStats(window=7, alpha=0.2, z_threshold=2.0, min_samples=3, capacity=2)
+    history = {key: [] for key in ("a", "b", "c", "d", "e")}
+
+    for _ in range(200):
+        key = str(rng.choice(list(history)))
+        price = int(rng.integers(900, 1100))
+        history[key].append(price)
+        z_score = stats.update(key, price)
+
+        mean, variance, ewma = reference(history[key], 7, 0.2)
+        assert stats.mean(key) == pytest.approx(mean)
+        assert stats.ewma(key) == pytest.approx(ewma)
+        if math.isnan(variance):
+            assert math.isnan(stats.variance(key))
+        else:
+            assert stats.variance(key) == pytest.approx(variance)
+
+        count = min(len(history[key]), 7)
+        if count < 3 or variance == 0:
+            assert math.isnan(z_score)
+        else:
+            assert z_score == pytest.approx((price - mean) / math.sqrt(variance))
+        assert z_score == pytest.approx(stats.z_score(key), nan_ok=True)
+
+    # Массивы выросли за пределы начальной емкости
+    assert len(stats) == 5 and stats.get_stats()["updates"] == 200
+
+
+def test_update_many_matches_sequential_updates():
+    rng = np.random.default_rng(7)
+    keys = [str(key) for key in rng.choice(["a", "b", "c"], size=120)]
+    prices = rng.integers(100, 200, size=120).tolist()
+
+    sequential = RollingPriceStats(window=5, min_samples=3, z_threshold=1.0)
+    expected = [sequential.update(key, price) for key, price in zip(keys, prices)]
+
+    vectorized = RollingPriceStats(window=5, min_samples=3, z_threshold=1.0)
+    z_scores = vectorized.update_many(keys, prices)
+
+    np.testing.assert_allclose(z_scores, expected)
+    for key in ("a", "b", "c"):
+        assert vectorized.mean(key) == sequential.mean(key)
+        assert vectorized.ewma(key) == pytest.approx(sequential.ewma(key))
+    assert vectorized.flagged == sequential.flagged
+
+
+def test_z_score_requires_min_samples_and_spread():
+    stats = RollingPriceStats(window=5, min_samples=4)
+    for price in (100, 110, 120):
+        assert math.isnan(stats.update("a", price))
+    assert not math.isnan(stats.update("a", 130))
+
+    for _ in range(5):
+        flat = stats.update("b", 100)
+    assert math.isnan(flat)
+
+
+def test_signals_sorted_by_deviation_with_side():
+    stats = RollingPriceStats(window=10, z_threshold=1.5, min_samples=5)
+    for key, last in (("cheap", 500), ("pricey", 1400), ("steady", 1010)):
+        for price in (1000, 1010, 990, 1000, 1005, 995):
+            stats.update(key, price)
+        stats.update(key, last)
+
+    signals = stats.signals()
+    assert [signal.key for signal in signals] == ["cheap", "pricey"]
+    assert [signal.side for signal in signals] == ["buy", "sell"]
+    assert abs(signals[0].z_score) >= abs(signals[1].z_score)
+    assert signals[0].std_cents == pytest.approx(math.sqrt(stats.variance("cheap")))
+    assert signals[0].to_dict()["price"] == 5.0
+
+    # Ограничение по ключам и неизвестные ключи
+    assert [signal.key for signal in stats.signals(["pricey", "unknown"])] == ["pricey"]
+
+    # Возврат цены к среднему снимает пометку
+    for _ in range(10):
+        stats.update("cheap", 1000)
+    assert "cheap" not in {signal.key for signal in stats.signals()}
+
+
+def test_unknown_key_and_window_validation():
+    stats = RollingPriceStats(window=3)
+    assert "a" not in stats
+    assert math.isnan(stats.mean("a")) and math.isnan(stats.z_score("a"))
+    with pytest.raises(ValueError):
+        RollingPriceStats(window=1)
@@ -0,0 +1,117 @@
+"""Тесты сервера-заменителя API и клиента SimpleDMarketAPI на нем."""
+
+import aiohttp
+import pytest
+
+from benchmarks.stub_server import DMarketStubServer
+from benchmarks.synthetic_market import (
+    ITEM_HISTORY_ENDPOINT,
+    MARKET_ITEMS_ENDPOINT,
+    SyntheticMarket,
+)
+from simple_arbitrage_test import SimpleDMarketAPI
+from src.api.rate_limiter import RateLimiter
+from src.api.request_coalescer import RequestCoalescer
+from src.api.transport import HTTPTransport
+from src.utils.instrumentation import Instrumentation
+
+
+def make_client(base_url, max_retries=3):
+    api = SimpleDMarketAPI(
+        "key",
+        "secret",
+        base_url=base_url,
+        rate_limiter=RateLimiter(rate=1000, max_rate=1000),
+        max_retries=max_retries,
+        coalescer=RequestCoalescer(),
+        metrics=Instrumentation(enabled=False),
+    )
+    api.transport = HTTPTransport(api._get_session)
+    return api
+
+
+@pytest.mark.asyncio
+async def test_page_size_is_capped_and_etag_revalidates():
+    market = SyntheticMarket(items_per_game=30, seed=1)
+    async with DMarketStubServer(market, max_page_size=10) as server:
+        async with aiohttp.ClientSession() as session:
+            url = server.base_url + MARKET_ITEMS_ENDPOINT
+            params = {"gameId": "a8db", "limit": 50}
+            async with session.get(url, params=params) as response:
+                assert response.status == 200
+                etag = response.headers["ETag"]
+                body = await response.json()
+            assert len(body["objects"]) == 10 and body["cursor"] == "10"
+
+            headers = {"If-None-Match": etag}
+            async with session.get(url, params=params, headers=headers) as response:
+                assert response.status == 304
+                assert await response.read() == b""
+
+            async with session.get(url, params={"offset": "x"}) as response:
+                assert response.status == 400
+
+        assert server.get_stats()["not_modified"] == {"market": 1, "history": 0}
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_returns_retry_after():
+    market = SyntheticMarket(items_per_game=5, seed=2)
+    item_id = market.items["a8db"][0]["itemId"]
+    async with DMarketStubServer(market, rate_limit=1) as server:
+        async with aiohttp.ClientSession() as session:
+            url = server.base_url + ITEM_HISTORY_ENDPOINT + item_id
+            async with session.get(url) as response:
+                assert response.status == 200
+            async with session.get(url) as response:
+                assert response.status == 429
+                assert int(response.headers["Retry-After"]) >= 1
+        assert server.throttled["history"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_pages_through_whole_market():
+    market = SyntheticMarket(items_per_game=95, seed=3)
+    async with DMarketStubServer(market, max_page_size=20) as server:
+        api = make_client(server.base_url)
+        try:
+            pages = [page async for page in api.iter_market_pages("9a92", page_size=20)]
+            limited = [
+                item async for item in api.iter_market_items("9a92", page_size=20, max_items=25)
+            ]
+        finally:
+            await api.close()
+
+    assert [len(page) for page in pages] == [20, 20, 20, 20, 15]
+    expected = [obj["itemId"] for obj in market.items["9a92"]]
+    assert [item["itemId"] for page in pages for item in page] == expected
+    assert [item["itemId"] for item in limited] == expected[:25]
+
+
+@pytest.mark.asyncio
+async def test_client_retries_after_throttled_response():
+    market = SyntheticMarket(items_per_game=5, seed=4, max_history=10)
+    item_id = next(key for key, sales in market.histories.items() if sales)
+    async with DMarketStubServer(market, rate_limit=1) as server:
+        api = make_client(server.base_url)
+        try:
+            first = await api.get_item_history(item_id)
+            second = await api.get_item_history(item_id)
+        finally:
+            await api.close()
+
+    # Второй запрос получил 429 и был повторен после Retry-After
+    assert first == second == market.item_history(item_id)
+    assert server.throttled["history"] == 1 and server.requests["history"] == 3
+
+
+@pytest.mark.asyncio
+async def test_client_gives_up_after_retries():
+    market = SyntheticMarket(items_per_game=5, seed=5)
+    async with DMarketStubServer(market, throttle_share=1.0, retry_after=0.0) as server:
+        api = make_client(server.base_url, max_retries=0)
+        try:
+            response = await api.get_market_items("a8db")
+        finally:
+            await api.close()
+    assert response["objects"] == [] and "429" in response["error"]
@@ -0,0 +1,101 @@
+"""Тесты синтетического рынка и сравнения замеров с эталоном."""
+
+from benchmarks.bench_pipeline import compare, merge_runs
+from benchmarks.synthetic_market import (
+    ITEM_HISTORY_ENDPOINT,
+    MARKET_ITEMS_ENDPOINT,
+    SyntheticMarket,
+)
+
+
+def all_pages(market, params):
+    """Проходит все страницы по курсору."""
+    objects = []
+    params = dict(params)
+    while True:
+        page = market.respond(MARKET_ITEMS_ENDPOINT, params)
+        objects += page["objects"]
+        if "cursor" not in page:
+            return objects, page["total"]["items"]
+        params["cursor"] = page["cursor"]
+
+
+def test_same_seed_gives_same_market():
+    first = SyntheticMarket(items_per_game=200, seed=7)
+    second = SyntheticMarket(items_per_game=200, seed=7)
+    other = SyntheticMarket(items_per_game=200, seed=8)
+    assert first.items == second.items and first.histories == second.histories
+    assert first.items != other.items
+    assert first.total_items == 800
+
+
+def test_cursor_pages_cover_game_once():
+    market = SyntheticMarket(items_per_game=250, seed=1)
+    objects, total = all_pages(market, {"gameId": "a8db", "limit": 30})
+    assert total == 250
+    assert [obj["itemId"] for obj in objects] == [obj["itemId"] for obj in market.items["a8db"]]
+
+
+def test_price_range_filter():
+    market = SyntheticMarket(items_per_game=300, seed=2)
+    objects, total = all_pages(
+        market, {"gameId": "9a92", "limit": 50, "priceFrom": 200, "priceTo": 900}
+    )
+    expected = [obj for obj in market.items["9a92"] if 200 <= SyntheticMarket._cents(obj) <= 900]
+    assert objects == expected and total == len(expected)
+
+
+def test_history_endpoint_and_unknown_path():
+    market = SyntheticMarket(items_per_game=50, seed=3, max_history=10)
+    item_id = next(key for key, sales in market.histories.items() if len(sales) > 2)
+    response = market.respond(ITEM_HISTORY_ENDPOINT + item_id, {"limit": 2})
+    assert response["history"] == market.histories[item_id][:2]
+    assert market.respond(ITEM_HISTORY_ENDPOINT + "missing") == {"history": []}
+    assert "error" in market.respond("/account/v1/balance")
+
+
+def test_save_and_load_round_trip(tmp_path):
+    market = SyntheticMarket(items_per_game=40, seed=4)
+    path = tmp_path / "market" / "market.json"
+    market.save(path)
+    loaded = SyntheticMarket.load(path)
+    assert loaded.items == market.items and loaded.histories == market.histories
+    assert loaded.items_per_game == 40
+
+
+def test_compare_flags_throughput_and_memory_regressions():
+    baseline = {
+        "results": [
+            {"items": 1000, "benchmarks": {"full_scan": {"throughput": 100.0, "peak_mb": 10.0}}}
+        ]
+    }
+    within = [{"items": 1000, "benchmarks": {"full_scan": {"throughput": 80.0, "peak_mb": 12.0}}}]
+    assert compare(within, baseline, tolerance=0.3) == []
+
+    worse = [{"items": 1000, "benchmarks": {"full_scan": {"throughput": 60.0, "peak_mb": 20.0}}}]
+    assert len(compare(worse, baseline, tolerance=0.3)) == 2
+
+    # Размеры и замеры без эталона не сравниваются
+    unknown = [{"items": 5, "benchmarks": {"full_scan": {"throughput": 1.0, "peak_mb": None}}}]
+    assert compare(unknown, baseline, tolerance=0.3) == []
+
+
+def test_merge_runs_takes_median_throughput_and_max_memory():
+    runs = [
+        {
+            "items": 1000,
+            "benchmarks": {
+                "rescan": {
+                    "throughput": throughput,
+                    "p50_ms": 10.0,
+                    "p99_ms": 12.0,
+                    "samples": 3,
+                    "peak_mb": peak,
+                }
+            },
+        }
+        for throughput, peak in [(50.0, 2.0), (90.0, 2.2), (60.0, 2.1)]
+    ]
+    merged = merge_runs(runs)["benchmarks"]["rescan"]
+    assert merged["throughput"] == 60.0 and merged["peak_mb"] == 2.2
+    assert merged["samples"] == 9
@@ -0,0 +1,57 @@
+"""Тесты отбора K лучших: селектор и top_rows совпадают с устойчивой сортировкой."""
+
+import random
+
+import numpy as np
+import pytest
+
+from src.arbitrage.scoring import ListingColumns, score_columns
+from src.utils.top_k import TopKSelector
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 50, None])
+def test_selector_matches_stable_sort(k):
+    rng = random.Random(k or 7)
+    items = [(index, rng.randint(0, 10)) for index in range(40)]
+    selector = TopKSelector(k, key=lambda item: item[1])
+    for start in range(0, len(items), 7):
+        selector.extend(items[start : start + 7])
+
+    expected = sorted(items, key=lambda item: item[1], reverse=True)
+    assert selector.result() == (expected if k is None else expected[:k])
+    assert selector.seen == len(items)
+
+
+def test_selector_threshold():
+    selector = TopKSelector(2, key=lambda value: value)
+    selector.push(5)
+    assert selector.threshold() is None
+    selector.extend([1, 9])
+    assert selector.threshold() == 5
+
+
+def test_selector_rejects_negative_k():
+    with pytest.raises(ValueError):
+        TopKSelector(-1, key=lambda value: value)
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 20, 1000, None])
+@pytest.mark.parametrize("rank_by", ["profit_percent", "potential_profit", "avg_sale_price"])
+def test_top_rows_matches_full_sort(k, rank_by):
+    rng = np.random.default_rng(3)
+    # Небольшой диапазон цен дает много равных значений
+    prices = rng.integers(90, 110, size=200)
+    bids = rng.integers(80, 100, size=200)
+    scores = score_columns(ListingColumns(prices, bids), min_profit_percent=1.0)
+
+    values = {
+        "profit_percent": scores.profit_percent,
+        "potential_profit": scores.profit_cents,
+        "avg_sale_price": scores.avg_sale_price_cents,
+    }[rank_by]
+    profitable = [row for row in range(len(prices)) if scores.mask[row]]
+    expected = sorted(profitable, key=lambda row: -values[row])
+    if k is not None:
+        expected = expected[:k]
+
+    assert scores.top_rows(k, rank_by).tolist() == expected
@@ -0,0 +1,179 @@
+"""Тесты записи и воспроизведения ответов API."""
+
+import contextlib
+import time
+
+import pytest
+
+from benchmarks.stub_server import DMarketStubServer
+from benchmarks.synthetic_market import SyntheticMarket
+from simple_arbitrage_test import SimpleDMarketAPI
+from src.api.exceptions import APIError
+from src.api.rate_limiter import RateLimiter
+from src.api.request_coalescer import RequestCoalescer
+from src.api.transport import (
+    Cassette,
+    HTTPTransport,
+    RecordedResponse,
+    RecordingTransport,
+    ReplayTransport,
+    create_transport,
+    iter_body_chunks,
+    request_key,
+)
+from src.utils.instrumentation import Instrumentation
+
+
+class FakeTransport:
+    """Транспорт, отвечающий по очереди заданными ответами и считающий отправки."""
+
+    rate_limited = True
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+        self.closed = False
+
+    @contextlib.asynccontextmanager
+    async def request(self, method, url, headers=None, params=None, json_body=None, on_send=None):
+        self.sent_headers.append(dict(await on_send()) if on_send else {})
+        yield self.responses.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+async def fetch(transport, url, params=None, on_send=None):
+    async with transport.request("GET", url, params=params, on_send=on_send) as response:
+        return response.status, dict(response.headers), await response.read()
+
+
+def test_request_key_ignores_host_and_param_order():
+    first = request_key("get", "https://api.dmarket.com/items?b=2", {"a": 1})
+    second = request_key("GET", "http://127.0.0.1:8800/items", {"b": "2", "a": "1"})
+    assert first == second
+    assert request_key("POST", "/items", json_body={"x": 1}) != request_key("POST", "/items")
+
+
+def test_cassette_repeats_last_response_and_rewinds(tmp_path):
+    cassette = Cassette(tmp_path / "c.jsonl.gz")
+    cassette.add("k", 200, {"ETag": '"1"', "X-Other": "no"}, b"first", 0.1)
+    cassette.add("k", 200, {}, b"second", 0.2)
+    cassette.save()
+
+    loaded = Cassette(tmp_path / "c.jsonl.gz")
+    assert loaded.load() == 2 and "k" in loaded
+    assert [loaded.next("k")["body"] for _ in range(3)] == ["first", "second", "second"]
+    loaded.rewind()
+    entry = loaded.next("k")
+    assert entry["headers"] == {"ETag": '"1"'} and entry["elapsed"] == 0.1
+    assert loaded.next("missing") is None
+    assert Cassette(tmp_path / "absent.jsonl.gz").load() == 0
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_round_trip(tmp_path):
+    path = tmp_path / "cassettes" / "api.jsonl.gz"
+    inner = FakeTransport(
+        [
+            RecordedResponse(200, {"Content-Type": "application/json"}, b'{"n": 1}'),
+            RecordedResponse(429, {"Retry-After": "2"}, b"slow down"),
+        ]
+    )
+    recorder = RecordingTransport(inner, path)
+
+    async def on_send():
+        return {"X-Request-Sign": "sig"}
+
+    recorded = [
+        await fetch(recorder, "https://api.dmarket.com/a", {"limit": 1}, on_send),
+        await fetch(recorder, "https://api.dmarket.com/b"),
+    ]
+    assert inner.sent_headers == [{"X-Request-Sign": "sig"}, {}]
+    await recorder.close()
+    assert inner.closed and path.exists()
+
+    sent = []
+
+    async def count_send():
+        sent.append(True)
+        return {}
+
+    replay = ReplayTransport(path)
+    assert not replay.rate_limited
+    replayed = [
+        await fetch(replay, "http://localhost/a", {"limit": "1"}, count_send),
+        await fetch(replay, "http://localhost/b", on_send=count_send),
+    ]
+    assert replayed == recorded
+    assert len(sent) == 2 and replay.replayed == 2
+
+    with pytest.raises(APIError):
+        await fetch(replay, "http://localhost/c")
+    assert replay.missed == 1
+
+
+@pytest.mark.asyncio
+async def test_original_timing_replays_elapsed_time(tmp_path):
+    cassette = Cassette(tmp_path / "c.jsonl.gz")
+    key = request_key("GET", "/slow")
+    cassette.add(key, 200, {}, b"x" * 10, 0.2)
+
+    started = time.perf_counter()
+    await fetch(ReplayTransport(cassette, timing="original", speed=4), "/slow")
+    assert 0.04 <= time.perf_counter() - started < 0.2
+
+    async with ReplayTransport(cassette).request("GET", "/slow") as response:
+        chunks = [chunk async for chunk in iter_body_chunks(response, chunk_size=4)]
+    assert chunks == [b"xxxx", b"xxxx", b"xx"]
+
+    with pytest.raises(ValueError):
+        ReplayTransport(cassette, timing="slow")
+
+
+def test_create_transport_modes(tmp_path):
+    async def get_session():
+        raise AssertionError("сессия не нужна")
+
+    path = tmp_path / "c.jsonl.gz"
+    assert isinstance(create_transport(get_session, "live"), HTTPTransport)
+    recorder = create_transport(get_session, "record", path)
+    assert isinstance(recorder, RecordingTransport) and isinstance(recorder.inner, HTTPTransport)
+    assert isinstance(create_transport(get_session, "replay", path), ReplayTransport)
+    with pytest.raises(ValueError):
+        create_transport(get_session, "mock", path)
+
+
+def make_client(base_url, transport_factory):
+    api = SimpleDMarketAPI(
+        "key",
+        "secret",
+        base_url=base_url,
+        rate_limiter=RateLimiter(rate=1000, max_rate=1000),
+        coalescer=RequestCoalescer(),
+        metrics=Instrumentation(enabled=False),
+    )
+    api.transport = transport_factory(api)
+    return api
+
+
+@pytest.mark.asyncio
+async def test_client_scan_replays_without_server(tmp_path):
+    path = tmp_path / "scan.jsonl.gz"
+    market = SyntheticMarket(items_per_game=45, seed=6)
+    async with DMarketStubServer(market, max_page_size=20) as server:
+        api = make_client(
+            server.base_url, lambda api: RecordingTransport(HTTPTransport(api._get_session), path)
+        )
+        try:
+            recorded = [page async for page in api.iter_market_pages("a8db", page_size=20)]
+        finally:
+            await api.close()
+
+    api = make_client("http://127.0.0.1:9", lambda api: ReplayTransport(path))
+    try:
+        replayed = [page async for page in api.iter_market_pages("a8db", page_size=20)]
+    finally:
+        await api.close()
+    assert replayed == recorded
+    assert sum(len(page) for page in replayed) == 45
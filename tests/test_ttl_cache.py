@@ -0,0 +1,78 @@
+"""Тесты кэша с TTL и вытеснением LRU."""
+
+import pytest
+
+from src.utils import ttl_cache
+from src.utils.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(ttl_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=100)
+
+    clock[0] += 10
+    assert "a" not in cache
+    assert cache.get("a", "missing") == "missing"
+    assert cache.get("b") == 2
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_stats_count_hits_and_misses():
+    cache = TTLCache(ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+def test_purge_expired(clock):
+    cache = TTLCache(ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=50)
+    clock[0] += 6
+    assert cache.purge_expired() == 1
+    assert len(cache) == 1
+
+
+def test_save_and_load_keep_order_and_skip_expired(tmp_path, clock):
+    path = tmp_path / "cache.json"
+    cache = TTLCache(ttl=60, persist_path=path)
+    cache.set("old", 0, ttl=1)
+    cache.set("a", [1, 2])
+    cache.set("b", {"x": 1})
+    cache.get("a")
+    clock[0] += 2
+    cache.save()
+    assert not path.with_name(path.name + ".tmp").exists()
+
+    restored = TTLCache(ttl=60, maxsize=1, persist_path=path)
+    # Восстановлен порядок LRU: при maxsize=1 остается последняя использованная запись
+    assert len(restored) == 1
+    assert restored.get("a") == [1, 2]
+
+
+def test_load_ignores_corrupt_file(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert TTLCache(persist_path=path).load() == 0